@@ -1,4 +1,10 @@
-from backend.main import app
+import os
+import sys
+
+# The backend modules import each other by plain name, as when uvicorn runs from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from main import app
 
 # Vercel looks for 'app' by default in many configurations, or we can just expose it
 # This file acts as the bridge between Vercel Serverless Function and FastAPI
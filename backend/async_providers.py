@@ -0,0 +1,244 @@
+import html
+import json
+import re
+from urllib.parse import unquote, urlparse, parse_qs
+
+from serp_parser import SerpSpec, extract, response_charset
+
+# Async versions of the engines used by perform_search. Every function takes the
+# shared httpx.AsyncClient and returns raw results in the same shape as the
+# sync path: {"title", "url", "description", "source"}. The parse_* helpers
+# are shared with the sync fetchers.
+
+
+def _headers(referer=None):
+    # The User-Agent is fixed per client (see http_clients), not per request
+    return {"Referer": referer} if referer else {}
+
+
+def _unwrap_ddg_link(href):
+    # html.duckduckgo.com wraps results as //duckduckgo.com/l/?uddg=<encoded url>
+    if href and "duckduckgo.com/l/?" in href:
+        target = parse_qs(urlparse(href).query).get("uddg")
+        if target:
+            return unquote(target[0])
+    return href
+
+
+def _is_ad(href):
+    return href.startswith(("http://www.google.com/search?q=", "https://duckduckgo.com/y.js"))
+
+
+# DDG shows at most a few ads above the results; blocks are read for them too
+# so that max_results real results are left once they are dropped
+DDG_AD_SLOTS = 3
+
+
+def _strip_tags(fragment):
+    # The JSON API marks matches up with <b>; its fragments hold no other markup
+    return html.unescape(re.sub(r"<[^>]*>", "", fragment))
+
+
+def parse_ddg_api(text, max_results):
+    """Parses the d.js answer of the DDG JSON endpoint."""
+    start = text.find("DDG.pageLayout.load('d',")
+    if start == -1:
+        return []
+    start += len("DDG.pageLayout.load('d',")
+    end = text.find(");DDG.duckbar.load(", start)
+    rows = json.loads(text[start:end if end != -1 else None])
+
+    results = []
+    for r in rows:
+        href = r.get("u")
+        if not href or _is_ad(href):
+            continue
+        results.append({
+            "title": _strip_tags(r.get("t", "")),
+            "url": href,
+            "description": _strip_tags(r.get("a", "")),
+            "source": "DDG-api"
+        })
+        if len(results) >= max_results:
+            break
+    return results
+
+
+DDG_HTML_SPEC = SerpSpec("div.result", {
+    "url": ("a.result__a", "href"),
+    "title": ("a.result__a", None),
+    "description": (".result__snippet", None),
+}, required=("url",))
+
+
+def parse_ddg_html(html, max_results, encoding="utf-8", backend=None):
+    """Parses an html.duckduckgo.com results page from the response bytes (or text)."""
+    results = []
+    for block in extract(html, DDG_HTML_SPEC, max_results + DDG_AD_SLOTS, encoding, backend):
+        href = _unwrap_ddg_link(block["url"])
+        if not href or _is_ad(href):
+            continue
+        results.append({
+            "title": block["title"],
+            "url": href,
+            "description": block["description"] or "",
+            "source": "DDG-html"
+        })
+        if len(results) >= max_results:
+            break
+    return results
+
+
+# The lite page is one table with a row for each result's link and another
+# for its snippet, so each row is a block and they are paired up here
+DDG_LITE_SPEC = SerpSpec("tr", {
+    "url": ("a.result-link", "href"),
+    "title": ("a.result-link", None),
+    "description": ("td.result-snippet", None),
+}, required_any=("url", "description"))
+
+
+def parse_ddg_lite(html, max_results, encoding="utf-8", backend=None):
+    """Parses a lite.duckduckgo.com results page from the response bytes (or text)."""
+    links, snippets = [], []
+    for row in extract(html, DDG_LITE_SPEC, (max_results + DDG_AD_SLOTS) * 2, encoding, backend):
+        if row["url"] is not None:
+            links.append(row)
+        if row["description"] is not None:
+            snippets.append(row["description"])
+
+    results = []
+    for link, description in zip(links, snippets):
+        href = _unwrap_ddg_link(link["url"])
+        if not href or _is_ad(href):
+            continue
+        results.append({
+            "title": link["title"],
+            "url": href,
+            "description": description.strip(),
+            "source": "DDG-lite"
+        })
+        if len(results) >= max_results:
+            break
+    return results
+
+
+async def _ddg_api(client, query, max_results):
+    # 1. Get the vqd token for this query
+    resp = await client.get("https://duckduckgo.com/", params={"q": query}, headers=_headers())
+    resp.raise_for_status()
+    match = re.search(rb"vqd=[\"']?([\d-]+)", resp.content)
+    if not match:
+        raise ValueError("Could not extract vqd")
+
+    # 2. Query the JSON endpoint
+    params = {
+        "q": query,
+        "kl": "wt-wt",
+        "l": "wt-wt",
+        "p": "-2",  # safesearch off
+        "s": "0",
+        "df": "y",
+        "vqd": match.group(1).decode(),
+    }
+    resp = await client.get("https://links.duckduckgo.com/d.js", params=params,
+                            headers=_headers("https://duckduckgo.com/"))
+    resp.raise_for_status()
+    return parse_ddg_api(resp.text, max_results)
+
+
+async def _ddg_html(client, query, max_results):
+    resp = await client.post("https://html.duckduckgo.com/html/",
+                             data={"q": query, "b": "", "kl": "wt-wt", "df": "y"},
+                             headers=_headers("https://html.duckduckgo.com/"))
+    resp.raise_for_status()
+    return parse_ddg_html(resp.content, max_results, response_charset(resp.headers.get("content-type")))
+
+
+async def _ddg_lite(client, query, max_results):
+    resp = await client.post("https://lite.duckduckgo.com/lite/",
+                             data={"q": query, "b": "", "kl": "wt-wt", "df": "y"},
+                             headers=_headers("https://lite.duckduckgo.com/"))
+    resp.raise_for_status()
+    return parse_ddg_lite(resp.content, max_results, response_charset(resp.headers.get("content-type")))
+
+
+DDG_BACKENDS = {
+    "api": _ddg_api,
+    "html": _ddg_html,
+    "lite": _ddg_lite,
+}
+
+
+async def ddg_search(client, query, backend, max_results):
+    return await DDG_BACKENDS[backend](client, query, max_results)
+
+
+GOOGLE_SPEC = SerpSpec("div.ezO2md", {
+    "url": ("a[href]", "href"),
+    "title": ("span.CVA68e", None),
+    "description": ("span.FrIlee", None),
+}, required=("url", "title"))
+
+
+def parse_google_html(html, max_results, encoding="utf-8", backend=None):
+    """
+    Parses a Google results page (the markup googlesearch-python relies on).
+    Pass the response bytes; see serp_parser for the parser backends.
+    """
+    results = []
+    for block in extract(html, GOOGLE_SPEC, max_results, encoding, backend):
+        results.append({
+            "title": block["title"],
+            "url": unquote(block["url"].split("&")[0].replace("/url?q=", "")),
+            "description": block["description"] or "",
+            "source": "Google"
+        })
+    return results
+
+
+# Bing results are usually in 'li.b_algo'
+BING_SPEC = SerpSpec("li.b_algo", {
+    "title": ("h2", None),
+    "url": ("a", "href"),
+    "description": ("p", None),
+})
+
+
+def parse_bing_html(html, max_results, encoding="utf-8", backend=None):
+    """Parses a Bing results page from the response bytes (or text)."""
+    results = []
+    for block in extract(html, BING_SPEC, max_results, encoding, backend):
+        if block["title"] is not None and block["url"] is not None:
+            results.append({
+                "title": block["title"],
+                "url": block["url"],
+                "description": block["description"] or "",
+                "source": "Bing"
+            })
+    return results
+
+
+GOOGLE_URL = "https://www.google.com/search"
+GOOGLE_COOKIES = {"CONSENT": "PENDING+987", "SOCS": "CAESHAgBEhIaAB"}
+BING_URL = "https://www.bing.com/search"
+
+
+async def google_search(client, query, max_results):
+    # Same request googlesearch-python sends, minus the blocking sleep_interval
+    resp = await client.get(
+        GOOGLE_URL,
+        params={"q": query, "num": max_results + 2, "hl": "en"},
+        headers={"Accept": "*/*"},
+        cookies=GOOGLE_COOKIES,
+    )
+    resp.raise_for_status()
+    return parse_google_html(resp.content, max_results, response_charset(resp.headers.get("content-type")))
+
+
+async def bing_search(client, query, max_results):
+    resp = await client.get(BING_URL, params={"q": query})
+    if resp.status_code != 200:
+        raise RuntimeError(f"Bing returned HTTP {resp.status_code}")
+    return parse_bing_html(resp.content, max_results, response_charset(resp.headers.get("content-type")))
+
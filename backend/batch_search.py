@@ -0,0 +1,75 @@
+"""
+Looks up a list of people and writes one NDJSON line per person as each
+completes, the same records /api/search/batch streams.
+
+The input is a CSV file with a header row (name, extra_info, query_budget;
+only name is required) or a JSONL file with one {"name": ..., "extra_info": ...}
+object per line.
+
+    python batch_search.py people.csv > results.ndjson
+    python batch_search.py people.jsonl --output results.ndjson --concurrency 8
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import sys
+import time
+
+from http_clients import close_async_client, sync_clients
+from search_logic import BATCH_CONCURRENCY, batch_records, batch_search_stream
+
+
+def read_lookups(path):
+    """Returns [(name, extra_info, query_budget)] from a CSV or JSONL file."""
+    with open(path, newline="") as f:
+        if path.endswith((".jsonl", ".ndjson", ".json")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    lookups = []
+    for row in rows:
+        name = (row.get("name") or "").strip()
+        if not name:
+            continue
+        budget = row.get("query_budget")
+        lookups.append((name, (row.get("extra_info") or "").strip(), int(budget) if budget not in (None, "") else None))
+    return lookups
+
+
+async def run(lookups, out, concurrency):
+    try:
+        async for indexes, results in batch_search_stream(lookups, concurrency):
+            for record in batch_records(lookups, indexes, results):
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+    finally:
+        await close_async_client()
+        sync_clients.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV or JSONL file of people to look up")
+    parser.add_argument("--output", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="people looked up at once")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+    lookups = read_lookups(args.input)
+    logging.info(f"Looking up {len(lookups)} people")
+
+    start = time.perf_counter()
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        asyncio.run(run(lookups, out, args.concurrency))
+    finally:
+        if args.output:
+            out.close()
+    logging.info(f"Batch of {len(lookups)} finished in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
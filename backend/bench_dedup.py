@@ -0,0 +1,161 @@
+"""
+Benchmark of near-duplicate collapsing (near_duplicates.py) on a synthetic
+corpus: stories syndicated to several outlets with the outlet name added to
+the title, a word or two changed and the description cut at a different
+length, mixed with unrelated one-off results.
+
+For each corpus size it times fingerprinting (features + MinHash signature),
+LSH-banded clustering and the whole collapse() step, and scores the clusters
+against the known stories (pairwise precision and recall). Up to
+--exhaustive-max results it also compares every pair, to show what banding
+saves and what it misses.
+
+    python bench_dedup.py
+    python bench_dedup.py --sizes 1000,5000,20000 --copies 4 --unique 0.5
+"""
+import argparse
+import random
+import time
+from collections import Counter
+
+import near_duplicates
+
+OUTLETS = [
+    "Reuters", "AP News", "Yahoo News", "MSN", "The Daily Post", "Local 10", "News Break",
+    "Business Insider", "Morning Herald", "City Gazette", "Tech Digest", "Google News",
+]
+
+
+def vocabulary(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+
+def story(rng, words):
+    return rng.sample(words, 10), rng.sample(words, 40)
+
+
+def copy_of(title, description, rng, words):
+    """One outlet's version of a story."""
+    title = list(title)
+    description = list(description)
+    # A reworded title: one word swapped, sometimes one dropped
+    title[rng.randrange(len(title))] = rng.choice(words)
+    if rng.random() < 0.3:
+        del title[rng.randrange(len(title))]
+    # Snippets are cut at slightly different lengths
+    description = description[:len(description) - rng.randint(0, 4)]
+    suffix = rng.choice([" - ", " | ", " : "]) + rng.choice(OUTLETS)
+    return " ".join(title) + suffix, " ".join(description) + "..."
+
+
+def make_corpus(size, copies, unique_share, seed):
+    """Result dicts and the story id of each (one id per one-off result)."""
+    rng = random.Random(seed)
+    words = vocabulary(5000, rng)
+    items, labels = [], []
+    story_id = 0
+    while len(items) < size:
+        title, description = story(rng, words)
+        n = 1 if rng.random() < unique_share else rng.randint(2, copies * 2 - 2)
+        for _ in range(min(n, size - len(items))):
+            t, d = copy_of(title, description, rng, words) if n > 1 else (" ".join(title), " ".join(description))
+            items.append({
+                "title": t, "description": d,
+                "url": f"https://{rng.choice(OUTLETS).lower().replace(' ', '')}.example/{story_id}/{len(items)}",
+                "_score": round(rng.uniform(20, 90), 2),
+            })
+            labels.append(story_id)
+        story_id += 1
+    order = list(range(len(items)))
+    rng.shuffle(order)
+    return [items[i] for i in order], [labels[i] for i in order]
+
+
+def pairs(sizes):
+    return sum(n * (n - 1) // 2 for n in sizes)
+
+
+def score_clusters(clusters, labels):
+    """Pairwise (precision, recall) of predicted clusters against story labels."""
+    predicted = pairs(len(c) for c in clusters)
+    actual = pairs(Counter(labels).values())
+    correct = pairs(n for c in clusters for n in Counter(labels[i] for i in c).values())
+    precision = correct / predicted if predicted else 1.0
+    recall = correct / actual if actual else 1.0
+    return precision, recall
+
+
+def exhaustive_clusters(fingerprints, threshold):
+    """Every pair compared; the reference banding approximates."""
+    parent = list(range(len(fingerprints)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, a in enumerate(fingerprints):
+        if a is None:
+            continue
+        for j in range(i):
+            b = fingerprints[j]
+            if b is not None and near_duplicates.similarity(a[0], b[0]) >= threshold:
+                parent[find(i)] = find(j)
+    groups = {}
+    for i in range(len(fingerprints)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def run(size, args):
+    items, labels = make_corpus(size, args.copies, args.unique, args.seed)
+    texts = [f"{item['title']} {item['description']}" for item in items]
+
+    start = time.perf_counter()
+    fingerprints = [near_duplicates.fingerprint(t) for t in texts]
+    fingerprint_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    clusters = near_duplicates.cluster(fingerprints, args.similarity)
+    cluster_s = time.perf_counter() - start
+    precision, recall = score_clusters(clusters, labels)
+
+    corpus = {"news": [dict(item) for item in items]}
+    start = time.perf_counter()
+    removed = near_duplicates.collapse(corpus, ("news",), args.similarity)
+    collapse_s = time.perf_counter() - start
+
+    line = (f"{size:>7} {len(set(labels)):>7} {len(corpus['news']):>7} {removed:>7}"
+            f" {fingerprint_s * 1000:>9.1f} {cluster_s * 1000:>9.1f} {collapse_s * 1000:>9.1f}"
+            f" {collapse_s / size * 1e6:>7.1f} {precision:>6.3f} {recall:>6.3f}")
+    if size <= args.exhaustive_max:
+        start = time.perf_counter()
+        reference = exhaustive_clusters(fingerprints, args.similarity)
+        exhaustive_s = time.perf_counter() - start
+        _, ref_recall = score_clusters(reference, labels)
+        line += f" {exhaustive_s * 1000:>10.1f} {ref_recall:>7.3f}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,2000,5000,10000", help="corpus sizes (results)")
+    parser.add_argument("--copies", type=int, default=4, help="mean copies of a syndicated story")
+    parser.add_argument("--unique", type=float, default=0.4, help="share of stories published only once")
+    parser.add_argument("--similarity", type=float, default=near_duplicates.SIMILARITY,
+                        help="Jaccard similarity that makes two results copies")
+    parser.add_argument("--exhaustive-max", type=int, default=2000, help="largest size also run pairwise")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'results':>7} {'stories':>7} {'kept':>7} {'folded':>7} {'hash ms':>9} {'band ms':>9}"
+          f" {'total ms':>9} {'us/res':>7} {'prec':>6} {'recall':>6} {'pairwise ms':>10} {'recall':>7}")
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        run(size, args)
+    print("\nprec/recall: pairwise against the known stories; the last two columns compare every pair")
+
+
+if __name__ == "__main__":
+    main()
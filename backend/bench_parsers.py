@@ -0,0 +1,276 @@
+"""
+Micro-benchmark of the SERP parser backends against the original
+BeautifulSoup parsers of Bing, Google and the DDG html/lite pages.
+
+Parses every page saved in fixtures/serp/ (bing*.html, google*.html,
+ddg-html*.html, ddg-lite*.html; save a results page from the browser to add
+one). Engines without a saved page get a synthetic one shaped like the live
+page. Checks that every backend extracts the same results as the original
+BeautifulSoup parser while timing it.
+
+    python bench_parsers.py
+    python bench_parsers.py --runs 200 --max-results 10
+"""
+import argparse
+import glob
+import html
+import os
+import random
+import time
+from urllib.parse import unquote
+
+from bs4 import BeautifulSoup
+
+import serp_parser
+from async_providers import _is_ad, _unwrap_ddg_link, parse_bing_html, parse_ddg_html, parse_ddg_lite, parse_google_html
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "serp")
+
+
+def legacy_parse_bing(html_text, max_results):
+    """The BeautifulSoup parser Bing used before serp_parser."""
+    soup = BeautifulSoup(html_text, "html.parser")
+    results = []
+    for r in soup.find_all("li", class_="b_algo")[:max_results]:
+        title_tag = r.find("h2")
+        link_tag = r.find("a")
+        desc_tag = r.find("p")
+        if title_tag and link_tag:
+            results.append({
+                "title": title_tag.get_text(),
+                "url": link_tag.get("href"),
+                "description": desc_tag.get_text() if desc_tag else "",
+                "source": "Bing"
+            })
+    return results
+
+
+def legacy_parse_google(html_text, max_results):
+    """The BeautifulSoup parser Google used before serp_parser."""
+    soup = BeautifulSoup(html_text, "html.parser")
+    results = []
+    for block in soup.find_all("div", class_="ezO2md"):
+        link_tag = block.find("a", href=True)
+        title_tag = link_tag.find("span", class_="CVA68e") if link_tag else None
+        desc_tag = block.find("span", class_="FrIlee")
+        if not (link_tag and title_tag):
+            continue
+        results.append({
+            "title": title_tag.get_text(),
+            "url": unquote(link_tag["href"].split("&")[0].replace("/url?q=", "")),
+            "description": desc_tag.get_text() if desc_tag else "",
+            "source": "Google"
+        })
+        if len(results) >= max_results:
+            break
+    return results
+
+
+def legacy_parse_ddg_html(html_text, max_results):
+    """The BeautifulSoup parser DDG-html used before serp_parser."""
+    soup = BeautifulSoup(html_text, "html.parser")
+    results = []
+    for r in soup.select("div.result"):
+        link_tag = r.select_one("a.result__a")
+        if not link_tag:
+            continue
+        href = _unwrap_ddg_link(link_tag.get("href", ""))
+        if not href or _is_ad(href):
+            continue
+        desc_tag = r.select_one(".result__snippet")
+        results.append({
+            "title": link_tag.get_text(),
+            "url": href,
+            "description": desc_tag.get_text() if desc_tag else "",
+            "source": "DDG-html"
+        })
+        if len(results) >= max_results:
+            break
+    return results
+
+
+def legacy_parse_ddg_lite(html_text, max_results):
+    """The BeautifulSoup parser DDG-lite used before serp_parser."""
+    soup = BeautifulSoup(html_text, "html.parser")
+    results = []
+    for link_tag, desc_tag in zip(soup.select("a.result-link"), soup.select("td.result-snippet")):
+        href = _unwrap_ddg_link(link_tag.get("href", ""))
+        if not href or _is_ad(href):
+            continue
+        results.append({
+            "title": link_tag.get_text(),
+            "url": href,
+            "description": desc_tag.get_text().strip(),
+            "source": "DDG-lite"
+        })
+        if len(results) >= max_results:
+            break
+    return results
+
+
+LEGACY = {
+    "bing": legacy_parse_bing,
+    "google": legacy_parse_google,
+    "ddg-html": legacy_parse_ddg_html,
+    "ddg-lite": legacy_parse_ddg_lite,
+}
+PARSERS = {
+    "bing": parse_bing_html,
+    "google": parse_google_html,
+    "ddg-html": parse_ddg_html,
+    "ddg-lite": parse_ddg_lite,
+}
+
+
+def synthetic_bing_page(results=10, seed=1):
+    """A Bing-shaped page: head scripts and styles, ads, result blocks with nested markup."""
+    rng = random.Random(seed)
+    filler = "".join(f".c{i}{{margin:{i}px;padding:{i % 7}px}}" for i in range(3000))
+    script = "var _w={};" + "".join(f"_w.k{i}='{rng.random()}';" for i in range(3000))
+    blocks = []
+    for i in range(results):
+        title = html.escape(f"Jane Doe – Engineer & Speaker {i} | Site {rng.randint(1, 99)}")
+        desc = html.escape(f"Jane Doe's profile {i}: talks, “projects” and <posts>. " * 3)
+        blocks.append(
+            f'<li class="b_algo" data-id="{i}"><div class="b_tpcn"><a class="tilk" href="https://site{i}.example.com/jane">'
+            f'<div class="tpic"><img src="/th?id={i}" alt=""/></div><div class="tptxt">site{i}.example.com</div></a></div>'
+            f'<h2><a href="https://site{i}.example.com/jane" h="ID=SERP,{i}"><strong>Jane</strong> {title}</a></h2>'
+            f'<div class="b_caption"><p class="b_lineclamp2">{desc}<br>More</p>'
+            f'<div class="b_attribution"><cite>https://site{i}.example.com</cite></div></div></li>'
+        )
+    footer = '<a href="/x">link</a>' * 200
+    ad = '<li class="b_ad"><ul><li><h2><a href="https://ads.example.com">Ad</a></h2></li></ul></li>'
+    return (
+        f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Jane Doe - Search</title>'
+        f'<style>{filler}</style><script>{script}</script></head><body><header id="b_header">'
+        f'<form action="/search"><input name="q" value="Jane Doe"/></form></header><main><ol id="b_results">'
+        f'{ad}{"".join(blocks)}<li class="b_pag"><nav><a href="/search?q=Jane&first=11">Next</a></nav></li></ol>'
+        f'</main><footer>{footer}</footer><script>{script}</script></body></html>'
+    ).encode("utf-8")
+
+
+def synthetic_google_page(results=10, seed=1):
+    rng = random.Random(seed)
+    script = "".join(f"window.g{i}={rng.randint(0, 10**6)};" for i in range(3000))
+    footer = "<span>f</span>" * 300
+    blocks = "".join(
+        f'<div class="ezO2md"><div><a class="fuLhoc" href="/url?q=https://site{i}.example.com/jane&amp;sa=U&amp;ved={i}">'
+        f'<span class="CVA68e qXLe6d">Jane Doe {i} &amp; co</span><span class="qXLe6d dXDvrc">site{i}.example.com</span></a>'
+        f'</div><div><span class="qXLe6d FrIlee"><span class="fYyStc">Jane Doe\'s page {i}. ' + "More text. " * 5
+        + '</span></span></div></div>'
+        for i in range(results)
+    )
+    return (
+        f'<!doctype html><html><head><meta charset="UTF-8"><script>{script}</script></head><body>'
+        f'<div id="main">{blocks}</div><footer>{footer}</footer></body></html>'
+    ).encode("utf-8")
+
+
+def _ddg_link(i):
+    return f"//duckduckgo.com/l/?uddg=https%3A%2F%2Fsite{i}.example.com%2Fjane&amp;rut={i:064x}"
+
+
+def synthetic_ddg_html_page(results=10, seed=1):
+    """An html.duckduckgo.com-shaped page: an ad, then result blocks with nested divs and redirect links."""
+    rng = random.Random(seed)
+    style = "".join(f".r{i}{{margin:{i}px}}" for i in range(2000))
+    ad = ('<div class="result results_links result--ad"><div class="links_main result__body"><h2 class="result__title">'
+          '<a class="result__a" href="https://duckduckgo.com/y.js?ad_domain=ads.example.com">Ad</a></h2>'
+          '<a class="result__snippet" href="https://duckduckgo.com/y.js?ad=1">Buy now</a></div></div>')
+    blocks = "".join(
+        f'<div class="result results_links results_links_deep web-result"><div class="links_main links_deep result__body">'
+        f'<h2 class="result__title"><a rel="nofollow" class="result__a" href="{_ddg_link(i)}">Jane Doe {i} &amp; '
+        f'<b>Co</b> {rng.randint(1, 99)}</a></h2><div class="result__extras"><div class="result__extras__url">'
+        f'<a class="result__url" href="{_ddg_link(i)}">site{i}.example.com/jane</a></div></div>'
+        f'<a class="result__snippet" href="{_ddg_link(i)}"><b>Jane</b> Doe\'s page {i}. ' + "More text. " * 5
+        + '</a><div class="clear"></div></div></div>'
+        for i in range(results)
+    )
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><style>{style}</style></head><body>'
+        f'<div id="links" class="results">{ad}{blocks}<div class="nav-link"><form><input type="submit" value="Next"/>'
+        f'</form></div></div></body></html>'
+    ).encode("utf-8")
+
+
+def synthetic_ddg_lite_page(results=10, seed=1):
+    """A lite.duckduckgo.com-shaped page: a search form table, then one results table with rows per result."""
+    rng = random.Random(seed)
+    rows = "".join(
+        f'<tr><td valign="top">{i + 1}.&nbsp;</td><td><a rel="nofollow" href="{_ddg_link(i)}" class="result-link">'
+        f'Jane Doe {i} &amp; <b>Co</b> {rng.randint(1, 99)}</a></td></tr>'
+        f'<tr><td>&nbsp;&nbsp;&nbsp;</td><td class="result-snippet">\n  <b>Jane</b> Doe\'s page {i}. '
+        + "More text. " * 5 + '\n</td></tr>'
+        f'<tr><td>&nbsp;&nbsp;&nbsp;</td><td><span class="link-text">site{i}.example.com/jane</span></td></tr>'
+        '<tr><td>&nbsp;</td><td>&nbsp;</td></tr>'
+        for i in range(results)
+    )
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="UTF-8"><title>Jane Doe at DuckDuckGo</title></head><body>'
+        f'<form action="/lite/" method="post"><table class="query"><tr><td><input class="query" name="q" '
+        f'value="Jane Doe"></td><td><input class="submit" type="submit" value="Search"></td></tr></table></form>'
+        f'<table border="0">{rows}</table></body></html>'
+    ).encode("utf-8")
+
+
+SYNTHETIC = {
+    "bing": synthetic_bing_page,
+    "google": synthetic_google_page,
+    "ddg-html": synthetic_ddg_html_page,
+    "ddg-lite": synthetic_ddg_lite_page,
+}
+
+
+def load_pages():
+    """[(engine, label, bytes)] from fixtures/serp, with a synthetic page for engines that have none."""
+    pages = []
+    for engine in PARSERS:
+        saved = sorted(glob.glob(os.path.join(FIXTURE_DIR, f"{engine}*.html")))
+        for path in saved:
+            with open(path, "rb") as f:
+                pages.append((engine, os.path.basename(path), f.read()))
+        if not saved:
+            pages.append((engine, f"synthetic {engine}", SYNTHETIC[engine]()))
+    return pages
+
+
+def time_call(fn, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--max-results", type=int, default=25)
+    args = parser.parse_args()
+
+    backends = serp_parser.available_backends()
+    print(f"{'page':<24} {'KB':>6} {'parser':<24} {'ms/page':>8} {'speedup':>8} {'results':>7}  same")
+
+    for engine, label, content in load_pages():
+        parse = PARSERS[engine]
+        kb = len(content) / 1024
+
+        # The original parser decoded response.text and built the whole tree
+        legacy = LEGACY[engine]
+        reference = legacy(content.decode("utf-8"), args.max_results)
+        timings = [(
+            "original BeautifulSoup",
+            time_call(lambda: legacy(content.decode("utf-8"), args.max_results), args.runs),
+            reference,
+        )]
+        for backend in backends:
+            results = parse(content, args.max_results, backend=backend)
+            timings.append((backend, time_call(lambda: parse(content, args.max_results, backend=backend), args.runs), results))
+
+        baseline = timings[0][1]
+        for name, ms, results in timings:
+            same = "yes" if results == reference else "NO"
+            print(f"{label[:24]:<24} {kb:>6.0f} {name:<24} {ms:>8.2f} {baseline / ms:>7.1f}x {len(results):>7}  {same}")
+
+
+if __name__ == "__main__":
+    main()
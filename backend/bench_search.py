@@ -0,0 +1,194 @@
+"""
+Offline benchmark for the search pipeline.
+
+Runs deep_dive_search (thread pool), deep_dive_search_async and /api/search
+(in-process ASGI, no sockets) against local provider stand-ins and reports
+latency percentiles, provider queries per lookup and throughput at each
+concurrency level. No network access is needed.
+
+    python bench_search.py
+    python bench_search.py --modes async,api --concurrency 1,8,32 --latency 0.2 --error-rate 0.1
+    python bench_search.py --hedging both --tail-rate 0.1 --tail-latency 3   # slow tails, with and without hedging
+    python bench_search.py --fixtures fixtures/   # replay recorded answers
+    python bench_search.py --record fixtures/ --modes sync --lookups 1   # record live answers (needs network)
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import logging
+import os
+import time
+
+# Benchmark lookups should neither be answered from nor stored in the footprint index
+os.environ.setdefault("FOOTPRINT_INDEX", "0")
+
+import httpx
+
+import hedging
+import providers
+import search_logic
+from main import app
+from scheduler import PROVIDER_RATES, scheduler
+from stand_ins import fixture_providers, recording_providers, synthetic_providers
+
+_lookup_ids = itertools.count(1)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def next_subject():
+    # A fresh name per lookup so the result cache never short-circuits a run
+    n = next(_lookup_ids)
+    return f"Bench Person{n}", ""
+
+
+def run_sync(lookups, concurrency, query_budget):
+    def one():
+        name, extra = next_subject()
+        start = time.perf_counter()
+        search_logic.deep_dive_search(name, extra, query_budget=query_budget)
+        return time.perf_counter() - start
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda _: one(), range(lookups)))
+
+
+async def _run_concurrently(lookups, concurrency, one):
+    gate = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with gate:
+            return await one()
+
+    return await asyncio.gather(*(limited() for _ in range(lookups)))
+
+
+def run_async(lookups, concurrency, query_budget):
+    async def one():
+        name, extra = next_subject()
+        start = time.perf_counter()
+        await search_logic.deep_dive_search_async(name, extra, query_budget)
+        return time.perf_counter() - start
+
+    return asyncio.run(_run_concurrently(lookups, concurrency, one))
+
+
+def run_api(lookups, concurrency, query_budget):
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def one():
+                name, extra = next_subject()
+                start = time.perf_counter()
+                resp = await client.post("/api/search", json={"name": name, "extra_info": extra, "query_budget": query_budget})
+                resp.raise_for_status()
+                return time.perf_counter() - start
+
+            return await _run_concurrently(lookups, concurrency, one)
+
+    return asyncio.run(main())
+
+
+MODES = {
+    "sync": run_sync,
+    "async": run_async,
+    "api": run_api,
+}
+
+
+def provider_counters(stand_ins):
+    totals = {"calls": 0, "errors": 0, "rate_limited": 0}
+    for provider in stand_ins.values():
+        for key, value in provider.stats().items():
+            totals[key] += value
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="sync,async,api")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--lookups", type=int, default=10, help="lookups per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean stand-in latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="probability of a random 429")
+    parser.add_argument("--rate-limit-per-sec", type=float, default=None, help="stand-in 429s above this call rate")
+    parser.add_argument("--rate-scale", type=float, default=10.0,
+                        help="multiplier on the scheduler's provider rates (1 = production pacing)")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="probability a stand-in call stalls")
+    parser.add_argument("--tail-latency", type=float, default=3.0, help="how long a stalled call takes (s)")
+    parser.add_argument("--slow", default="",
+                        help="per-provider latency overrides, e.g. DDG-api=3,DDG-html=1.5")
+    parser.add_argument("--hedging", choices=["on", "off", "both"], default="on",
+                        help="race providers past their p90 (on) or try them one at a time (off)")
+    parser.add_argument("--query-budget", type=int, default=None)
+    parser.add_argument("--fixtures", help="replay <dir>/<provider>.json instead of synthetic results")
+    parser.add_argument("--record", help="record live provider answers to <dir>/<provider>.json")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    stand_in_options = dict(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        rate_limit_per_sec=args.rate_limit_per_sec,
+        seed=args.seed,
+        tail_rate=args.tail_rate,
+        tail_latency=args.tail_latency,
+    )
+    if args.record:
+        stand_ins = recording_providers(args.record)
+    elif args.fixtures:
+        stand_ins = fixture_providers(args.fixtures, **stand_in_options)
+    else:
+        stand_ins = synthetic_providers(**stand_in_options)
+    for override in filter(None, args.slow.split(",")):
+        name, latency = override.split("=")
+        stand_ins[name].latency = float(latency)
+
+    rates = {p: (rate * args.rate_scale, cap * max(1, int(args.rate_scale))) for p, (rate, cap) in PROVIDER_RATES.items()}
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    hedging_modes = {"on": [True], "off": [False], "both": [False, True]}[args.hedging]
+
+    print(f"{'mode':<6} {'hedge':>5} {'conc':>4} {'lookups':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+          f"{'q/lookup':>8} {'lookups/s':>9} {'errors':>6} {'429s':>5}")
+
+    with providers.use_providers(stand_ins):
+        for mode, hedge, concurrency in itertools.product(args.modes.split(","), hedging_modes, levels):
+            hedging.HEDGING_ENABLED = hedge
+            # Every run starts from a rested scheduler with closed circuits
+            # and no latency history
+            scheduler.reset(rates)
+            hedging.latency_tracker.reset()
+            before = provider_counters(stand_ins) if not args.record else None
+
+            start = time.perf_counter()
+            latencies = MODES[mode](args.lookups, concurrency, args.query_budget)
+            elapsed = time.perf_counter() - start
+
+            if args.record:
+                calls = errors = limited = 0
+            else:
+                after = provider_counters(stand_ins)
+                calls = after["calls"] - before["calls"]
+                errors = after["errors"] - before["errors"]
+                limited = after["rate_limited"] - before["rate_limited"]
+
+            print(f"{mode:<6} {'on' if hedge else 'off':>5} {concurrency:>4} {len(latencies):>7} "
+                  f"{percentile(latencies, 50):>7.3f} {percentile(latencies, 95):>7.3f} {percentile(latencies, 99):>7.3f} "
+                  f"{calls / len(latencies):>8.1f} {len(latencies) / elapsed:>9.2f} {errors:>6} {limited:>5}")
+
+
+if __name__ == "__main__":
+    main()
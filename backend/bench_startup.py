@@ -0,0 +1,140 @@
+"""
+Cold-start benchmark for the serverless entry point (api/index.py).
+
+Starts a fresh interpreter per run under `python -X importtime`, imports the
+app the way Vercel does, then sends the first requests straight to the ASGI
+app (no sockets, no test client) and reports import time, first-request
+latency and the slowest imports. Fails (exit status 1) when a provider
+dependency was imported before any search ran, or when the import takes
+longer than --max-import-ms, so it can guard against cold-start regressions.
+
+    python bench_startup.py
+    python bench_startup.py --runs 10 --paths /api/health,/ --max-import-ms 1500
+    python bench_startup.py --warm-up   # also time GET /api/warmup
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api")
+
+# Only needed once a search runs; importing any of these at startup is a regression
+LAZY_MODULES = [
+    "requests", "httpx", "duckduckgo_search", "bs4", "selectolax", "lxml", "async_providers", "numpy", "scipy",
+]
+
+CHILD = """
+import asyncio, json, sys, time
+sys.path.insert(0, {api_dir!r})
+
+start = time.perf_counter()
+import index
+import_seconds = time.perf_counter() - start
+lazy = {lazy!r}
+loaded_at_import = [m for m in lazy if m in sys.modules]
+
+
+async def call(path):
+    messages = []
+
+    async def receive():
+        return {{"type": "http.request", "body": b"", "more_body": False}}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {{
+        "type": "http", "asgi": {{"version": "3.0"}}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("localhost", 80),
+    }}
+    start = time.perf_counter()
+    await index.app(scope, receive, send)
+    return {{"path": path, "seconds": time.perf_counter() - start, "status": messages[0]["status"]}}
+
+
+async def main():
+    requests = [await call(path) for path in {paths!r}]
+    loaded = [m for m in lazy if m in sys.modules]
+    warm_up = await call("/api/warmup") if {warm_up!r} else None
+    return requests, loaded, warm_up
+
+requests, loaded, warm_up = asyncio.run(main())
+print(json.dumps({{
+    "import_seconds": import_seconds, "requests": requests, "warm_up": warm_up,
+    "loaded_at_import": loaded_at_import, "loaded_after_requests": loaded,
+}}))
+"""
+
+
+def parse_importtime(stderr):
+    """{module: (cumulative seconds, nesting depth)} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (int(cumulative) / 1e6, depth)
+    return modules
+
+
+def run_once(paths, warm_up):
+    env = dict(os.environ, FOOTPRINT_INDEX="0", PYTHONDONTWRITEBYTECODE="1")
+    code = CHILD.format(api_dir=API_DIR, lazy=LAZY_MODULES, paths=paths, warm_up=warm_up)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, env=env, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--paths", default="/api/health,/", help="first requests to time, in order")
+    parser.add_argument("--warm-up", action="store_true", help="also time GET /api/warmup")
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--top", type=int, default=12, help="slowest imports to list")
+    args = parser.parse_args()
+
+    paths = [p for p in args.paths.split(",") if p]
+    runs = [run_once(paths, args.warm_up) for _ in range(args.runs)]
+
+    import_ms = statistics.median(r["import_seconds"] for r in runs) * 1000
+    print(f"import api/index.py      {import_ms:8.1f} ms  (median of {len(runs)} cold starts)")
+    for i, path in enumerate(paths):
+        ms = statistics.median(r["requests"][i]["seconds"] for r in runs) * 1000
+        print(f"first GET {path:<14} {ms:8.1f} ms  (HTTP {runs[0]['requests'][i]['status']})")
+    if args.warm_up:
+        ms = statistics.median(r["warm_up"]["seconds"] for r in runs) * 1000
+        print(f"GET /api/warmup          {ms:8.1f} ms  (HTTP {runs[0]['warm_up']['status']})")
+
+    # Slowest imports of the last run, down to two levels below the entry point
+    imports = runs[-1]["imports"]
+    shallow = sorted(((s, name) for name, (s, depth) in imports.items() if depth <= 2), reverse=True)
+    print("\nslowest imports (cumulative, last run, including those made while serving):")
+    for seconds, name in shallow[:args.top]:
+        print(f"  {name:<32} {seconds * 1000:8.1f} ms")
+
+    failures = []
+    loaded = sorted({m for r in runs for m in r["loaded_at_import"] + r["loaded_after_requests"]})
+    if loaded:
+        failures.append(f"imported before any search: {', '.join(loaded)}")
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"import took {import_ms:.0f} ms (limit {args.max_import_ms:.0f} ms)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("\nok: no provider dependency imported at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Multi-process load test of the provider scheduler's state backends.
+
+Starts --workers processes, the way `uvicorn --workers N` does, and has each
+one send unique queries from --threads threads for --seconds against offline
+provider stand-ins. One stand-in (DDG-api) fails every call. For each
+SCHEDULER_BACKEND it reports:
+
+  - the calls every provider received from all workers together, against
+    the budget one host should spend (burst + rate x seconds)
+  - how many calls the failing provider took before its circuit was open
+    in every worker
+
+With "memory" each worker paces and trips breakers on its own, so the host
+sends about N times the budget. With "sqlite" the workers share one budget.
+It also times one scheduler round trip (plan, acquire, record) per backend.
+
+    python bench_workers.py
+    python bench_workers.py --workers 8 --threads 4 --seconds 10 --backends memory,sqlite
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+FAILING = "DDG-api"
+
+
+def worker(backend, path, rates, threads, seconds, start_at, results):
+    # A fresh interpreter (spawn): configure before importing the app modules
+    os.environ.update(SCHEDULER_BACKEND=backend, SCHEDULER_STATE_PATH=path, FOOTPRINT_INDEX="0",
+                      SEARCH_CACHE_BACKEND="memory")
+    sys.path.insert(0, BACKEND_DIR)
+    import logging
+    logging.disable(logging.CRITICAL)
+    from concurrent.futures import ThreadPoolExecutor
+
+    import providers
+    import search_logic
+    from scheduler import scheduler
+    from stand_ins import SyntheticProvider, synthetic_providers
+
+    stand_ins = synthetic_providers(latency=0.01)
+    stand_ins[FAILING] = SyntheticProvider(FAILING, error_rate=1.0)
+    # Keeps whatever the other workers already spent
+    scheduler.configure(rates)
+
+    def run(thread):
+        n = 0
+        while time.time() < start_at + seconds:
+            search_logic.fetch_raw_results(f"load {os.getpid()} {thread} {n}", 5, hedge=False)
+            n += 1
+        return n
+
+    with providers.use_providers(stand_ins):
+        time.sleep(max(0.0, start_at - time.time()))
+        with ThreadPoolExecutor(threads) as pool:
+            queries = sum(pool.map(run, range(threads)))
+    # Calls already queued for a token finish after the deadline
+    results.put({"queries": queries, "elapsed": time.time() - start_at,
+                 "calls": {name: p.calls for name, p in stand_ins.items()}})
+
+
+def run_backend(backend, args, rates):
+    path = os.path.join(tempfile.mkdtemp(prefix="stkl_bench_"), "scheduler.sqlite3")
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    # Leave time for every worker to import the app before the clock starts
+    start_at = time.time() + args.startup
+    procs = [
+        context.Process(target=worker, args=(backend, path, rates, args.threads, args.seconds, start_at, results))
+        for _ in range(args.workers)
+    ]
+    for proc in procs:
+        proc.start()
+    reports = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    calls = {}
+    for report in reports:
+        for name, n in report["calls"].items():
+            calls[name] = calls.get(name, 0) + n
+    queries = sum(r["queries"] for r in reports)
+    elapsed = max(r["elapsed"] for r in reports)
+    print(f"\n{backend}: {args.workers} workers x {args.threads} threads, {elapsed:.1f}s, {queries} queries")
+    print(f"  {'provider':<10} {'calls':>6} {'budget':>7} {'x budget':>8}")
+    for name, n in calls.items():
+        if name == FAILING:
+            print(f"  {name:<10} {n:>6} {'':>7} {'':>8}  (fails every call; breaker opens after {args.threshold})")
+            continue
+        rate, burst = rates[name]
+        budget = burst + rate * elapsed
+        print(f"  {name:<10} {n:>6} {budget:>7.0f} {n / budget:>8.2f}")
+
+
+def round_trip_us(backend, rounds):
+    """Mean time of plan + acquire + record_success on one provider, in microseconds."""
+    sys.path.insert(0, BACKEND_DIR)
+    from scheduler import MemorySchedulerState, ProviderScheduler, SQLiteSchedulerState
+
+    if backend == "sqlite":
+        state = SQLiteSchedulerState(os.path.join(tempfile.mkdtemp(prefix="stkl_bench_"), "scheduler.sqlite3"))
+    else:
+        state = MemorySchedulerState()
+    scheduler = ProviderScheduler({"p": (1e9, 1e9)}, state=state)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        scheduler.plan()
+        scheduler.acquire("p")
+        scheduler.record_success("p")
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4, help="concurrent queries per worker")
+    parser.add_argument("--seconds", type=float, default=8.0)
+    parser.add_argument("--backends", default="memory,sqlite")
+    parser.add_argument("--rate", type=float, default=2.0, help="tokens per second for every provider")
+    parser.add_argument("--burst", type=int, default=2)
+    parser.add_argument("--startup", type=float, default=3.0, help="seconds allowed for workers to start")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    from scheduler import FAILURE_THRESHOLD, PROVIDER_ORDER
+
+    args.threshold = FAILURE_THRESHOLD
+    rates = {name: (args.rate, args.burst) for name in PROVIDER_ORDER}
+    backends = [b for b in args.backends.split(",") if b]
+
+    print("scheduler round trip (plan + acquire + record), one process:")
+    for backend in backends:
+        print(f"  {backend:<7} {round_trip_us(backend, 2000):8.1f} us")
+    for backend in backends:
+        run_backend(backend, args, rates)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import logging
+import os
+import re
+
+# Tells apart the people who share the searched name. After fusion, every
+# result of a lookup becomes a TF-IDF vector of its title and
+# description (the name's own words left out, since every result has them).
+# Results whose vectors are close are linked, and the connected components
+# become candidate people. The subject is the component holding most of the
+# results that mention extra_info. Each result then gets a subject_confidence
+# in [0, 1]:
+#
+#   0.5 + (similarity to the subject - similarity to another person) / 2
+#
+# where a result mentioning extra_info counts as fully similar to the subject,
+# so it is never dropped. 0.5 means no evidence either way (e.g. a bare
+# "Jane Doe | Instagram" title); results below MIN_SUBJECT_CONFIDENCE sit with
+# another person's results and are dropped. Without extra_info, or when no
+# result mentions it, results are left as they are.
+#
+# numpy and scipy are imported on the first lookup (cold starts stay cheap);
+# without them the stage is skipped.
+
+DISAMBIGUATION_ENABLED = os.environ.get("DISAMBIGUATION", "1") != "0"
+MIN_SUBJECT_CONFIDENCE = float(os.environ.get("SUBJECT_MIN_CONFIDENCE", 0.35))
+# Cosine similarity at which two results are taken to describe the same person
+LINK_SIMILARITY = float(os.environ.get("DISAMBIGUATION_LINK_SIMILARITY", 0.3))
+# Components smaller than this are not counted as another person
+MIN_PERSON_RESULTS = 2
+
+_WORD = re.compile(r"[^\W\d_]{3,}")
+
+# Words that say where a result was found, not who it is about
+STOP_WORDS = frozenset("""
+the and for with from that this are was were has have had not but you your our his her their its
+about into over more most also than then they them who what when where which will would can
+linkedin instagram facebook twitter youtube tiktok github com www http https html
+profile profiles followers following photos videos posts view views see join sign log login
+official page account likes people connections
+""".split())
+
+_np = None
+_sparse = None
+
+
+def load():
+    """numpy and scipy.sparse, or False when they are not installed."""
+    global _np, _sparse
+    if _np is None:
+        try:
+            import numpy
+            from scipy import sparse
+            from scipy.sparse import csgraph  # noqa: F401 (loads the submodule)
+        except ImportError:
+            logging.warning("numpy/scipy not installed; subject disambiguation is off")
+            _np = _sparse = False
+        else:
+            _np, _sparse = numpy, sparse
+    return _np
+
+
+def tokens(text, skip=frozenset()):
+    return [w for w in _WORD.findall(text.lower()) if w not in STOP_WORDS and w not in skip]
+
+
+def _term_matrix(docs, vocabulary, grow=True):
+    """
+    CSR matrix of sublinear term frequencies, one row per token list, with
+    one column per word of `vocabulary` (a dict, extended when `grow`).
+    """
+    np, sparse = _np, _sparse
+    indptr = [0]
+    indices = []
+    for doc in docs:
+        if grow:
+            indices.extend(vocabulary.setdefault(t, len(vocabulary)) for t in doc)
+        else:
+            indices.extend(vocabulary[t] for t in doc if t in vocabulary)
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices)), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int32)),
+        shape=(len(docs), max(len(vocabulary), 1)),
+    )
+    matrix.sum_duplicates()
+    np.log1p(matrix.data, out=matrix.data)
+    return matrix
+
+
+def _weigh_rows(matrix, idf):
+    """Scales every column by its idf and every row to unit length, in place."""
+    np = _np
+    matrix.data *= idf[matrix.indices]
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    norms = np.sqrt(np.bincount(rows, weights=matrix.data ** 2, minlength=matrix.shape[0]))
+    norms[norms == 0] = 1.0
+    matrix.data /= norms[rows]
+    return matrix
+
+
+def subject_confidence(texts, name, extra_info, link_similarity=LINK_SIMILARITY):
+    """
+    Confidence in [0, 1] that each of `texts` describes the person `name`
+    identified by `extra_info`, as a numpy array, or None when it cannot be
+    told (no extra_info, no numpy/scipy, or no result mentions extra_info).
+    """
+    if not extra_info or not texts or not load():
+        return None
+    np, sparse = _np, _sparse
+
+    name_words = frozenset(name.lower().split())
+    vocabulary = {}
+    counts = _term_matrix([tokens(t, name_words) for t in texts], vocabulary)
+    # Results mentioning extra_info (any of its words) are about the subject
+    anchor = [vocabulary[w] for w in tokens(extra_info, name_words) if w in vocabulary]
+    if not anchor:
+        return None
+    mentions = (counts[:, anchor].getnnz(axis=1) > 0).astype(float)
+
+    # Words in every result of the lookup say nothing about which person it is
+    df = np.bincount(counts.indices, minlength=counts.shape[1])
+    vectors = _weigh_rows(counts, np.log((1 + len(texts)) / (1 + df)))
+
+    # Candidate people: connected components of the similarity graph
+    links = (vectors @ vectors.T) >= link_similarity
+    n_people, labels = sparse.csgraph.connected_components(links, directed=False)
+    membership = sparse.csr_matrix(
+        (np.ones(len(texts)), (labels, np.arange(len(texts)))), shape=(n_people, len(texts)),
+    )
+    sizes = np.asarray(membership.sum(axis=1)).ravel()
+    centroids = _weigh_rows((membership @ vectors).tocsr(), np.ones(vectors.shape[1]))
+
+    # The subject is the person most results mentioning extra_info belong to
+    # (ties: the larger share of its results mentioning it)
+    mentioned = membership @ mentions
+    subject = int(np.argmax(mentioned + mentioned / sizes))
+
+    to_people = (vectors @ centroids.T).toarray()
+    to_subject = np.maximum(to_people[:, subject], mentions)
+    others = (sizes >= MIN_PERSON_RESULTS) & (np.arange(n_people) != subject)
+    to_others = to_people[:, others].max(axis=1) if others.any() else np.zeros(len(texts))
+    return np.clip(0.5 + (to_subject - to_others) / 2, 0.0, 1.0)
+
+
+def disambiguate(structured_results, name, extra_info, min_confidence=MIN_SUBJECT_CONFIDENCE):
+    """
+    Sets subject_confidence on every ResultRecord of a fused lookup
+    ({category: [ResultRecord]}) and drops those below min_confidence.
+    Returns the number dropped. Records are left untouched when the subject
+    cannot be told apart (see subject_confidence).
+    """
+    records = [r for items in structured_results.values() for r in items]
+    confidence = subject_confidence([f"{r.title} {r.description}" for r in records], name, extra_info)
+    if confidence is None:
+        return 0
+
+    dropped = set()
+    for record, value in zip(records, confidence.tolist()):
+        record.subject_confidence = round(value, 3)
+        if value < min_confidence:
+            dropped.add(id(record))
+    if dropped:
+        for cat, items in structured_results.items():
+            structured_results[cat] = [r for r in items if id(r) not in dropped]
+    return len(dropped)
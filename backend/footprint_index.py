@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from fusion import canonicalize_url
+from near_duplicates import NEAR_DUPLICATES_ENABLED, collapse as collapse_near_duplicates
+from query_planner import CATEGORY_NAMES
+from result_cache import normalize_query
+
+# Everything a lookup finds is kept per subject (name + extra_info), so a
+# repeat lookup can answer from disk and only re-run the categories that
+# have gone stale. An FTS5 table over titles, descriptions and URLs makes
+# previously collected footprints searchable.
+INDEX_ENABLED = os.environ.get("FOOTPRINT_INDEX", "1") != "0"
+INDEX_PATH = os.environ.get("FOOTPRINT_INDEX_PATH", "/tmp/stkl_footprints.sqlite3")
+# A category is re-run once its last refresh is older than this
+STALE_AFTER = float(os.environ.get("FOOTPRINT_STALE_AFTER", 24 * 60 * 60))
+
+
+def subject_key(name, extra_info=""):
+    return f"{normalize_query(name)}|{normalize_query(extra_info)}"
+
+
+class FootprintIndex:
+    """
+    SQLite store of every result seen per subject: one row per canonical URL
+    with its latest title, description, score and category (plus every category
+    it was ever found in), and when it was first and last seen. Thread-safe.
+    """
+
+    def __init__(self, path=INDEX_PATH, stale_after=STALE_AFTER):
+        self.path = path
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS subjects (
+                key TEXT PRIMARY KEY, name TEXT NOT NULL, extra_info TEXT NOT NULL,
+                created_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS category_refreshes (
+                subject TEXT NOT NULL, category TEXT NOT NULL, refreshed_at REAL NOT NULL,
+                PRIMARY KEY (subject, category));
+            CREATE TABLE IF NOT EXISTS footprints (
+                id INTEGER PRIMARY KEY, subject TEXT NOT NULL, url_key TEXT NOT NULL,
+                url TEXT NOT NULL, title TEXT NOT NULL, description TEXT NOT NULL,
+                category TEXT NOT NULL, categories TEXT NOT NULL, score REAL NOT NULL, result TEXT NOT NULL,
+                first_seen REAL NOT NULL, last_seen REAL NOT NULL,
+                UNIQUE (subject, url_key));
+            CREATE VIRTUAL TABLE IF NOT EXISTS footprints_fts USING fts5(
+                title, description, url, content='footprints', content_rowid='id');
+            CREATE TRIGGER IF NOT EXISTS footprints_ai AFTER INSERT ON footprints BEGIN
+                INSERT INTO footprints_fts(rowid, title, description, url)
+                VALUES (new.id, new.title, new.description, new.url);
+            END;
+            CREATE TRIGGER IF NOT EXISTS footprints_ad AFTER DELETE ON footprints BEGIN
+                INSERT INTO footprints_fts(footprints_fts, rowid, title, description, url)
+                VALUES ('delete', old.id, old.title, old.description, old.url);
+            END;
+            CREATE TRIGGER IF NOT EXISTS footprints_au AFTER UPDATE ON footprints BEGIN
+                INSERT INTO footprints_fts(footprints_fts, rowid, title, description, url)
+                VALUES ('delete', old.id, old.title, old.description, old.url);
+                INSERT INTO footprints_fts(rowid, title, description, url)
+                VALUES (new.id, new.title, new.description, new.url);
+            END;
+        """)
+        self._conn.commit()
+
+    def record(self, name, extra_info, results, categories):
+        """
+        Merges a lookup's {category: [result dicts]} into the subject's
+        footprint and marks `categories` (the ones the lookup ran) refreshed.
+        """
+        key = subject_key(name, extra_info)
+        now = time.time()
+
+        # Fused results hold one record per canonical URL, listed under its
+        # main category and carrying every category that found it
+        merged = {}
+        for category, items in results.items():
+            for item in items:
+                merged[canonicalize_url(item["url"])] = (category, item)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO subjects (key, name, extra_info, created_at) VALUES (?, ?, ?, ?)",
+                (key, name, extra_info, now),
+            )
+            for url_key, (category, item) in merged.items():
+                found_in = list(item.get("categories") or [category])
+                row = self._conn.execute(
+                    "SELECT categories FROM footprints WHERE subject = ? AND url_key = ?", (key, url_key)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        "INSERT INTO footprints (subject, url_key, url, title, description, category,"
+                        " categories, score, result, first_seen, last_seen)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, url_key, item["url"], item["title"], item["description"], category,
+                         json.dumps(found_in), item.get("_score", 0), json.dumps(item), now, now),
+                    )
+                else:
+                    categories_seen = json.loads(row[0])
+                    categories_seen += [c for c in found_in if c not in categories_seen]
+                    self._conn.execute(
+                        "UPDATE footprints SET url = ?, title = ?, description = ?, category = ?,"
+                        " categories = ?, score = ?, result = ?, last_seen = ?"
+                        " WHERE subject = ? AND url_key = ?",
+                        (item["url"], item["title"], item["description"], category, json.dumps(categories_seen),
+                         item.get("_score", 0), json.dumps(item), now, key, url_key),
+                    )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO category_refreshes (subject, category, refreshed_at) VALUES (?, ?, ?)",
+                [(key, category, now) for category in categories],
+            )
+            self._conn.commit()
+        logging.info(f"Indexed {len(merged)} footprints for {name}")
+
+    def results(self, name, extra_info=""):
+        """
+        The subject's footprint in the /api/search shape ({category: [results]},
+        best score first), or None if the subject was never looked up.
+        """
+        key = subject_key(name, extra_info)
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM subjects WHERE key = ?", (key,)).fetchone() is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT result, category, categories, first_seen, last_seen FROM footprints"
+                " WHERE subject = ? ORDER BY score DESC, url",
+                (key,),
+            ).fetchall()
+
+        structured = {cat: [] for cat in CATEGORY_NAMES}
+        for result, category, categories, first_seen, last_seen in rows:
+            item = json.loads(result)
+            item["categories"] = json.loads(categories)
+            item["first_seen"] = first_seen
+            item["last_seen"] = last_seen
+            structured.setdefault(category, []).append(item)
+        # Copies found by different lookups are folded like a live lookup's
+        if NEAR_DUPLICATES_ENABLED:
+            collapse_near_duplicates(structured)
+        return structured
+
+    def refreshed(self, name, extra_info=""):
+        """{category: last refresh time} for the subject."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT category, refreshed_at FROM category_refreshes WHERE subject = ?",
+                (subject_key(name, extra_info),),
+            ).fetchall()
+        return dict(rows)
+
+    def stale_categories(self, name, extra_info=""):
+        """Categories never run for the subject or not refreshed within stale_after."""
+        refreshed = self.refreshed(name, extra_info)
+        cutoff = time.time() - self.stale_after
+        return [cat for cat in CATEGORY_NAMES if refreshed.get(cat, 0) < cutoff]
+
+    def search(self, text, limit=50):
+        """
+        Full-text search over every collected footprint. Returns the matching
+        results with the subject they belong to, best match first.
+        """
+        # Quote each word so user input is never parsed as FTS5 syntax
+        terms = " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+        if not terms:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT s.name, s.extra_info, f.url, f.title, f.description, f.categories,"
+                " f.score, f.first_seen, f.last_seen"
+                " FROM footprints_fts JOIN footprints f ON f.id = footprints_fts.rowid"
+                " JOIN subjects s ON s.key = f.subject"
+                " WHERE footprints_fts MATCH ? ORDER BY bm25(footprints_fts) LIMIT ?",
+                (terms, limit),
+            ).fetchall()
+        return [
+            {
+                "subject": {"name": name, "extra_info": extra_info},
+                "url": url,
+                "title": title,
+                "description": description,
+                "categories": json.loads(categories),
+                "_score": score,
+                "first_seen": first_seen,
+                "last_seen": last_seen,
+            }
+            for name, extra_info, url, title, description, categories, score, first_seen, last_seen in rows
+        ]
+
+    def stats(self):
+        with self._lock:
+            subjects = self._conn.execute("SELECT COUNT(*) FROM subjects").fetchone()[0]
+            footprints = self._conn.execute("SELECT COUNT(*) FROM footprints").fetchone()[0]
+        return {"subjects": subjects, "footprints": footprints}
+
+
+def create_index():
+    if not INDEX_ENABLED:
+        return None
+    try:
+        return FootprintIndex()
+    except Exception as e:
+        # e.g. a read-only filesystem or SQLite built without FTS5
+        logging.error(f"Footprint index unavailable: {e}")
+        return None
+
+
+# Shared by every request in this process (None when disabled)
+footprint_index = create_index()
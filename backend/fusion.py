@@ -0,0 +1,124 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from scoring import score_result
+
+# Standard reciprocal-rank-fusion constant
+RRF_K = 60
+
+# Query parameters that only identify the click, never the page
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "igshid", "igsh", "si", "ref", "ref_src",
+    "ref_url", "trk", "trkinfo", "originalsubdomain", "feature", "mc_cid", "mc_eid",
+}
+
+MOBILE_PREFIXES = ("m.", "mobile.", "touch.")
+
+
+def canonicalize_url(url):
+    """
+    Reduces a URL to the form used for deduplication: no scheme, no www. or
+    mobile subdomain, no fragment (including #:~:text=), no tracking
+    parameters, sorted query string and no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if "@" in host:
+        host = host.rsplit("@", 1)[1]
+    if host.endswith(":80") or host.endswith(":443"):
+        host = host.rsplit(":", 1)[0]
+    if host.startswith("www."):
+        host = host[4:]
+    for prefix in MOBILE_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+
+    params = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    query = urlencode(sorted(params))
+
+    path = parts.path.rstrip("/")
+    canonical = f"{host}{path}"
+    if query:
+        canonical += f"?{query}"
+    # Case-insensitive like the old normalize_url
+    return canonical.lower()
+
+
+class ResultFusion:
+    """
+    Collects every query's ranked list and merges them with reciprocal-rank
+    fusion. The final output only depends on which queries returned what, not
+    on the order their futures finished in.
+    """
+
+    def __init__(self, categories, k=RRF_K):
+        self.k = k
+        # (query, category) -> position in the query plan, used for tie-breaks
+        self.order = {}
+        for cat, queries in categories.items():
+            for q in queries:
+                self.order.setdefault((q, cat), len(self.order))
+        self.categories = categories
+        self.category_names = list(categories)
+        self.hits = {}  # canonical url -> [(query, category, record)]
+
+    def add(self, query, category, records):
+        """
+        Records one query's results. Returns the records whose URL had not
+        been seen yet (provisionally scored), for incremental streaming.
+        """
+        new_records = []
+        for record in records:
+            key = canonicalize_url(record.url)
+            hits = self.hits.setdefault(key, [])
+            hits.append((query, category, record))
+            if len(hits) == 1:
+                record.category = category
+                record.categories = [category]
+                record.queries = [query]
+                record.rrf = 1.0 / (self.k + record.rank)
+                score_result(record)
+                new_records.append(record)
+        return new_records
+
+    def _representative(self, hits):
+        # Best match wins; ties go to the best provider rank, then plan order
+        return min(hits, key=lambda h: (
+            not h[2].exact,
+            -len(h[2].matched_words),
+            h[2].rank,
+            self.order.get((h[0], h[1]), len(self.order)),
+        ))
+
+    def fuse(self):
+        """
+        Returns {category: [ResultRecord]} with one record per canonical URL,
+        each carrying every category and query that found it, sorted by score.
+        """
+        structured_results = {cat: [] for cat in self.category_names}
+
+        for hits in self.hits.values():
+            query, category, record = self._representative(hits)
+            ordered = sorted(hits, key=lambda h: self.order.get((h[0], h[1]), len(self.order)))
+
+            record.category = category
+            record.queries = []
+            record.categories = []
+            for q, cat, _ in ordered:
+                if q not in record.queries:
+                    record.queries.append(q)
+                if cat not in record.categories:
+                    record.categories.append(cat)
+            best_rank = {}
+            for q, cat, r in hits:
+                best_rank[(q, cat)] = min(r.rank, best_rank.get((q, cat), r.rank))
+            record.rrf = sum(1.0 / (self.k + rank) for rank in best_rank.values())
+            score_result(record)
+            structured_results.setdefault(category, []).append(record)
+
+        for cat in structured_results:
+            structured_results[cat].sort(key=lambda r: (-r.score, r.url))
+        return structured_results
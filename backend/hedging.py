@@ -0,0 +1,251 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import logging
+import os
+import threading
+import time
+
+# Hedged provider requests: instead of waiting for each provider to fail
+# before trying the next one, the next provider is started as soon as the
+# current one has been running longer than it usually takes to answer. The
+# first non-empty answer wins and the rest are cancelled. An attempt that
+# first has to wait for a rate-limit token says so (token_wait), and its
+# hedge delay only starts once the token is due.
+
+HEDGING_ENABLED = os.environ.get("SEARCH_HEDGING", "1") != "0"
+
+# Upper bound on the time one query may spend across all its providers
+QUERY_DEADLINE = float(os.environ.get("SEARCH_QUERY_DEADLINE", 20.0))
+
+# Hedge delay = the provider's p90 answer time, clamped to these bounds.
+# Until enough answers have been seen DEFAULT_HEDGE_DELAY is used.
+HEDGE_PERCENTILE = 90
+DEFAULT_HEDGE_DELAY = 2.0
+MIN_HEDGE_DELAY = 0.25
+MAX_HEDGE_DELAY = 8.0
+MIN_SAMPLES = 5
+LATENCY_WINDOW = 200
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent answer times per provider. Thread-safe, so the
+    sync and async paths feed the same numbers.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, provider, seconds):
+        with self._lock:
+            self._samples[provider].append(seconds)
+
+    def percentile(self, provider, pct):
+        """Nearest-rank percentile of the provider's recent answers, or None if too few."""
+        with self._lock:
+            samples = sorted(self._samples.get(provider, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, max(0, round(pct / 100 * len(samples) + 0.5) - 1))
+        return samples[index]
+
+    def hedge_delay(self, provider):
+        """How long to give the provider before starting the next one."""
+        p90 = self.percentile(provider, HEDGE_PERCENTILE)
+        if p90 is None:
+            return DEFAULT_HEDGE_DELAY
+        return min(MAX_HEDGE_DELAY, max(MIN_HEDGE_DELAY, p90))
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def snapshot(self):
+        with self._lock:
+            providers = list(self._samples)
+        snapshot = {}
+        for p in providers:
+            p50 = self.percentile(p, 50)
+            p90 = self.percentile(p, HEDGE_PERCENTILE)
+            snapshot[p] = {
+                "samples": len(self._samples[p]),
+                "p50": round(p50, 3) if p50 is not None else None,
+                "p90": round(p90, 3) if p90 is not None else None,
+                "hedge_delay": round(self.hedge_delay(p), 3),
+            }
+        return snapshot
+
+
+# Shared by every request in this process
+latency_tracker = LatencyTracker()
+
+
+class _AttemptClock:
+    """The deadline of the race an attempt runs in and when its hedge delay runs out."""
+
+    def __init__(self, end, delay):
+        self.end = end
+        self.delay = delay
+        # Until the attempt reports a token wait, the delay counts from launch
+        self.ready_at = time.monotonic()
+
+    @property
+    def hedge_at(self):
+        return self.ready_at + self.delay
+
+
+# The clock of the attempt running in this context, set by race()/race_async()
+_attempt_clock = contextvars.ContextVar("attempt_clock", default=None)
+
+
+def time_left():
+    """Seconds left before the running race's deadline, or None outside a race."""
+    clock = _attempt_clock.get()
+    if clock is None:
+        return None
+    return max(0.0, clock.end - time.monotonic())
+
+
+def token_wait(seconds):
+    """
+    Called by an attempt that has to wait `seconds` for its rate-limit token:
+    the next provider is only started once it has had its hedge delay after that.
+    """
+    clock = _attempt_clock.get()
+    if clock is not None:
+        clock.ready_at = time.monotonic() + seconds
+
+
+def _next_candidate(remaining, running, group_of):
+    """
+    Pops the next candidate, preferring one outside the groups still running:
+    a hedge against a stalled DDG backend should go to another engine, not
+    queue behind it for the same host.
+    """
+    if not remaining:
+        return None
+    busy = {group_of(p) for p in running}
+    for i, provider in enumerate(remaining):
+        if group_of(provider) not in busy:
+            return remaining.pop(i)
+    return remaining.pop(0)
+
+
+def _same_provider(provider):
+    return provider
+
+
+async def race_async(candidates, attempt, delay_for=latency_tracker.hedge_delay, deadline=QUERY_DEADLINE,
+                     group_of=_same_provider):
+    """
+    Runs the coroutine attempt(provider) for candidates in order. The next
+    candidate starts when the newest attempt has been running for
+    delay_for(provider) past its token (see token_wait), or right away when an
+    attempt comes back empty or failed (attempt returns None). Returns (provider, results) for the first
+    non-empty answer and cancels the others; (None, []) if nothing answered
+    before the deadline. group_of maps providers that share a backend to one
+    key so hedges go elsewhere first.
+    """
+    end = time.monotonic() + deadline
+    remaining = list(candidates)
+    pending = {}
+    newest = None
+
+    async def run(clock, provider):
+        # The task runs in a copy of the context, so this stays with the attempt
+        _attempt_clock.set(clock)
+        return await attempt(provider)
+
+    def launch():
+        provider = _next_candidate(remaining, pending.values(), group_of)
+        if provider is None:
+            return None
+        clock = _AttemptClock(end, delay_for(provider))
+        pending[asyncio.ensure_future(run(clock, provider))] = provider
+        return clock
+
+    try:
+        newest = launch()
+        while pending:
+            now = time.monotonic()
+            if now >= end:
+                logging.warning(f"Query deadline of {deadline:g}s reached with {len(pending)} provider(s) still running")
+                break
+            timeout = end - now if newest is None else min(end, newest.hedge_at) - now
+            done, _ = await asyncio.wait(pending, timeout=max(timeout, 0), return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                provider = pending.pop(task)
+                results = task.result()
+                if results:
+                    return provider, results
+
+            # Something came back empty, or the newest attempt is overdue: hedge
+            if done or (newest is not None and time.monotonic() >= newest.hedge_at):
+                if not done:
+                    logging.info(f"Hedging: {list(pending.values())[-1]} is slow, starting the next provider")
+                newest = launch()
+                if newest is None and not pending:
+                    break
+        return None, []
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+def race(candidates, attempt, executor, delay_for=latency_tracker.hedge_delay, deadline=QUERY_DEADLINE,
+         group_of=_same_provider):
+    """
+    Thread-pool version of race_async. Attempts run on `executor`; losers that
+    already started cannot be interrupted, so they finish in the background
+    (their answers still reach the result cache) and are simply ignored.
+    """
+    end = time.monotonic() + deadline
+    remaining = list(candidates)
+    pending = {}
+    newest = None
+
+    def launch():
+        provider = _next_candidate(remaining, pending.values(), group_of)
+        if provider is None:
+            return None
+        clock = _AttemptClock(end, delay_for(provider))
+        # Carry the caller's context (e.g. its request trace) into the worker
+        context = contextvars.copy_context()
+        context.run(_attempt_clock.set, clock)
+        pending[executor.submit(context.run, attempt, provider)] = provider
+        return clock
+
+    try:
+        newest = launch()
+        while pending:
+            now = time.monotonic()
+            if now >= end:
+                logging.warning(f"Query deadline of {deadline:g}s reached with {len(pending)} provider(s) still running")
+                break
+            timeout = end - now if newest is None else min(end, newest.hedge_at) - now
+            done, _ = concurrent.futures.wait(pending, timeout=max(timeout, 0),
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                provider = pending.pop(future)
+                results = future.result()
+                if results:
+                    return provider, results
+
+            if done or (newest is not None and time.monotonic() >= newest.hedge_at):
+                if not done:
+                    logging.info(f"Hedging: {list(pending.values())[-1]} is slow, starting the next provider")
+                newest = launch()
+                if newest is None and not pending:
+                    break
+        return None, []
+    finally:
+        for future in pending:
+            future.cancel()
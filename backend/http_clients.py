@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import queue
+import random
+import threading
+import weakref
+from contextlib import contextmanager
+
+# httpx, requests and duckduckgo_search are imported when the first client is
+# created, so cold starts that never search (health checks, serverless
+# warm-up pings) do not pay for them.
+
+# Rotational User-Agents to bypass scrapers
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
+]
+
+DEFAULT_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9"
+}
+
+
+def session_headers():
+    """Default headers with one User-Agent picked for the lifetime of a session."""
+    headers = dict(DEFAULT_HEADERS)
+    headers["User-Agent"] = random.choice(USER_AGENTS)
+    return headers
+
+
+# One pooled client per event loop. httpx connection pools are bound to the
+# loop that created them, so every loop (the app's, a job or script calling
+# asyncio.run()) gets its own client instead of reusing one whose connections
+# belong to another, possibly closed, loop. Clients of loops that are gone
+# are dropped with them.
+_async_clients = weakref.WeakKeyDictionary()  # loop -> httpx.AsyncClient
+
+
+def get_async_client():
+    """
+    Returns the httpx.AsyncClient shared by all async providers on the running
+    event loop. Keep-alive connections are reused across queries and across requests.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        import httpx
+
+        # Loops closed without calling close_async_client() leave their client behind
+        for old_loop in [l for l in list(_async_clients) if l.is_closed()]:
+            _async_clients.pop(old_loop, None)
+        client = _async_clients[loop] = httpx.AsyncClient(
+            headers=session_headers(),
+            timeout=httpx.Timeout(10.0),
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        )
+        logging.info("Created shared async HTTP client")
+    return client
+
+
+async def close_async_client():
+    """Closes the running loop's client (called on app shutdown)."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+# ---------------------------------------------------------------------------
+# Sync provider clients (thread-pool path)
+# ---------------------------------------------------------------------------
+
+# Idle clients kept per provider; matches the thread pool size with headroom
+MAX_IDLE_CLIENTS = 4
+
+
+def new_session():
+    """
+    requests.Session with a keep-alive pool and its own User-Agent.
+    Retries are left to the scheduler's provider fallback.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(session_headers())
+    return session
+
+
+def new_ddgs():
+    from duckduckgo_search import DDGS
+
+    return DDGS(timeout=10)
+
+
+class ProviderClientRegistry:
+    """
+    Long-lived clients per provider, handed out one caller at a time.
+    lease() checks a client out of the provider's idle pool (creating one if
+    the pool is empty) and puts it back afterwards, so concurrent workers never
+    share a client mid-request. A client whose request raised is closed and
+    dropped instead, so the next lease starts a fresh session with a new
+    User-Agent, e.g. after a block.
+    """
+
+    def __init__(self, factories, max_idle=MAX_IDLE_CLIENTS):
+        self.factories = factories
+        self.max_idle = max_idle
+        self._idle = {p: queue.LifoQueue() for p in factories}
+        self._lock = threading.Lock()
+        self.created = {p: 0 for p in factories}
+        self.recycled = {p: 0 for p in factories}
+
+    def _checkout(self, provider):
+        try:
+            return self._idle[provider].get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self.created[provider] += 1
+            return self.factories[provider]()
+
+    def _checkin(self, provider, client):
+        if self._idle[provider].qsize() < self.max_idle:
+            self._idle[provider].put(client)
+        else:
+            _close(client)
+
+    @contextmanager
+    def lease(self, provider):
+        client = self._checkout(provider)
+        try:
+            yield client
+        except BaseException:
+            self.recycle(provider, client)
+            raise
+        else:
+            self._checkin(provider, client)
+
+    def recycle(self, provider, client):
+        with self._lock:
+            self.recycled[provider] += 1
+        _close(client)
+
+    def close(self):
+        for pool in self._idle.values():
+            while not pool.empty():
+                _close(pool.get_nowait())
+
+    def stats(self):
+        return {
+            p: {"idle": self._idle[p].qsize(), "created": self.created[p], "recycled": self.recycled[p]}
+            for p in self.factories
+        }
+
+
+def _close(client):
+    try:
+        if hasattr(client, "close"):
+            client.close()
+        elif hasattr(client, "__exit__"):
+            client.__exit__(None, None, None)
+    except Exception as e:
+        logging.debug(f"Error closing client: {e}")
+
+
+# Shared by every thread in this process
+sync_clients = ProviderClientRegistry({
+    "DDG-api": new_ddgs,
+    "DDG-html": new_ddgs,
+    "DDG-lite": new_ddgs,
+    "Google": new_session,
+    "Bing": new_session,
+    "Wikipedia": new_session,
+    "Profiles": new_session,
+})
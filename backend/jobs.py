@@ -0,0 +1,263 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from search_logic import deep_dive_search_stream, lookup_key
+
+# Background deep-dive lookups: POST /api/jobs answers with a job id right
+# away, a bounded pool of workers runs the lookup and clients poll
+# GET /api/jobs/{id} for status and the results found so far.
+JOB_STORE_BACKEND = os.environ.get("JOB_STORE_BACKEND", "memory")  # memory | sqlite
+JOB_STORE_PATH = os.environ.get("JOB_STORE_PATH", "/tmp/stkl_jobs.sqlite3")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+# Finished jobs are kept this long for polling, then purged
+JOB_TTL = float(os.environ.get("JOB_TTL", 60 * 60))
+# An unfinished job not updated for this long is assumed lost (e.g. its
+# worker process died) and no longer absorbs identical submissions
+JOB_STALE_SECONDS = float(os.environ.get("JOB_STALE_SECONDS", 10 * 60))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class MemoryJobStore:
+    """In-process job table. Lost on restart and not shared between workers."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def save(self, job):
+        with self._lock:
+            self._jobs[job["id"]] = json.loads(json.dumps(job))
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+    def find_active(self, key, since):
+        with self._lock:
+            for job in self._jobs.values():
+                if job["key"] == key and job["status"] in ACTIVE_STATUSES and job["updated_at"] >= since:
+                    return dict(job)
+        return None
+
+    def purge(self, before):
+        with self._lock:
+            for job_id in [j["id"] for j in self._jobs.values()
+                           if j["status"] not in ACTIVE_STATUSES and j["updated_at"] < before]:
+                del self._jobs[job_id]
+
+    def __len__(self):
+        return len(self._jobs)
+
+
+class SQLiteJobStore:
+    """
+    Job table in a SQLite file, so every worker process behind the load
+    balancer can answer a poll and coalesce onto a job another one is running.
+    """
+
+    def __init__(self, path=JOB_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, key TEXT NOT NULL, status TEXT NOT NULL,"
+            " updated_at REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs(key, status)")
+        self._conn.commit()
+
+    def save(self, job):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, key, status, updated_at, data) VALUES (?, ?, ?, ?, ?)",
+                (job["id"], job["key"], job["status"], job["updated_at"], json.dumps(job)),
+            )
+            self._conn.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_active(self, key, since):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM jobs WHERE key = ? AND status IN (?, ?) AND updated_at >= ?"
+                " ORDER BY updated_at DESC LIMIT 1",
+                (key, *ACTIVE_STATUSES, since),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def purge(self, before):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN (?, ?) AND updated_at < ?",
+                (*ACTIVE_STATUSES, before),
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+
+def create_job_store(backend=JOB_STORE_BACKEND):
+    if backend == "sqlite":
+        try:
+            return SQLiteJobStore()
+        except Exception as e:
+            logging.error(f"SQLite job store unavailable, using memory store: {e}")
+    return MemoryJobStore()
+
+
+class JobManager:
+    """
+    Runs deep-dive lookups in the background on the event loop. At most
+    `workers` lookups run at once; the rest wait as "queued". Job state lives
+    in the store and is updated after every batch of results.
+    """
+
+    def __init__(self, store, workers=JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self._tasks = {}
+        self._slots = None
+        self._loop = None
+
+    def _slot(self):
+        # asyncio primitives belong to one loop; recreate for a new one
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.workers)
+            self._loop = loop
+        return self._slots
+
+    def _save(self, job, **fields):
+        job.update(fields, updated_at=time.time())
+        self.store.save(job)
+
+    def submit(self, name, extra_info="", query_budget=None):
+        """
+        Starts a lookup, or attaches to an identical one still in flight.
+        Returns the job (a dict).
+        """
+        now = time.time()
+        self.store.purge(now - JOB_TTL)
+
+        # Identical lookups are coalesced onto one job
+        key = lookup_key(name, extra_info, query_budget)
+        job = self.store.find_active(key, now - JOB_STALE_SECONDS)
+        if job is not None:
+            logging.info(f"Coalesced lookup for {name} onto job {job['id']}")
+            self._save(job, waiters=job["waiters"] + 1)
+            return job
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "key": key,
+            "name": name,
+            "extra_info": extra_info,
+            "query_budget": query_budget,
+            "status": "queued",
+            "waiters": 1,
+            "created_at": now,
+            "updated_at": now,
+            "results": {},
+            "summary": None,
+            "error": None,
+        }
+        self.store.save(job)
+        self._tasks[job["id"]] = asyncio.ensure_future(self._run(job))
+        return job
+
+    async def _run(self, job):
+        try:
+            async with self._slot():
+                stored = self.store.get(job["id"])
+                if stored["status"] == "cancelled":
+                    return
+                # Callers may have joined while it was queued
+                self._save(job, status="running", waiters=stored["waiters"])
+                logging.info(f"Job {job['id']} started for {job['name']}")
+
+                async for event, payload in deep_dive_search_stream(job["name"], job["extra_info"], job["query_budget"]):
+                    # Another process may have cancelled it through a shared store
+                    stored = self.store.get(job["id"])
+                    if stored is None or stored["status"] == "cancelled":
+                        return
+                    job["waiters"] = stored["waiters"]
+
+                    if event == "result":
+                        batch = job["results"].setdefault(payload["category"], [])
+                        batch.extend(payload["results"])
+                        batch.sort(key=lambda r: r.get("_score", 0), reverse=True)
+                        self._save(job)
+                    elif event == "summary":
+                        # Final fused ranking replaces the provisional batches
+                        results = payload.pop("results")
+                        self._save(job, status="done", results=results, summary=payload)
+                logging.info(f"Job {job['id']} finished")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.error(f"Job {job['id']} failed: {e}")
+            self._save(job, status="failed", error=str(e))
+        finally:
+            self._tasks.pop(job["id"], None)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    @staticmethod
+    def public(job):
+        """The job as returned by the API."""
+        return {k: v for k, v in job.items() if k != "key"}
+
+    def cancel(self, job_id):
+        """
+        Detaches one caller from the job. The lookup itself stops once no
+        caller that submitted it is left. Returns the job, or None if unknown.
+        """
+        job = self.store.get(job_id)
+        if job is None or job["status"] not in ACTIVE_STATUSES:
+            return job
+
+        waiters = max(job["waiters"] - 1, 0)
+        if waiters:
+            self._save(job, waiters=waiters)
+            return job
+
+        self._save(job, waiters=0, status="cancelled")
+        task = self._tasks.pop(job_id, None)
+        if task is not None:
+            task.cancel()
+        logging.info(f"Job {job_id} cancelled")
+        return job
+
+    async def close(self):
+        """Stops every job running in this process (called on app shutdown)."""
+        tasks = list(self._tasks.items())
+        for job_id, task in tasks:
+            job = self.store.get(job_id)
+            if job is not None and job["status"] in ACTIVE_STATUSES:
+                self._save(job, status="cancelled", error="Server shutting down")
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*(task for _, task in tasks), return_exceptions=True)
+
+    def stats(self):
+        return {"running_here": len(self._tasks), "workers": self.workers, "stored": len(self.store)}
+
+
+# Shared by every request in this process
+job_manager = JobManager(create_job_store())
@@ -1,7 +1,29 @@
-from fastapi import FastAPI
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+from http_clients import close_async_client, sync_clients
+from jobs import job_manager
+from responses import CompressionMiddleware, FastJSONResponse, check_page_params, cursor_lookup, dumps, paginate
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if WARM_UP_ON_START:
+        await warm_up()
+    yield
+    await cancel_refreshes()
+    await job_manager.close()
+    # Release pooled keep-alive connections on shutdown
+    await close_async_client()
+    sync_clients.close()
 
-app = FastAPI(title="Digital Footprint Analyzer API")
+app = FastAPI(title="Digital Footprint Analyzer API", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -10,34 +32,237 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
-from search_logic import deep_dive_search
+from search_logic import (
+    WARM_UP_ON_START, batch_records, batch_search_stream, cancel_refreshes, deep_dive_search_async,
+    deep_dive_search_stream, refresh_in_progress, schedule_refresh, search_flights, warm_up,
+)
+import providers
+from footprint_index import footprint_index, subject_key
+from scheduler import scheduler
+from result_cache import result_cache
+from hedging import latency_tracker
+from metrics import render_metrics, tracing
 
 class SearchRequest(BaseModel):
     name: str
     extra_info: str = ""
+    # Max provider queries for this lookup (None = planner default)
+    query_budget: Optional[int] = None
+    # Include a per-query timing breakdown in the /api/search response
+    # (always runs a live lookup)
+    debug: bool = False
+    # Answer from the footprint index when the person was looked up before
+    use_index: bool = True
+    # When answering from the index, re-run stale categories in the background
+    refresh: bool = True
+    # Paging (/api/search only): at most `limit` results per category, each
+    # category resuming from its cursor in the previous response's "pages"
+    limit: Optional[int] = None
+    cursors: Dict[str, str] = {}
+    # Only these categories / only these keys of each result
+    categories: Optional[List[str]] = None
+    fields: Optional[List[str]] = None
+
+    def paged(self):
+        return bool(self.limit is not None or self.cursors or self.categories is not None or self.fields is not None)
 
+import json
 import logging
 import traceback
 
 # Setup logging if not already done in search_logic, or just add a handler here
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
 
+async def lookup_response(request):
+    """The /api/search response before paging: from the index, live, or live with timing."""
+    if request.use_index and not request.debug and footprint_index is not None:
+        results = await asyncio.to_thread(footprint_index.results, request.name, request.extra_info)
+        if results is not None:
+            if request.refresh:
+                stale = schedule_refresh(request.name, request.extra_info, request.query_budget)
+            else:
+                stale = footprint_index.stale_categories(request.name, request.extra_info)
+            return {"results": results, "index": {
+                "refreshed_at": footprint_index.refreshed(request.name, request.extra_info),
+                "stale": stale,
+                "refreshing": refresh_in_progress(request.name, request.extra_info),
+            }}
+    if not request.debug:
+        results = await deep_dive_search_async(request.name, request.extra_info, request.query_budget)
+        return {"results": results}
+    with tracing() as trace:
+        results = await deep_dive_search_async(request.name, request.extra_info, request.query_budget)
+    return {"results": results, "timing": trace.summary()}
+
+# How long the response a first page was cut from is kept for its cursors
+PAGE_SNAPSHOT_TTL = float(os.environ.get("PAGE_SNAPSHOT_TTL", 30 * 60))
+
+
+async def paged_response(request):
+    """
+    One page of a lookup. The first page runs the lookup and keeps its
+    response as a snapshot; cursors carry the snapshot's id and later pages
+    are cut from it, so no lookup runs again and no result is skipped or
+    repeated. A cursor whose snapshot has expired gets 410.
+    """
+    lookup_id = cursor_lookup(request.cursors)
+    if lookup_id is None:
+        response = await lookup_response(request)
+        lookup_id = uuid.uuid4().hex
+        key = f"{subject_key(request.name, request.extra_info)}|{lookup_id}"
+        await asyncio.to_thread(result_cache.store_snapshot, key, response, PAGE_SNAPSHOT_TTL)
+    else:
+        key = f"{subject_key(request.name, request.extra_info)}|{lookup_id}"
+        response = await asyncio.to_thread(result_cache.snapshot, key)
+        if response is None:
+            raise HTTPException(status_code=410, detail="Cursor expired; load the first page again")
+    page = dict(response)
+    page["results"], page["pages"] = paginate(
+        response["results"], lookup_id, request.limit, request.cursors, request.categories, request.fields
+    )
+    return page
+
+
 @app.post("/api/search")
-def search_person(request: SearchRequest):
+async def search_person(request: SearchRequest):
+    """
+    Fused results per category. With limit/cursors/categories/fields the
+    response is one page and carries "pages": {category: {total, next_cursor}};
+    send next_cursor back in `cursors` to load more of a category. Later pages
+    come from the list the first page was cut from (see paged_response).
+    """
+    try:
+        check_page_params(request.limit, request.cursors, request.fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
         logging.info(f"Received search request for: {request.name}")
-        results = deep_dive_search(request.name, request.extra_info)
-        return {"results": results}
+        if request.paged():
+            return await paged_response(request)
+        return await lookup_response(request)
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = traceback.format_exc()
         logging.error(f"INTERNAL SERVER ERROR: {error_msg}")
         return {"error": "Internal Server Error", "details": str(e)}
 
+@app.post("/api/search/stream")
+async def search_person_stream(request: SearchRequest):
+    """
+    Server-Sent Events version of /api/search. Emits a `result` event per
+    category batch as soon as its query finishes, then a final `summary` event.
+    """
+    logging.info(f"Received streaming search request for: {request.name}")
+
+    async def event_stream():
+        try:
+            async for event, payload in deep_dive_search_stream(request.name, request.extra_info, request.query_budget):
+                yield f"event: {event}\ndata: {dumps(payload).decode()}\n\n"
+        except Exception as e:
+            error_msg = traceback.format_exc()
+            logging.error(f"INTERNAL SERVER ERROR: {error_msg}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Internal Server Error', 'details': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Largest batch accepted by /api/search/batch
+BATCH_MAX_SIZE = 1000
+
+@app.post("/api/search/batch")
+async def search_batch(requests: List[SearchRequest]):
+    """
+    Looks up many people in one call. Streams one NDJSON line per person as
+    each completes (with its position in the request list), then a final
+    line with totals. All lookups share the process-wide provider scheduler,
+    and identical lookups or queries run once.
+    """
+    if len(requests) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_SIZE} lookups per batch")
+    logging.info(f"Received batch search request for {len(requests)} people")
+    lookups = [(r.name, r.extra_info, r.query_budget) for r in requests]
+
+    async def ndjson_stream():
+        completed = 0
+        try:
+            async for indexes, results in batch_search_stream(lookups):
+                for record in batch_records(lookups, indexes, results):
+                    completed += 1
+                    yield dumps(record) + b"\n"
+        except Exception as e:
+            error_msg = traceback.format_exc()
+            logging.error(f"INTERNAL SERVER ERROR: {error_msg}")
+            yield json.dumps({"error": "Internal Server Error", "details": str(e)}) + "\n"
+        yield json.dumps({"done": True, "people": len(lookups), "completed": completed}) + "\n"
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(request: SearchRequest):
+    """
+    Starts a background lookup and returns its job id right away. An identical
+    lookup already in flight is shared instead of started twice.
+    """
+    logging.info(f"Received job request for: {request.name}")
+    job = job_manager.submit(request.name, request.extra_info, request.query_budget)
+    return job_manager.public(job)
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """Job status with the results found so far (final once status is "done")."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_manager.public(job)
+
+@app.delete("/api/jobs/{job_id}")
+def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_manager.public(job)
+
+@app.get("/api/footprints/search")
+def search_footprints(q: str, limit: int = 50):
+    """Full-text search over every footprint collected so far, across people."""
+    if footprint_index is None:
+        raise HTTPException(status_code=503, detail="Footprint index disabled")
+    return {"results": footprint_index.search(q, limit=min(max(limit, 1), 500))}
+
+@app.get("/api/metrics")
+def metrics():
+    """Provider, cache and lookup metrics in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/warmup")
+async def warm_up_endpoint():
+    """
+    Loads the currently healthy providers ahead of the first search, e.g. from
+    a scheduled ping right after a serverless cold start.
+    """
+    return {"warmed": await warm_up()}
+
 @app.get("/api/health")
 def health_check():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "providers": scheduler.snapshot(),
+        "providers_loaded": providers.loaded(),
+        "latency": latency_tracker.snapshot(),
+        "cache": result_cache.stats(),
+        "coalesced": search_flights.stats(),
+        "jobs": job_manager.stats(),
+        "footprints": footprint_index.stats() if footprint_index is not None else None,
+    }
 
 @app.get("/")
 def root():
@@ -0,0 +1,265 @@
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Counters and histograms for the search hot path, rendered in the Prometheus
+# text format by /api/metrics, plus an optional per-request Trace that
+# /api/search returns with debug=true.
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [count per bucket..., +Inf count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            counts = self._values.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, counts in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [le])} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {counts[-1]:g}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+provider_attempts = Counter(
+    "stkl_provider_attempts_total", "Provider calls by outcome (success, empty, error, skipped, cancelled).",
+    ("provider", "outcome"))
+provider_errors = Counter(
+    "stkl_provider_errors_total", "Failed provider calls by exception class.", ("provider", "error"))
+provider_latency = Histogram(
+    "stkl_provider_latency_seconds", "Time a provider took to answer.", ("provider",))
+provider_wait = Histogram(
+    "stkl_provider_wait_seconds", "Time spent waiting for a rate-limit token and a concurrency slot.", ("provider",))
+provider_results = Histogram(
+    "stkl_provider_results", "Raw results per successful provider call.", ("provider",), COUNT_BUCKETS)
+results_kept = Counter(
+    "stkl_results_kept_total", "Results that passed the relevance filter, by the provider that found them.",
+    ("provider",))
+results_filtered = Counter(
+    "stkl_results_filtered_total", "Results dropped by the relevance filter, by the provider that found them.",
+    ("provider",))
+filter_seconds = Histogram("stkl_filter_seconds", "Time spent in the relevance filter per query.")
+cache_lookups = Counter("stkl_cache_lookups_total", "Result cache lookups.", ("result",))
+coalesced_queries = Counter("stkl_coalesced_queries_total", "Queries that shared an identical in-flight query.")
+query_seconds = Histogram("stkl_query_seconds", "Time to answer one query, cache and coalescing included.")
+lookup_seconds = Histogram("stkl_lookup_seconds", "Time for a whole deep-dive lookup.", ("mode",))
+routed_queries = Counter(
+    "stkl_routed_queries_total", "Router decisions per query and provider (dedicated, native, translated, skipped).",
+    ("provider", "decision"))
+wikipedia_calls = Counter(
+    "stkl_wikipedia_calls_total", "Wikipedia API calls by kind (search, summaries).", ("kind",))
+wikipedia_lookups = Counter(
+    "stkl_wikipedia_lookups_total", "Wikipedia answers by how they were found (cached, resolved).", ("result",))
+profile_probes = Counter(
+    "stkl_profile_probes_total", "Profile URLs checked by the profile probe, by site and verdict.",
+    ("site", "result"))
+near_duplicates = Counter(
+    "stkl_near_duplicates_total", "Results folded into a near-identical result of the same lookup.")
+disambiguation_dropped = Counter(
+    "stkl_disambiguation_dropped_total", "Results dropped as describing another person with the same name.")
+disambiguation_seconds = Histogram(
+    "stkl_disambiguation_seconds", "Time to tell the subject apart from namesakes per lookup.")
+
+METRICS = [
+    provider_attempts, provider_errors, provider_latency, provider_wait, provider_results,
+    results_kept, results_filtered, filter_seconds, cache_lookups, coalesced_queries,
+    query_seconds, lookup_seconds, routed_queries, wikipedia_calls, wikipedia_lookups,
+    profile_probes, near_duplicates, disambiguation_dropped, disambiguation_seconds,
+]
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """Timing breakdown of one request, filled in by every query it runs."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = {}
+        self.totals = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def _query(self, query):
+        return self.queries.setdefault(query, {"query": query, "attempts": []})
+
+    def add_attempt(self, query, attempt):
+        with self._lock:
+            self._query(query)["attempts"].append(attempt)
+            self.totals["wait_seconds"] += attempt["wait_seconds"]
+            self.totals["provider_seconds"] += attempt["latency_seconds"]
+
+    def update_query(self, query, **fields):
+        with self._lock:
+            self._query(query).update(fields)
+            if "filter_seconds" in fields:
+                self.totals["filter_seconds"] += fields["filter_seconds"]
+
+    def summary(self):
+        with self._lock:
+            totals = {k: round(v, 4) for k, v in self.totals.items()}
+            totals["total_seconds"] = round(time.perf_counter() - self.started, 4)
+            return {"totals": totals, "queries": list(self.queries.values())}
+
+
+_current_trace = contextvars.ContextVar("stkl_trace", default=None)
+
+
+@contextmanager
+def tracing():
+    """Collects a Trace for everything run inside the block (threads need copy_context)."""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def record_attempt(provider, query, outcome, wait=0.0, latency=0.0, results=0, error=None):
+    provider_attempts.inc(provider, outcome)
+    if outcome in ("success", "empty"):
+        provider_latency.observe(latency, provider)
+        provider_results.observe(results, provider)
+    if outcome != "skipped":
+        provider_wait.observe(wait, provider)
+    if error is not None:
+        provider_errors.inc(provider, type(error).__name__)
+
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_attempt(query, {
+            "provider": provider,
+            "outcome": outcome,
+            "wait_seconds": round(wait, 4),
+            "latency_seconds": round(latency, 4),
+            "results": results,
+            "error": type(error).__name__ if error is not None else None,
+        })
+
+
+def record_cache(query, hit):
+    cache_lookups.inc("hit" if hit else "miss")
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.update_query(query, cache_hit=hit)
+
+
+def record_query(query, seconds, coalesced=False):
+    query_seconds.observe(seconds)
+    if coalesced:
+        coalesced_queries.inc()
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.update_query(query, seconds=round(seconds, 4), coalesced=coalesced)
+
+
+def record_filter(query, raw_results, records, seconds):
+    filter_seconds.observe(seconds)
+    found = defaultdict(int)
+    for r in raw_results:
+        found[r.get("source", "")] += 1
+    kept = defaultdict(int)
+    for record in records:
+        kept[record.source] += 1
+    for source, count in found.items():
+        results_kept.inc(source, amount=kept[source])
+        results_filtered.inc(source, amount=count - kept[source])
+
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.update_query(query, raw_results=len(raw_results), kept=len(records), filter_seconds=round(seconds, 4))
+
+
+def record_lookup(mode, seconds):
+    lookup_seconds.observe(seconds, mode)
+
+
+def record_disambiguation(dropped, seconds):
+    disambiguation_seconds.observe(seconds)
+    if dropped:
+        disambiguation_dropped.inc(amount=dropped)
+
+
+def record_near_duplicates(removed):
+    if removed:
+        near_duplicates.inc(amount=removed)
+
+
+def record_wikipedia_call(kind):
+    wikipedia_calls.inc(kind)
+
+
+def record_wikipedia_lookup(result):
+    wikipedia_lookups.inc(result)
+
+
+def record_profile_probe(site, result):
+    profile_probes.inc(site, result)
+
+
+def record_routes(routes, skipped):
+    for route in routes:
+        routed_queries.inc(route.provider, route.decision)
+    for provider in skipped:
+        routed_queries.inc(provider, "skipped")
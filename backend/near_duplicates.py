@@ -0,0 +1,136 @@
+import os
+import re
+
+# Folds near-identical results (the same story syndicated to many sites, scraped
+# copies with a reworded title) that URL canonicalization cannot catch. Each
+# result's title + description becomes a set of word and word-pair features;
+# two results are copies when those sets overlap by at least SIMILARITY
+# (Jaccard). Candidate pairs come from MinHash with LSH banding: a signature of
+# SIGNATURE_BINS minimums (one-permutation hashing, one pass over the features)
+# is cut into bands, and only results agreeing on a whole band are compared,
+# so a lookup stays roughly linear in its number of results.
+#
+# SimHash was tried first; on snippets this short a one-word change moves the
+# hash by 5-20 bits, about as far as unrelated texts, so it missed most copies.
+
+NEAR_DUPLICATES_ENABLED = os.environ.get("NEAR_DUPLICATES", "1") != "0"
+# Categories whose results are collapsed; profiles on different sites share
+# short boilerplate titles ("Jane Doe - LinkedIn") and are kept apart
+COLLAPSE_CATEGORIES = tuple(
+    c.strip() for c in os.environ.get("NEAR_DUPLICATE_CATEGORIES", "news,Mentions,General").split(",") if c.strip()
+)
+SIMILARITY = float(os.environ.get("NEAR_DUPLICATE_SIMILARITY", 0.5))
+
+# 8 bands of 2 rows: pairs at 0.5 similarity become candidates ~90% of the
+# time, at 0.75 over 99%; every candidate is then checked exactly
+SIGNATURE_BINS = 16
+BAND_ROWS = 2
+BIN_BITS = SIGNATURE_BINS.bit_length() - 1
+HASH_MASK = (1 << 64) - 1
+# Texts with fewer features than this are too short to compare reliably
+MIN_FEATURES = 6
+# Compare a new result with at most this many earlier ones per band bucket
+MAX_BUCKET = 32
+
+_WORD = re.compile(r"\w+")
+
+
+def features(text):
+    """Hashes of the lowercased words and word pairs of `text`."""
+    words = [w for w in _WORD.findall(text.lower()) if len(w) > 1]
+    # str hashes differ between processes, which is fine: fingerprints are never stored
+    found = {hash(w) & HASH_MASK for w in words}
+    found.update(hash(f"{a} {b}") & HASH_MASK for a, b in zip(words, words[1:]))
+    return frozenset(found)
+
+
+def signature(feature_hashes):
+    """One-permutation MinHash: the smallest hash falling in each of SIGNATURE_BINS bins."""
+    mins = [HASH_MASK] * SIGNATURE_BINS
+    for h in feature_hashes:
+        b = h & (SIGNATURE_BINS - 1)
+        v = h >> BIN_BITS
+        if v < mins[b]:
+            mins[b] = v
+    return mins
+
+
+def fingerprint(text):
+    """(features, signature) of `text`, or None if it is too short to compare."""
+    feats = features(text)
+    if len(feats) < MIN_FEATURES:
+        return None
+    return feats, signature(feats)
+
+
+def similarity(a, b):
+    return len(a & b) / len(a | b)
+
+
+def cluster(fingerprints, threshold=SIMILARITY):
+    """
+    Groups indexes of `fingerprints` (None entries stay alone) whose feature
+    sets are at least `threshold` similar, transitively. Returns a list of
+    clusters, each a list of indexes in input order, in order of first member.
+    """
+    parent = list(range(len(fingerprints)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets = {}
+    for i, fp in enumerate(fingerprints):
+        if fp is None:
+            continue
+        feats, sig = fp
+        compared = set()
+        for band in range(0, SIGNATURE_BINS, BAND_ROWS):
+            bucket = buckets.setdefault((band, *sig[band:band + BAND_ROWS]), [])
+            for j in bucket[-MAX_BUCKET:]:
+                if j in compared:
+                    continue
+                compared.add(j)
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j and similarity(feats, fingerprints[j][0]) >= threshold:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+            bucket.append(i)
+
+    groups = {}
+    for i in range(len(fingerprints)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def collapse(structured_results, categories=COLLAPSE_CATEGORIES, threshold=SIMILARITY):
+    """
+    Folds near-duplicate results across `categories` of a lookup
+    ({category: [result dicts]}, as returned by /api/search). The
+    highest-scoring result of each cluster stays and lists the others (title
+    and URL) in "duplicates"; the rest are removed. Returns the number removed.
+    """
+    pool = [item for cat in categories for item in structured_results.get(cat, ())]
+    if len(pool) < 2:
+        return 0
+    fingerprints = [fingerprint(f"{item['title']} {item['description']}") for item in pool]
+
+    removed = set()
+    for members in cluster(fingerprints, threshold):
+        if len(members) < 2:
+            continue
+        items = sorted((pool[i] for i in members), key=lambda item: (-item.get("_score", 0), item["url"]))
+        keep = items[0]
+        duplicates = list(keep.get("duplicates") or [])
+        for item in items[1:]:
+            duplicates.append({"title": item["title"], "url": item["url"]})
+            duplicates.extend(item.get("duplicates") or [])
+            removed.add(id(item))
+        keep["duplicates"] = duplicates
+
+    if removed:
+        for cat in categories:
+            if cat in structured_results:
+                structured_results[cat] = [item for item in structured_results[cat] if id(item) not in removed]
+    return len(removed)
@@ -0,0 +1,268 @@
+import asyncio
+import concurrent.futures
+import html
+import logging
+import os
+import re
+import unicodedata
+
+from http_clients import sync_clients
+from metrics import record_profile_probe
+from providers import Provider, current_subject
+from query_router import ParsedQuery, on_domain
+from result_cache import MemoryCacheBackend
+
+# Finds social profiles without a search engine. For a "site:github.com" query
+# of a lookup, candidate usernames are built from the person's name (janedoe,
+# jane.doe, jdoe, ...; an @handle in extra_info goes first) and the matching
+# profile URLs are requested directly, a few at a time. A profile only counts
+# when its page names the person: each site has a tag holding the display name
+# (GitHub's <title>, Instagram's og:title), and every word of the name must be
+# in it. The result's title and description are that tag and og:description,
+# as the page gives them. Any other answer (no such tag, login wall or app
+# shell, 429, redirect) says nothing, and the query falls through to the
+# search engines as before. Pages are cached per site and handle.
+
+# Candidate handles tried per site and lookup
+MAX_HANDLES = int(os.environ.get("PROFILE_PROBE_HANDLES", 4))
+# Profile requests in flight at once per call (the sync path shares a pool of twice this)
+PROBE_CONCURRENCY = int(os.environ.get("PROFILE_PROBE_CONCURRENCY", 4))
+PROBE_TIMEOUT = float(os.environ.get("PROFILE_PROBE_TIMEOUT", 5.0))
+CACHE_TTL = float(os.environ.get("PROFILE_PROBE_CACHE_TTL", 24 * 60 * 60))
+CACHE_MAX_ENTRIES = 4096
+
+_HANDLE_MENTION = re.compile(r"@([A-Za-z0-9_.-]{2,39})")
+
+
+# Only the <head> carries the tags read from a profile page
+HEAD_CHARS = 64 * 1024
+
+
+def _tag(text, name):
+    """Content of the <title> (name="title") or of a <meta> property/name tag, or None."""
+    if name == "title":
+        m = re.search(r"<title[^>]*>(.*?)</title>", text, re.IGNORECASE | re.DOTALL)
+        value = m and m.group(1)
+    else:
+        value = None
+        for m in re.finditer(r"<meta\b[^>]*>", text, re.IGNORECASE):
+            tag = m.group(0)
+            if re.search(rf"""(?:property|name)\s*=\s*["']{re.escape(name)}["']""", tag, re.IGNORECASE):
+                content = re.search(r"""content\s*=\s*(["'])(.*?)\1""", tag, re.IGNORECASE | re.DOTALL)
+                value = content and content.group(2)
+                break
+    return " ".join(html.unescape(value).split()) if value else None
+
+
+class ProfileSite:
+    """
+    Where a site keeps its profiles and how to read one. `pattern` is the
+    shape of a valid username; `name_tag` the tag carrying the display name
+    ("title" or a meta property); `missing_text`, when the site answers 200
+    for missing profiles too, is what only those pages contain.
+    """
+
+    def __init__(self, label, url, pattern, name_tag="title", missing_text=None):
+        self.label = label
+        self.url = url
+        self.pattern = re.compile(pattern)
+        self.name_tag = name_tag
+        self.missing_text = missing_text
+
+    def valid(self, handle):
+        return bool(self.pattern.fullmatch(handle))
+
+    def profile_url(self, handle):
+        return self.url.format(handle=handle)
+
+    def page(self, status, text):
+        """
+        {"title", "description"} of an existing profile, False if there is
+        none, None if the answer says neither (no name tag, e.g. a login wall).
+        """
+        if status in (404, 410):
+            return False
+        if status != 200:
+            return None
+        head = text[:HEAD_CHARS]
+        if self.missing_text and self.missing_text in head:
+            return False
+        title = _tag(head, self.name_tag)
+        if not title:
+            return None
+        return {"title": title, "description": _tag(head, "og:description") or ""}
+
+
+# Keys must match the domains in providers.ENGINE_PROFILES["Profiles"]. Sites
+# behind a login wall for anonymous requests (LinkedIn, Facebook, X) cannot be
+# told apart this way and are left to the search engines. Instagram serves
+# anonymous clients an app shell without og:title for most paths; those
+# answers say nothing.
+SITES = {
+    # <title>janedoe (Jane Doe) · GitHub</title>
+    "github.com": ProfileSite(
+        "GitHub", "https://github.com/{handle}", r"[a-z0-9](?:[a-z0-9]|-(?=[a-z0-9])){0,38}",
+    ),
+    # og:title "Jane Doe (@janedoe) • Instagram photos and videos"
+    "instagram.com": ProfileSite(
+        "Instagram", "https://www.instagram.com/{handle}/", r"[a-z0-9._]{1,30}",
+        name_tag="og:title", missing_text="Page Not Found",
+    ),
+}
+
+
+def _ascii_words(text):
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    return [w for w in (re.sub(r"[^a-z0-9]", "", w) for w in text.split()) if w]
+
+
+def candidate_handles(name, extra_info=""):
+    """Usernames the person plausibly uses, most likely first."""
+    handles = [h.lower() for h in _HANDLE_MENTION.findall(extra_info or "")]
+    words = _ascii_words(name)
+    if len(words) >= 2:
+        first, last = words[0], words[-1]
+        handles += [first + last, f"{first}.{last}", f"{first}_{last}", f"{first}-{last}",
+                    first[0] + last, first + last[0]]
+    elif words:
+        handles.append(words[0])
+    return list(dict.fromkeys(handles))
+
+
+def subject_of(query):
+    """(name, extra_info) of the current lookup, else the query's plain words."""
+    subject = current_subject()
+    if subject is not None:
+        return subject
+    words = [t.strip('"') for t in ParsedQuery(query).tokens if ":" not in t and t != "OR"]
+    return " ".join(words), ""
+
+
+def names_person(page, name):
+    """True if the page's name tag holds every word of `name`."""
+    words = _ascii_words(name)
+    found = set(_ascii_words(page["title"]))
+    return bool(words) and all(w in found for w in words)
+
+
+def result(site, handle, page):
+    return {
+        "title": page["title"],
+        "url": site.profile_url(handle),
+        "description": page["description"],
+        "source": "Profiles",
+    }
+
+
+# Runs the sync path's profile requests; separate from the hedge pool so a
+# probe never waits behind another query's attempts
+_probe_executor = concurrent.futures.ThreadPoolExecutor(max_workers=PROBE_CONCURRENCY * 2, thread_name_prefix="probe")
+
+
+class ProfileProbeProvider(Provider):
+    """
+    Answers "site:" queries for the sites in SITES by checking candidate
+    profile URLs directly instead of searching for them.
+    """
+
+    name = "Profiles"
+    # Handles come from the person's name and extra_info, not the query
+    answers_subject = True
+
+    def __init__(self, capabilities=frozenset({"site"}), domains=None, cost=1.0, site_only=True, sites=None,
+                 max_handles=MAX_HANDLES, concurrency=PROBE_CONCURRENCY, cache=None):
+        self.capabilities = capabilities
+        self.sites = sites or SITES
+        self.domains = domains or tuple(self.sites)
+        self.cost = cost
+        self.site_only = site_only
+        self.max_handles = max_handles
+        self.concurrency = concurrency
+        self.cache = cache or MemoryCacheBackend(CACHE_MAX_ENTRIES)
+
+    def _probes(self, query):
+        """(name, [(domain, site, handle)]) for the sites the query asks for."""
+        name, extra_info = subject_of(query)
+        sites = ParsedQuery(query).sites
+        domains = [d for d in self.sites if any(on_domain(f"https://{s}", (d,)) for s in sites)]
+        handles = candidate_handles(name, extra_info)
+        probes = []
+        for domain in domains:
+            site = self.sites[domain]
+            probes += [(domain, site, h) for h in [h for h in handles if site.valid(h)][:self.max_handles]]
+        return name, probes
+
+    def _known(self, domain, handle):
+        page = self.cache.get(f"{domain}|{handle}")
+        if page is not None:
+            record_profile_probe(domain, "cached")
+        return page
+
+    def _remember(self, domain, handle, page):
+        record_profile_probe(domain, "unknown" if page is None else "found" if page else "missing")
+        if page is not None:
+            self.cache.set(f"{domain}|{handle}", page, CACHE_TTL)
+
+    def _answer(self, name, probes, pages, max_results):
+        errors = [p for p in pages if isinstance(p, Exception)]
+        if errors and len(errors) == len(pages):
+            # Nothing got through (network down, every site blocking us)
+            raise errors[0]
+        # A page naming someone else is another person's handle
+        hits = [
+            result(site, handle, page) for (_, site, handle), page in zip(probes, pages)
+            if isinstance(page, dict) and names_person(page, name)
+        ]
+        return hits[:max_results]
+
+    def fetch(self, query, max_results):
+        name, probes = self._probes(query)
+        if not probes:
+            return []
+        logging.info(f"Profile probe: {name} ({len(probes)} URLs)")
+        verdicts = list(_probe_executor.map(lambda p: self._check(*p), probes))
+        return self._answer(name, probes, verdicts, max_results)
+
+    async def fetch_async(self, client, query, max_results):
+        name, probes = self._probes(query)
+        if not probes:
+            return []
+        logging.info(f"Profile probe: {name} ({len(probes)} URLs)")
+        gate = asyncio.Semaphore(self.concurrency)
+
+        async def check(probe):
+            async with gate:
+                return await self._check_async(client, *probe)
+
+        verdicts = await asyncio.gather(*map(check, probes))
+        return self._answer(name, probes, verdicts, max_results)
+
+    def _check(self, domain, site, handle):
+        """The site's page for one handle (see ProfileSite.page), or the exception the request raised."""
+        page = self._known(domain, handle)
+        if page is not None:
+            return page
+        try:
+            with sync_clients.lease("Profiles") as session:
+                response = session.get(site.profile_url(handle), allow_redirects=False, timeout=PROBE_TIMEOUT)
+                page = site.page(response.status_code, response.text)
+        except Exception as e:
+            record_profile_probe(domain, "error")
+            logging.debug(f"Profile probe failed for {site.profile_url(handle)}: {e}")
+            return e
+        self._remember(domain, handle, page)
+        return page
+
+    async def _check_async(self, client, domain, site, handle):
+        page = self._known(domain, handle)
+        if page is not None:
+            return page
+        try:
+            response = await client.get(site.profile_url(handle), follow_redirects=False, timeout=PROBE_TIMEOUT)
+            page = site.page(response.status_code, response.text)
+        except Exception as e:
+            record_profile_probe(domain, "error")
+            logging.debug(f"Profile probe failed for {site.profile_url(handle)}: {e}")
+            return e
+        self._remember(domain, handle, page)
+        return page
@@ -0,0 +1,288 @@
+import contextvars
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from http_clients import sync_clients
+from scheduler import scheduler
+from serp_parser import response_charset
+
+# Every search engine perform_search can use, behind one interface:
+#   provider.fetch(query, max_results)                -> raw results (thread-pool path)
+#   await provider.fetch_async(client, query, max_results) -> raw results (asyncio path)
+#   provider.warm_up()                                -> loads what the first call would
+# Raw results are dicts: {"title", "url", "description", "source"}.
+# Each provider also declares what it can answer (capabilities, domains), what a
+# call costs and how fast it may be called; query_router uses these to decide
+# which providers get a query and how its operators are rewritten for each.
+# Registered by scheduler name; use_providers() swaps in stand-ins (see stand_ins.py).
+# Live engines are built on first get(), so importing this module stays cheap.
+# Providers that answer per person rather than per query (Wikipedia, the
+# profile probe) read the person being looked up from current_subject().
+
+# Query operators a provider can declare support for
+OPERATORS = frozenset({
+    "site",      # site:example.com
+    "-site",     # -site:example.com
+    "filetype",  # filetype:pdf
+    "OR",        # a OR b
+    "phrase",    # "exact phrase"
+})
+
+# What the live engines understand. Wikipedia searches only itself, so a
+# site: query for another site or a filetype: query is never sent to it, and
+# it answers with the person's article whatever the query asked, so it is
+# only a last resort. The profile probe only answers site: queries for the
+# sites it can check (profile_probe.SITES).
+ENGINE_PROFILES = {
+    "DDG-api": {"capabilities": OPERATORS},
+    "DDG-html": {"capabilities": OPERATORS},
+    "DDG-lite": {"capabilities": OPERATORS},
+    "Google": {"capabilities": OPERATORS},
+    "Bing": {"capabilities": OPERATORS},
+    "Wikipedia": {"capabilities": frozenset({"OR", "phrase"}), "domains": ("wikipedia.org",), "fallback": True},
+    "Profiles": {"capabilities": frozenset({"site", "OR", "phrase"}), "domains": ("github.com", "instagram.com"),
+                 "site_only": True},
+}
+
+# Set PROFILE_PROBE=0 to leave profile discovery to the search engines
+PROFILE_PROBE_ENABLED = os.environ.get("PROFILE_PROBE", "1") != "0"
+
+
+# (name, extra_info) of the lookup the current query belongs to, or None
+_current_subject = contextvars.ContextVar("stkl_subject", default=None)
+
+
+def current_subject():
+    return _current_subject.get()
+
+
+@contextmanager
+def lookup_subject(name, extra_info=""):
+    """Marks the queries run inside the block as part of the lookup for `name`."""
+    token = _current_subject.set((name, extra_info))
+    try:
+        yield
+    finally:
+        _current_subject.reset(token)
+
+
+class Provider:
+    name = ""
+    # Operators the engine understands; the router translates or drops the rest
+    capabilities = OPERATORS
+    # Sites the engine searches, or None for the whole web
+    domains = None
+    # Only answers queries that name one of its domains with site:
+    site_only = False
+    # Only tried once every other provider that fits the query failed or came
+    # back empty, however ready it is
+    fallback = False
+    # Answers from the person being looked up (current_subject()) rather than
+    # from the query text, so its answers are not cached under the query
+    answers_subject = False
+    # Relative price of one call (quota, block risk, money). Among providers that
+    # fit a query equally well, cheaper ones are tried first.
+    cost = 1.0
+    # (tokens per second, burst) for a provider registered at runtime; the
+    # built-in engines are paced by scheduler.PROVIDER_RATES
+    rate = None
+
+    def fetch(self, query, max_results):
+        raise NotImplementedError
+
+    async def fetch_async(self, client, query, max_results):
+        raise NotImplementedError
+
+    def warm_up(self):
+        pass
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class FunctionProvider(Provider):
+    """Wraps the plain sync and async fetch functions of a live engine."""
+
+    def __init__(self, name, fetch, fetch_async, warm_up=None, capabilities=OPERATORS, domains=None, cost=1.0):
+        self.name = name
+        self._fetch = fetch
+        self._fetch_async = fetch_async
+        self._warm_up = warm_up
+        self.capabilities = capabilities
+        self.domains = domains
+        self.cost = cost
+
+    def fetch(self, query, max_results):
+        return self._fetch(query, max_results)
+
+    async def fetch_async(self, client, query, max_results):
+        return await self._fetch_async(client, query, max_results)
+
+    def warm_up(self):
+        if self._warm_up is not None:
+            self._warm_up()
+
+
+def _ddg_fetch(backend):
+    provider = f"DDG-{backend}"
+
+    def fetch(query, max_results):
+        logging.info(f"DDG Search ({backend}): {query}")
+        results = []
+        with sync_clients.lease(provider) as ddgs:
+            # We request more results than needed in case some are filtered out
+            ddg_gen = ddgs.text(query, region='wt-wt', safesearch='off', timelimit='y', backend=backend, max_results=max_results+2)
+
+            if ddg_gen:
+                for r in ddg_gen:
+                    results.append({
+                        "title": r.get('title', ''),
+                        "url": r.get('href', ''),
+                        "description": r.get('body', ''),
+                        "source": provider
+                    })
+        return results
+    return fetch
+
+
+def _google_fetch(query, max_results):
+    import async_providers
+
+    logging.info(f"Google Fallback: {query}")
+    # Same request googlesearch-python sends, over a pooled session.
+    # Pacing between calls is handled by the scheduler's token bucket.
+    with sync_clients.lease("Google") as session:
+        response = session.get(
+            async_providers.GOOGLE_URL,
+            params={"q": query, "num": max_results + 2, "hl": "en"},
+            headers={"Accept": "*/*"},
+            cookies=async_providers.GOOGLE_COOKIES,
+            timeout=10,
+        )
+        response.raise_for_status()
+        return async_providers.parse_google_html(
+            response.content, max_results, response_charset(response.headers.get("content-type"))
+        )
+
+
+def _bing_fetch(query, max_results):
+    import async_providers
+
+    logging.info(f"Bing Fallback: {query}")
+    # Search English results
+    with sync_clients.lease("Bing") as session:
+        response = session.get(async_providers.BING_URL, params={"q": query}, timeout=10)
+        if response.status_code != 200:
+            # Raising recycles the session, so the retry gets a new User-Agent
+            raise RuntimeError(f"Bing returned HTTP {response.status_code}")
+        return async_providers.parse_bing_html(
+            response.content, max_results, response_charset(response.headers.get("content-type"))
+        )
+
+
+def _ddg_fetch_async(backend):
+    async def fetch(client, query, max_results):
+        import async_providers
+
+        # We request more results than needed in case some are filtered out
+        return await async_providers.ddg_search(client, query, backend, max_results + 2)
+    return fetch
+
+
+def _ddg_provider(backend):
+    def build():
+        import serp_parser
+
+        # The DDG pages are parsed by serp_parser; picking its backend imports selectolax/lxml
+        name = f"DDG-{backend}"
+        return FunctionProvider(name, _ddg_fetch(backend), _ddg_fetch_async(backend), serp_parser.default_backend,
+                                **ENGINE_PROFILES[name])
+    return build
+
+
+def _serp_provider(name, fetch, fetch_async_name):
+    def build():
+        import async_providers
+        import serp_parser
+
+        # Picking the parser backend imports selectolax/lxml
+        return FunctionProvider(name, fetch, getattr(async_providers, fetch_async_name), serp_parser.default_backend,
+                                **ENGINE_PROFILES[name])
+    return build
+
+
+def _wikipedia_provider():
+    from wikipedia_provider import WikipediaProvider
+
+    return WikipediaProvider(**ENGINE_PROFILES["Wikipedia"])
+
+
+def _profile_probe_provider():
+    from profile_probe import ProfileProbeProvider
+
+    return ProfileProbeProvider(**ENGINE_PROFILES["Profiles"])
+
+
+# name -> zero-argument factory, run on the first get(name)
+_factories = {
+    "DDG-api": _ddg_provider('api'),
+    "DDG-html": _ddg_provider('html'),
+    "DDG-lite": _ddg_provider('lite'),
+    "Google": _serp_provider("Google", _google_fetch, "google_search"),
+    "Bing": _serp_provider("Bing", _bing_fetch, "bing_search"),
+    "Wikipedia": _wikipedia_provider,
+}
+if PROFILE_PROBE_ENABLED:
+    _factories["Profiles"] = _profile_probe_provider
+_registry = {}
+_lock = threading.Lock()
+
+
+def get(name):
+    provider = _registry.get(name)
+    if provider is None:
+        with _lock:
+            provider = _registry.get(name)
+            if provider is None:
+                provider = _registry[name] = _factories[name]()
+                logging.info(f"Loaded provider {name}")
+    return provider
+
+
+def register(provider):
+    """Adds or replaces a provider. A new name is scheduled after the built-in engines."""
+    _registry[provider.name] = provider
+    scheduler.add(provider.name, provider.rate)
+
+
+def available(name):
+    return name in _registry or name in _factories
+
+
+def loaded():
+    """Names of the providers built so far."""
+    return sorted(_registry)
+
+
+@contextmanager
+def use_providers(replacements):
+    """
+    Temporarily replaces registered providers, e.g. with offline stand-ins:
+
+        with use_providers(synthetic_providers(latency=0.05)):
+            deep_dive_search("Jane Doe")
+    """
+    replacements = replacements.values() if isinstance(replacements, dict) else replacements
+    previous = dict(_registry)
+    try:
+        for provider in replacements:
+            register(provider)
+        yield
+    finally:
+        for provider in replacements:
+            if provider.name not in previous and provider.name not in _factories:
+                scheduler.remove(provider.name)
+        _registry.clear()
+        _registry.update(previous)
@@ -0,0 +1,215 @@
+import os
+import re
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+
+CATEGORY_NAMES = ["Social Profiles", "Documents", "news", "Videos & Media", "Mentions", "General"]
+
+# A category counts as saturated once it holds this many exact matches; its
+# remaining broad queries (no site:) are skipped. A site: query is judged by
+# the exact matches on its own sites instead, and the only query for a site
+# always runs, so a pile of namesakes on one network never stops the search
+# of another.
+CATEGORY_SATURATION = int(os.environ.get("PLANNER_CATEGORY_SATURATION", 10))
+
+# Default cap on provider queries per lookup (None = run the whole plan)
+DEFAULT_QUERY_BUDGET = int(os.environ["PLANNER_QUERY_BUDGET"]) if os.environ.get("PLANNER_QUERY_BUDGET") else None
+
+# Domain -> category used to route results of broad queries
+DOMAIN_CATEGORIES = {
+    "linkedin.com": "Social Profiles",
+    "instagram.com": "Social Profiles",
+    "facebook.com": "Social Profiles",
+    "twitter.com": "Social Profiles",
+    "x.com": "Social Profiles",
+    "github.com": "Social Profiles",
+    "youtube.com": "Videos & Media",
+    "youtu.be": "Videos & Media",
+    "tiktok.com": "Videos & Media",
+    "vimeo.com": "Videos & Media",
+}
+
+# (category, query template, expected yield, route by domain/filetype, skip once exact hits exist on)
+# {base} is name + extra_info, {name} is the name alone.
+FULL_TEMPLATES = [
+    ("Social Profiles", '{base} site:linkedin.com', 90, False, ()),
+    ("Social Profiles", '{base} site:instagram.com', 70, False, ()),
+    ("Social Profiles", '{base} site:facebook.com', 60, False, ()),
+    ("Social Profiles", '{base} site:twitter.com', 60, False, ()),
+    ("Social Profiles", '{base} site:github.com', 55, False, ()),
+    ("Social Profiles", '{base} "linkedin"', 40, False, ("linkedin.com",)), # Broad keyword search
+    ("Social Profiles", '{base} "instagram"', 35, False, ("instagram.com",)),
+    ("Documents", '{base} resume filetype:pdf', 45, False, ()),
+    ("Documents", '{base} cv filetype:pdf', 35, False, ()),
+    ("Documents", '{base} resume OR cv', 40, False, ()),
+    ("Documents", '{base} filetype:pdf', 50, False, ()), # Broad document search
+    ("news", '{base} news', 65, False, ()),
+    ("news", '{base} latest article', 30, False, ()),
+    ("Videos & Media", '{base} site:youtube.com', 55, False, ()),
+    ("Videos & Media", '{base} site:tiktok.com', 40, False, ()),
+    ("Videos & Media", '{base} video OR reel OR channel', 30, False, ()),
+    ("Mentions", '{base} -site:linkedin.com -site:instagram.com -site:facebook.com -site:twitter.com -site:youtube.com', 50, False, ()),
+    ("General", '{name}', 80, False, ()), # Fallback broad search
+]
+
+# Same coverage with overlapping queries folded together. Broad queries are
+# routed, so e.g. a LinkedIn hit from the "linkedin OR instagram" query still
+# lands in Social Profiles and a PDF from "resume OR cv" in Documents.
+COLLAPSED_TEMPLATES = [
+    ("Social Profiles", '{base} site:linkedin.com', 90, False, ()),
+    ("Social Profiles", '{base} site:instagram.com', 70, False, ()),
+    ("Social Profiles", '{base} site:facebook.com', 60, False, ()),
+    ("Social Profiles", '{base} site:twitter.com', 60, False, ()),
+    ("Social Profiles", '{base} site:github.com', 55, False, ()),
+    ("Social Profiles", '{base} linkedin OR instagram', 40, True, ("linkedin.com", "instagram.com")),
+    ("Documents", '{base} filetype:pdf', 50, False, ()),
+    ("Documents", '{base} resume OR cv', 40, True, ()),
+    ("news", '{base} news OR article', 65, False, ()),
+    ("Videos & Media", '{base} site:youtube.com', 55, False, ()),
+    ("Videos & Media", '{base} site:tiktok.com', 40, False, ()),
+    ("Videos & Media", '{base} video OR reel OR channel', 30, True, ()),
+    ("Mentions", '{base} -site:linkedin.com -site:instagram.com -site:facebook.com -site:twitter.com -site:youtube.com', 50, False, ()),
+    ("General", '{name}', 80, True, ()), # Fallback broad search
+]
+
+
+def _domain(url):
+    host = urlparse(url).netloc.lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def _matches_domain(host, domain):
+    return host == domain or host.endswith("." + domain)
+
+
+_SITE = re.compile(r"(?<![-\w])site:(\S+)")
+
+
+def target_sites(query):
+    """Domains the query restricts itself to with site: (not -site:)."""
+    sites = (site.lower() for site in _SITE.findall(query))
+    return tuple(site[4:] if site.startswith("www.") else site for site in sites)
+
+
+def route_category(url, default_category):
+    """Picks the category a result of a broad query belongs in."""
+    path = urlparse(url).path.lower()
+    if path.endswith(".pdf"):
+        return "Documents"
+    host = _domain(url)
+    for domain, category in DOMAIN_CATEGORIES.items():
+        if _matches_domain(host, domain):
+            return category
+    return default_category
+
+
+class PlannedQuery:
+    __slots__ = ("query", "category", "priority", "route", "skip_if_exact_on", "sites")
+
+    def __init__(self, query, category, priority, route=False, skip_if_exact_on=()):
+        self.query = query
+        self.category = category
+        self.priority = priority
+        self.route = route
+        self.skip_if_exact_on = skip_if_exact_on
+        self.sites = target_sites(query)
+
+    def __repr__(self):
+        return f"PlannedQuery({self.query!r}, {self.category!r}, priority={self.priority})"
+
+
+class QueryPlanner:
+    """
+    Decides which queries a lookup runs and in what order. Queries are ordered
+    by expected yield and capped by a per-lookup budget; while results come in
+    the planner skips broad queries whose category is already saturated or
+    whose target sites already produced an exact match, and site: queries
+    whose sites are saturated and also searched by another query. Thread-safe, so the sync
+    thread-pool workers can consult it as they pick up queries.
+    """
+
+    def __init__(self, name, extra_info="", budget=None, collapse=True,
+                 saturation=CATEGORY_SATURATION, categories=None):
+        # Remove specific quotes to allow broader search, relying on strict filter for precision
+        base_query = f"{name}"
+        if extra_info:
+            base_query += f" {extra_info}"
+
+        templates = COLLAPSED_TEMPLATES if collapse else FULL_TEMPLATES
+        queries = []
+        seen = set()
+        for category, template, priority, route, skip_on in templates:
+            # e.g. a refresh re-runs only the categories that went stale
+            if categories is not None and category not in categories:
+                continue
+            query = template.format(base=base_query, name=name)
+            # e.g. the General query is the base query when there is no extra_info
+            if query in seen:
+                continue
+            seen.add(query)
+            queries.append(PlannedQuery(query, category, priority, route, skip_on))
+
+        # Highest expected yield first; stable, so template order breaks ties
+        queries.sort(key=lambda q: -q.priority)
+        if budget is None:
+            budget = DEFAULT_QUERY_BUDGET
+        if budget is not None:
+            queries = queries[:max(budget, 0)]
+
+        self.queries = queries
+        self.saturation = saturation
+        self.skipped = []
+        # site -> planned queries restricted to it
+        self._site_queries = Counter(site for pq in queries for site in pq.sites)
+        self._exact_counts = {cat: 0 for cat in CATEGORY_NAMES}
+        # host -> exact matches found on it
+        self._exact_hosts = Counter()
+        self._lock = threading.Lock()
+
+    def categories(self):
+        """Returns {category: [queries]} for every category, in plan order."""
+        plan = {cat: [] for cat in CATEGORY_NAMES}
+        for pq in self.queries:
+            plan.setdefault(pq.category, []).append(pq.query)
+        return plan
+
+    def route(self, planned, records):
+        """Splits a query's records into {category: [records]}."""
+        if not planned.route:
+            return {planned.category: records} if records else {}
+        routed = {}
+        for record in records:
+            routed.setdefault(route_category(record.url, planned.category), []).append(record)
+        return routed
+
+    def record(self, category, records):
+        """Updates saturation state with the records kept for a category."""
+        with self._lock:
+            for record in records:
+                if record.exact:
+                    self._exact_counts[category] = self._exact_counts.get(category, 0) + 1
+                    self._exact_hosts[_domain(record.url)] += 1
+
+    def _exact_on(self, domain):
+        return sum(n for host, n in self._exact_hosts.items() if _matches_domain(host, domain))
+
+    def should_run(self, planned):
+        """
+        False if the query would only re-find what the lookup already has.
+        Skipped queries are remembered in self.skipped.
+        """
+        with self._lock:
+            reason = None
+            if planned.sites:
+                if all(self._site_queries[site] > 1 and self._exact_on(site) >= self.saturation
+                       for site in planned.sites):
+                    reason = "site saturated"
+            elif self._exact_counts.get(planned.category, 0) >= self.saturation:
+                reason = "category saturated"
+            elif planned.skip_if_exact_on and all(self._exact_on(d) for d in planned.skip_if_exact_on):
+                reason = "exact match already found"
+            if reason:
+                self.skipped.append((planned.query, reason))
+                return False
+            return True
@@ -0,0 +1,192 @@
+import re
+from urllib.parse import urlparse
+
+import providers
+
+# Decides, per query, which providers get it and in what form. Each provider
+# declares the operators it understands (providers.OPERATORS) and the sites it
+# covers; for every operator in the query the router either keeps it, rewrites
+# it into plain keywords and filters the answer afterwards, or, when the
+# provider cannot answer the query at all, leaves the provider out:
+#
+#   site:x      kept | provider only covers x: dropped | covers other sites: skipped
+#               | no support: "x" keyword, results kept only from x
+#               (a site_only provider keeps it, and skips queries naming none of its sites)
+#   -site:x     kept | no support: dropped, results from x removed
+#   filetype:t  kept | site-bound provider: skipped | no support: "t" keyword,
+#               results kept only if the URL ends in .t
+#   OR, "..."   kept | no support: dropped (the words stay)
+
+# How well a provider fits a query, best first
+DEDICATED = 0   # searches only the site the query asks for
+NATIVE = 1      # understands every operator in the query
+TRANSLATED = 2  # operators rewritten, the answer filtered afterwards
+FIT_NAMES = {DEDICATED: "dedicated", NATIVE: "native", TRANSLATED: "translated"}
+
+_TOKEN = re.compile(r'-?\w+:"[^"]*"|"[^"]*"|\S+')
+
+
+class ParsedQuery:
+    __slots__ = ("tokens", "sites", "excluded_sites", "filetypes")
+
+    def __init__(self, query):
+        self.tokens = _TOKEN.findall(query)
+        self.sites = []
+        self.excluded_sites = []
+        self.filetypes = []
+        for token in self.tokens:
+            operator, value = _operator(token)
+            if operator == "site":
+                self.sites.append(value)
+            elif operator == "-site":
+                self.excluded_sites.append(value)
+            elif operator == "filetype":
+                self.filetypes.append(value)
+
+
+def _operator(token):
+    """(operator, value) for an operator token, else (None, token)."""
+    lowered = token.lower()
+    for prefix in ("-site:", "site:", "filetype:"):
+        if lowered.startswith(prefix) and len(token) > len(prefix):
+            return prefix[:-1], token[len(prefix):].strip('"').lower()
+    if token == "OR":
+        return "OR", token
+    if len(token) > 1 and token.startswith('"') and token.endswith('"'):
+        return "phrase", token
+    return None, token
+
+
+def _host(url):
+    return (urlparse(url).hostname or "").lower()
+
+
+def on_domain(url, domains):
+    host = _host(url)
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+def _site_keyword(site):
+    # linkedin.com -> linkedin, github.com/jane -> github
+    return site.split("/")[0].rsplit(".", 1)[0].split(".")[-1]
+
+
+class Route:
+    """One provider's version of a query, with the filter its answer needs."""
+
+    __slots__ = ("provider", "query", "fit", "keep_domains", "drop_domains", "filetypes")
+
+    def __init__(self, provider, query, fit=NATIVE, keep_domains=(), drop_domains=(), filetypes=()):
+        self.provider = provider
+        self.query = query
+        self.fit = fit
+        self.keep_domains = keep_domains
+        self.drop_domains = drop_domains
+        self.filetypes = filetypes
+
+    def accept(self, result):
+        url = result.get("url") or ""
+        if self.keep_domains and not on_domain(url, self.keep_domains):
+            return False
+        if self.drop_domains and on_domain(url, self.drop_domains):
+            return False
+        if self.filetypes and not urlparse(url).path.lower().endswith(tuple("." + t for t in self.filetypes)):
+            return False
+        return True
+
+    def apply(self, results):
+        if not (self.keep_domains or self.drop_domains or self.filetypes):
+            return results
+        return [r for r in results if self.accept(r)]
+
+    @property
+    def decision(self):
+        return FIT_NAMES[self.fit]
+
+    def __repr__(self):
+        return f"Route({self.provider!r}, {self.query!r}, {self.decision})"
+
+
+def route_for(parsed, query, provider):
+    """The Route sending `query` to `provider`, or None if it cannot answer it."""
+    caps = provider.capabilities
+    site_bound = provider.domains is not None
+
+    if site_bound:
+        if parsed.filetypes:
+            return None
+        if parsed.sites and not any(on_domain(f"https://{s}", provider.domains) for s in parsed.sites):
+            return None
+        if provider.site_only and not parsed.sites:
+            return None
+        if parsed.excluded_sites and all(
+            on_domain(f"https://{d}", parsed.excluded_sites) for d in provider.domains
+        ):
+            return None
+
+    words = []
+    keep_domains, drop_domains, filetypes = [], [], []
+    lossy = False
+    for token in parsed.tokens:
+        operator, value = _operator(token)
+        if operator is None:
+            words.append(token)
+        elif operator in ("site", "-site"):
+            # A site-bound provider was checked above; the operator is implied,
+            # unless the provider needs it to tell which of its sites is asked
+            if site_bound and not provider.site_only:
+                continue
+            lossy = lossy or operator not in caps
+            if operator in caps:
+                words.append(token)
+            elif operator == "site":
+                words.append(_site_keyword(value))
+                keep_domains.append(value.split("/")[0])
+            else:
+                drop_domains.append(value.split("/")[0])
+        elif operator == "filetype":
+            if operator in caps:
+                words.append(token)
+            else:
+                lossy = True
+                words.append(value)
+                filetypes.append(value)
+        elif operator in caps:
+            words.append(token)
+        else:
+            lossy = True
+            if operator == "phrase":
+                words.append(token.strip('"'))
+            # an unsupported OR is dropped; its neighbours stay as plain words
+
+    if lossy:
+        fit = TRANSLATED
+    elif site_bound and parsed.sites:
+        fit = DEDICATED
+    else:
+        fit = NATIVE
+    rewritten = " ".join(words)
+    if rewritten == " ".join(parsed.tokens):
+        rewritten = query
+    return Route(provider.name, rewritten, fit, tuple(keep_domains), tuple(drop_domains), tuple(filetypes))
+
+
+def route_query(query, candidates):
+    """
+    Routes for the candidate providers able to answer `query`, best fit first:
+    providers dedicated to the requested site, then those taking the query as
+    written, then those needing a rewrite; cheaper before dearer, otherwise in
+    candidate order. Returns (routes, skipped names).
+    """
+    parsed = ParsedQuery(query)
+    routes, skipped = [], []
+    for name in candidates:
+        if not providers.available(name):
+            continue
+        route = route_for(parsed, query, providers.get(name))
+        if route is None:
+            skipped.append(name)
+        else:
+            routes.append(route)
+    routes.sort(key=lambda r: (r.fit, providers.get(r.provider).cost))
+    return routes, skipped
@@ -0,0 +1,146 @@
+import logging
+import re
+from collections import namedtuple
+
+from scoring import ResultRecord
+
+# grade: "exact" or "partial"; term: the required term that produced the grade;
+# term_size: significant words in that term;
+# matched_words: words of that term found in the text, in term order;
+# first_word: first significant word found overall (used for the #:~:text= link);
+# fields: which of title/description/url the matched words were found in
+Match = namedtuple("Match", ["grade", "term", "term_size", "matched_words", "first_word", "fields"])
+
+MIN_WORD_LENGTH = 3
+
+
+class RelevanceMatcher:
+    """
+    Precompiled version of the strict relevance check in perform_search.
+    Built once per deep_dive_search call and shared by all worker tasks:
+    every significant word of every required term goes into a single
+    alternation regex, so each result is scanned once instead of once per word.
+    """
+
+    def __init__(self, required_terms=None):
+        self.terms = []  # (term, [significant words])
+        words = []  # unique words, one regex group each
+        seen = set()
+
+        for term in required_terms or []:
+            if not term:
+                continue
+            term = term.replace('"', '').strip()
+            sub_words = term.split()
+            if not sub_words:
+                continue
+            significant = [w for w in sub_words if len(w) >= MIN_WORD_LENGTH]
+            self.terms.append((term, significant))
+            for w in significant:
+                key = w.lower()
+                if key not in seen:
+                    seen.add(key)
+                    words.append(w)
+
+        self.enabled = bool(self.terms)
+        self._regex = None
+        self._shadowed = {}
+        if words:
+            # Longest first so "Johnson" wins over "John" at the same position
+            ordered = sorted(words, key=len, reverse=True)
+            self._group_words = ordered
+            alternation = "|".join(f"({re.escape(w)})" for w in ordered)
+            # A zero-width match at every word boundary, so a word found inside
+            # or overlapping another ("Neil" in "O'Neil") is still seen
+            self._regex = re.compile(rf"\b(?=(?:{alternation})(?![a-z]))", re.IGNORECASE)
+            # At one position only the longest word matches: a word that is a
+            # prefix of another can be hidden there; those few get an individual check.
+            for w in words:
+                if any(o != w and o.lower().startswith(w.lower()) for o in words):
+                    self._shadowed[w.lower()] = re.compile(rf"\b{re.escape(w)}(?![a-z])", re.IGNORECASE)
+
+    def scan(self, title, description, url):
+        """
+        Scans the result text once. Returns {lowercased word: set of fields it was found in}.
+        """
+        found = {}
+        if self._regex is None:
+            return found
+
+        text = f"{title} {description} {url}"
+        title_end = len(title)
+        description_end = title_end + 1 + len(description)
+
+        def field_at(pos):
+            if pos < title_end:
+                return "title"
+            if pos < description_end:
+                return "description"
+            return "url"
+
+        for m in self._regex.finditer(text):
+            found.setdefault(self._group_words[m.lastindex - 1].lower(), set()).add(field_at(m.start()))
+        for key, pattern in self._shadowed.items():
+            for m in pattern.finditer(text):
+                found.setdefault(key, set()).add(field_at(m.start()))
+        return found
+
+    def match(self, title, description, url):
+        """
+        Grades a result against the required terms in one pass.
+        Returns a Match, or None if no term matched at all.
+        """
+        found = self.scan(title, description, url)
+        result = None
+        first_word = None
+
+        for term, significant in self.terms:
+            matched_words = [w for w in significant if w.lower() in found]
+            if matched_words and first_word is None:
+                first_word = matched_words[0]
+            fields = frozenset().union(*(found[w.lower()] for w in matched_words))
+
+            # Grading
+            if len(matched_words) == len(significant):
+                return Match("exact", term, len(significant), matched_words, first_word, fields)
+            elif matched_words:
+                result = Match("partial", term, len(significant), matched_words, first_word, fields)
+
+        return result
+
+    def filter(self, raw_results):
+        """
+        Filters raw provider results, keeping those that contain at least one of the required terms.
+        Returns ResultRecords carrying the match details used for scoring.
+        """
+        processed_results = []
+
+        for rank, r in enumerate(raw_results, start=1):
+            title = r['title']
+            body = r['description']
+            url = r['url']
+            source = r.get('source', '')
+
+            # Strict Relevance Check
+            if not self.enabled:
+                processed_results.append(ResultRecord(title, url, body, source, rank))
+                continue
+
+            match = self.match(title, body, url)
+            if match is None:
+                logging.debug(f"Filtered result: '{title}'")
+                continue
+
+            if match.first_word and "#:~:text=" not in url:
+                url += f"#:~:text={match.first_word}"
+
+            processed_results.append(ResultRecord(
+                title, url, body, source, rank,
+                term=match.term,
+                term_size=match.term_size,
+                matched_words=match.matched_words,
+                exact=match.grade == "exact",
+                fields=match.fields,
+            ))
+
+        return processed_results
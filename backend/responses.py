@@ -0,0 +1,209 @@
+import base64
+import gzip
+import json
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+# Response encoding for the API: JSON serialized with orjson when installed,
+# gzip/brotli negotiated from Accept-Encoding, and per-category pagination and
+# field selection for /api/search results.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent as they are
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+# Brotli quality 4 compresses about as fast as gzip -6, usually a little smaller
+BROTLI_QUALITY = 4
+# Streamed one event or line at a time; compressing them would hold events back
+STREAMING_TYPES = ("text/event-stream", "application/x-ndjson")
+
+
+def dumps(content):
+    """JSON bytes; orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (the app's default response class)."""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def negotiate_encoding(accept_encoding):
+    """Picks "br", "gzip" or None from an Accept-Encoding header value."""
+    weights = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip()] = q
+
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """
+    Compresses whole (non-streaming) responses with brotli or gzip, whichever
+    the client prefers. SSE and NDJSON streams pass through untouched so every
+    event still reaches the client as soon as it is sent.
+    """
+
+    def __init__(self, app, minimum_size=MIN_COMPRESS_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+        chunks = []
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if "content-encoding" in headers or content_type.startswith(STREAMING_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+# --- pagination and field selection -----------------------------------------
+
+# A cursor names the snapshot of the lookup its first page was cut from (so
+# every later page comes from the same list) and the offset into it
+
+def encode_cursor(lookup_id, offset):
+    return base64.urlsafe_b64encode(f"{lookup_id}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(lookup_id, offset) from a cursor returned by paginate(); ValueError if it is not one."""
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        lookup_id, offset = text.split(":")
+        if not lookup_id.isalnum() or int(offset) < 0:
+            raise ValueError
+        return lookup_id, int(offset)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+def cursor_lookup(cursors):
+    """The lookup id the cursors page through, or None without cursors. ValueError if they disagree."""
+    lookup_ids = {decode_cursor(cursor)[0] for cursor in (cursors or {}).values()}
+    if len(lookup_ids) > 1:
+        raise ValueError("Cursors from different lookups")
+    return lookup_ids.pop() if lookup_ids else None
+
+
+# Keys of a /api/search result that `fields` may select
+RESULT_FIELDS = (
+    "title", "url", "description", "match_context", "categories", "queries", "_score",
+    "subject_confidence", "duplicates", "first_seen", "last_seen",
+)
+
+
+def check_page_params(limit=None, cursors=None, fields=None):
+    """
+    Raises ValueError for a non-positive limit, a malformed cursor, cursors
+    of different lookups or an unknown field.
+    """
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be at least 1")
+    cursor_lookup(cursors)
+    unknown = [f for f in fields or () if f not in RESULT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+
+def select_fields(item, fields):
+    return {f: item[f] for f in fields if f in item}
+
+
+def paginate(results, lookup_id, limit=None, cursors=None, categories=None, fields=None):
+    """
+    One page of {category: [results]}: up to `limit` results per category,
+    starting where the category's cursor (from a previous page) left off.
+    `results` must be the snapshot stored under `lookup_id`, which the next
+    cursors carry.
+    `categories` keeps only those categories; `fields` keeps only those keys
+    of each result. Returns (page, pages) where pages maps each category to
+    {"total", "next_cursor"} (None once the category is exhausted).
+    Raises ValueError for a malformed cursor.
+    """
+    cursors = cursors or {}
+    page, pages = {}, {}
+    for category, items in results.items():
+        if categories is not None and category not in categories:
+            continue
+        offset = decode_cursor(cursors[category])[1] if category in cursors else 0
+        end = len(items) if limit is None else offset + limit
+        chunk = items[offset:end]
+        if fields is not None:
+            chunk = [select_fields(item, fields) for item in chunk]
+        page[category] = chunk
+        pages[category] = {
+            "total": len(items),
+            "next_cursor": encode_cursor(lookup_id, end) if end < len(items) else None,
+        }
+    return page, pages
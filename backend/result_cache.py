@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Raw provider results are cached *before* required_terms filtering, so a
+# repeat lookup with different extra_info can still reuse them.
+CACHE_BACKEND = os.environ.get("SEARCH_CACHE_BACKEND", "memory")  # memory | sqlite
+CACHE_PATH = os.environ.get("SEARCH_CACHE_PATH", "/tmp/stkl_search_cache.sqlite3")
+CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", 6 * 60 * 60))
+CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_SIZE", 2048))
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+def make_key(query, provider, max_results):
+    return f"{provider}|{max_results}|{normalize_query(query)}"
+
+
+class MemoryCacheBackend:
+    """In-process LRU with per-entry expiry. Lost on restart."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCacheBackend:
+    """
+    Disk-backed LRU in a single SQLite file. Survives process restarts
+    (e.g. serverless cold starts that keep /tmp).
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_access ON search_cache(last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE search_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            # Evict expired rows first, then least recently used ones over the cap
+            self._conn.execute("DELETE FROM search_cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM search_cache WHERE key IN ("
+                " SELECT key FROM search_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+
+
+class ResultCache:
+    """
+    TTL + LRU cache of raw provider results keyed by (normalized query, provider).
+    Counts hits and misses for /api/health.
+    """
+
+    def __init__(self, backend, ttl=CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, query, providers, max_results):
+        """
+        Returns (provider, raw_results) for the first provider with a cached
+        answer to this query, or (None, None) on a miss.
+        """
+        for provider in providers:
+            try:
+                value = self.backend.get(make_key(query, provider, max_results))
+            except Exception as e:
+                logging.error(f"Cache read failed: {e}")
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                return provider, value
+        with self._lock:
+            self.misses += 1
+        return None, None
+
+    def store(self, query, provider, max_results, raw_results):
+        # Empty answers usually mean a block or a timeout, not "no results"
+        if not raw_results:
+            return
+        try:
+            self.backend.set(make_key(query, provider, max_results), raw_results, self.ttl)
+        except Exception as e:
+            logging.error(f"Cache write failed: {e}")
+
+    def store_snapshot(self, key, value, ttl):
+        """Keeps a finished lookup's response (e.g. the list a page was cut from) for `ttl` seconds."""
+        try:
+            self.backend.set(f"snapshot|{key}", value, ttl)
+        except Exception as e:
+            logging.error(f"Cache write failed: {e}")
+
+    def snapshot(self, key):
+        try:
+            return self.backend.get(f"snapshot|{key}")
+        except Exception as e:
+            logging.error(f"Cache read failed: {e}")
+            return None
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+
+
+def create_cache(backend=CACHE_BACKEND):
+    if backend == "sqlite":
+        try:
+            return ResultCache(SQLiteCacheBackend())
+        except Exception as e:
+            logging.error(f"SQLite cache unavailable, using memory cache: {e}")
+    return ResultCache(MemoryCacheBackend())
+
+
+# Shared by every request in this process
+result_cache = create_cache()
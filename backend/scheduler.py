@@ -0,0 +1,473 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Providers in order of preference. perform_search walks this list but skips
+# anything whose circuit is open, and defers anything that would have to wait
+# long for a rate-limit token.
+PROVIDER_ORDER = ["DDG-api", "DDG-html", "DDG-lite", "Google", "Bing", "Wikipedia", "Profiles"]
+
+# provider -> (tokens per second, burst capacity)
+PROVIDER_RATES = {
+    "DDG-api": (0.5, 3),
+    "DDG-html": (0.5, 3),
+    "DDG-lite": (0.5, 3),
+    "Google": (0.2, 2),
+    "Bing": (0.5, 3),
+    "Wikipedia": (5.0, 10),
+    # One call checks a few profile URLs on one site
+    "Profiles": (1.0, 5),
+}
+
+# Providers that would need to wait longer than this for a token are tried
+# after the ones that can go right away.
+MAX_PREFERRED_WAIT = 2.0
+
+FAILURE_THRESHOLD = 3
+COOLDOWN_SECONDS = 120.0
+
+# Pacing for providers registered at runtime that declare no rate
+DEFAULT_RATE = (0.5, 3)
+
+# Where pacing and health state live. "memory" is per process; "sqlite" shares
+# one file between every worker process on the host, so N uvicorn/gunicorn
+# workers together stay within one set of rate limits and trip one breaker.
+SCHEDULER_BACKEND = os.environ.get("SCHEDULER_BACKEND", "memory")  # memory | sqlite
+SCHEDULER_STATE_PATH = os.environ.get("SCHEDULER_STATE_PATH", "/tmp/stkl_scheduler.sqlite3")
+
+# A half-open trial call that has not reported back after this long (its
+# worker died or hung) no longer holds the circuit shut
+TRIAL_TIMEOUT = 30.0
+
+
+class TokenBucket:
+    """
+    Classic token bucket. reserve() returns how long the caller must wait for
+    its token, so concurrent callers queue up fairly instead of all sleeping a
+    random amount; a caller that gives up before its token is due refund()s it.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def reserve(self, now, max_wait=None):
+        """Seconds until the caller's token is due, or None (nothing reserved) if that is over max_wait."""
+        wait = self.wait_time(now)
+        if max_wait is not None and wait > max_wait:
+            return None
+        # Tokens may go negative: that is the queue of callers already waiting
+        self.tokens -= 1
+        return wait
+
+    def refund(self, now):
+        # Gives back a token that was never used, moving the queue behind it up
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and stays open for `cooldown`
+    seconds. After the cool-down a single trial call is let through (half-open);
+    success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN_SECONDS):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started = None
+
+    def state(self, now):
+        if self.opened_at is None:
+            return "closed"
+        if now - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self, now):
+        state = self.state(now)
+        if state == "closed":
+            return True
+        if state == "half-open" and (self.trial_started is None or now - self.trial_started >= TRIAL_TIMEOUT):
+            self.trial_started = now
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started = None
+
+    def release(self):
+        # The call was abandoned (e.g. a losing hedge); it proved nothing
+        self.trial_started = None
+
+    def record_failure(self, now):
+        self.failures += 1
+        self.trial_started = None
+        if self.failures >= self.threshold:
+            self.opened_at = now
+
+
+class MemorySchedulerState:
+    """Buckets and breakers of this process only. Lost on restart."""
+
+    # Only compared within the process
+    clock = staticmethod(time.monotonic)
+    # Changes take microseconds; fine to make on the event loop
+    blocking = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # provider -> (TokenBucket, CircuitBreaker)
+
+    def configure(self, rates, threshold, cooldown, reset=False):
+        """
+        Adds providers at full tokens and updates the rates of known ones;
+        reset=True first drops every provider's state.
+        """
+        with self._lock:
+            if reset:
+                self._entries.clear()
+            for p, (rate, capacity) in rates.items():
+                if p in self._entries:
+                    bucket = self._entries[p][0]
+                    bucket.rate, bucket.capacity = rate, capacity
+                    bucket.tokens = min(bucket.tokens, capacity)
+                else:
+                    self._entries[p] = (TokenBucket(rate, capacity), CircuitBreaker(threshold, cooldown))
+
+    def forget(self, provider):
+        with self._lock:
+            self._entries.pop(provider, None)
+
+    @contextmanager
+    def edit(self, providers, write=True):
+        """{provider: (bucket, breaker)}; changes made inside the block are kept."""
+        with self._lock:
+            yield {p: self._entries[p] for p in providers}
+
+
+class SQLiteSchedulerState:
+    """
+    Buckets and breakers in one SQLite file (WAL) shared by every process on
+    the host. Each change is a short write transaction: the row is read into
+    a TokenBucket and CircuitBreaker, changed by the same code as in memory
+    and written back, so concurrent workers never lose each other's updates.
+    """
+
+    # Wall-clock time, since the rows are compared across processes
+    clock = staticmethod(time.time)
+    # A transaction may wait (up to the busy timeout) for another worker's
+    # lock, so the asyncio pipeline runs it in a thread
+    blocking = True
+
+    def __init__(self, path=SCHEDULER_STATE_PATH):
+        self.path = path
+        self.threshold = FAILURE_THRESHOLD
+        self.cooldown = COOLDOWN_SECONDS
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._connection()
+
+    def _connection(self):
+        # A connection must not cross a fork (gunicorn --preload)
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS provider_state ("
+                " provider TEXT PRIMARY KEY, rate REAL NOT NULL, capacity REAL NOT NULL,"
+                " tokens REAL NOT NULL, updated REAL NOT NULL, failures INTEGER NOT NULL,"
+                " opened_at REAL, trial_started REAL)"
+            )
+            self._pid = os.getpid()
+        return self._conn
+
+    @contextmanager
+    def _transaction(self, write):
+        with self._lock:
+            conn = self._connection()
+            # IMMEDIATE takes the write lock up front, so two workers cannot
+            # both read the same token count and both spend it
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def configure(self, rates, threshold, cooldown, reset=False):
+        """
+        Adds providers at full tokens, keeping the state other workers built
+        up; rate changes apply to existing rows. reset=True first drops every
+        provider's state, for every worker.
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        now = self.clock()
+        with self._transaction(write=True) as conn:
+            if reset:
+                conn.execute("DELETE FROM provider_state")
+            conn.executemany(
+                "INSERT INTO provider_state (provider, rate, capacity, tokens, updated, failures)"
+                " VALUES (?, ?, ?, ?, ?, 0)"
+                " ON CONFLICT(provider) DO UPDATE SET rate = excluded.rate, capacity = excluded.capacity,"
+                " tokens = MIN(tokens, excluded.capacity)",
+                [(p, rate, capacity, capacity, now) for p, (rate, capacity) in rates.items()],
+            )
+
+    def forget(self, provider):
+        # Other workers may still schedule it; an idle row costs nothing
+        pass
+
+    @contextmanager
+    def edit(self, providers, write=True):
+        """{provider: (bucket, breaker)}; with write=True changes are saved when the block ends."""
+        providers = list(providers)
+        with self._transaction(write) as conn:
+            rows = conn.execute(
+                "SELECT provider, rate, capacity, tokens, updated, failures, opened_at, trial_started"
+                f" FROM provider_state WHERE provider IN ({','.join('?' * len(providers))})",
+                providers,
+            ).fetchall()
+            entries = {}
+            for provider, rate, capacity, tokens, updated, failures, opened_at, trial_started in rows:
+                bucket = TokenBucket(rate, capacity)
+                bucket.tokens = tokens
+                bucket.updated = updated
+                breaker = CircuitBreaker(self.threshold, self.cooldown)
+                breaker.failures = failures
+                breaker.opened_at = opened_at
+                breaker.trial_started = trial_started
+                entries[provider] = (bucket, breaker)
+            yield {p: entries[p] for p in providers}
+            if write:
+                conn.executemany(
+                    "UPDATE provider_state SET tokens = ?, updated = ?, failures = ?, opened_at = ?,"
+                    " trial_started = ? WHERE provider = ?",
+                    [(b.tokens, b.updated, c.failures, c.opened_at, c.trial_started, p)
+                     for p, (b, c) in entries.items()],
+                )
+
+
+def create_state(backend=SCHEDULER_BACKEND):
+    if backend == "sqlite":
+        try:
+            return SQLiteSchedulerState()
+        except Exception as e:
+            logging.error(f"SQLite scheduler state unavailable, using memory state: {e}")
+    return MemorySchedulerState()
+
+
+class ProviderScheduler:
+    """
+    Pacing and health state for every search provider, kept in `state`
+    (this process only, or shared by all workers on the host; see
+    SCHEDULER_BACKEND). Thread-safe, so the sync thread-pool path and the
+    async path share it.
+    """
+
+    def __init__(self, rates=None, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN_SECONDS, state=None):
+        self.state = state or create_state()
+        # Providers added at runtime, kept across reset()
+        self.added = {}
+        self.configure(rates, threshold, cooldown)
+
+    def configure(self, rates=None, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN_SECONDS, reset=False):
+        """
+        Sets the rates and breaker settings, keeping the state built up so far
+        (with shared state, by every worker); reset=True drops it instead.
+        """
+        rates = dict(rates or PROVIDER_RATES)
+        for p, rate in self.added.items():
+            rates.setdefault(p, rate)
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state.configure(rates, threshold, cooldown, reset=reset)
+        self.order = [p for p in PROVIDER_ORDER if p in rates] + [p for p in rates if p not in PROVIDER_ORDER]
+
+    def reset(self, rates=None, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN_SECONDS):
+        """
+        Drops all pacing and health state, optionally with new rates (used by
+        benchmarks). With shared state this resets every worker.
+        """
+        self.configure(rates, threshold, cooldown, reset=True)
+
+    def add(self, provider, rate=None):
+        """Schedules a provider registered at runtime, after the built-in ones."""
+        if provider in self.order:
+            return
+        rate = rate or DEFAULT_RATE
+        self.added[provider] = rate
+        self.state.configure({provider: rate}, self.threshold, self.cooldown)
+        self.order.append(provider)
+
+    def remove(self, provider):
+        self.added.pop(provider, None)
+        self.state.forget(provider)
+        if provider in self.order:
+            self.order.remove(provider)
+
+    def plan(self, providers=None):
+        """
+        Returns the providers worth trying, healthy ones that can go now first.
+        Providers with an open circuit are left out entirely.
+        """
+        providers = self.order if providers is None else providers
+        if not providers:
+            return []
+        now = self.state.clock()
+        with self.state.edit(providers, write=False) as entries:
+            healthy = [p for p in providers if entries[p][1].state(now) != "open"]
+            return sorted(healthy, key=lambda p: entries[p][0].wait_time(now) > MAX_PREFERRED_WAIT)
+
+    def load(self, providers=None):
+        """
+        (tokens per second, backlog) of the healthy providers together, where
+        backlog is the seconds they need to serve every caller already queued
+        for a token (0.0 if tokens are to spare).
+        """
+        providers = self.order if providers is None else providers
+        if not providers:
+            return 0.0, 0.0
+        now = self.state.clock()
+        queued = rate = 0.0
+        with self.state.edit(providers, write=False) as entries:
+            for bucket, breaker in entries.values():
+                if breaker.state(now) == "open":
+                    continue
+                bucket.wait_time(now)  # refill first
+                queued += max(0.0, -bucket.tokens)
+                rate += bucket.rate
+        return rate, queued / rate if rate else 0.0
+
+    def _reserve(self, provider, max_wait):
+        now = self.state.clock()
+        with self.state.edit([provider]) as entries:
+            bucket, breaker = entries[provider]
+            if not breaker.allow(now):
+                return None
+            wait = bucket.reserve(now, max_wait)
+            if wait is None:
+                # Not calling after all; a half-open trial goes to the next caller
+                breaker.release()
+            return wait
+
+    def acquire(self, provider, max_wait=None, on_wait=None):
+        """
+        Blocks until the provider may be called. Returns False, without
+        taking a token, if its circuit is open or the token is more than
+        max_wait seconds away. on_wait(seconds) is told the wait up front.
+        """
+        wait = self._reserve(provider, max_wait)
+        if wait is None:
+            return False
+        if on_wait:
+            on_wait(wait)
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    async def _off_loop(self, fn, *args):
+        """Runs a state change from the event loop, in a thread if the state may block."""
+        if self.state.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def plan_async(self, providers=None):
+        return await self._off_loop(self.plan, providers)
+
+    async def load_async(self, providers=None):
+        return await self._off_loop(self.load, providers)
+
+    async def acquire_async(self, provider, max_wait=None, on_wait=None):
+        """
+        Non-blocking version of acquire() for the asyncio pipeline. A caller
+        cancelled before it calls the provider should record_cancelled(refund=True).
+        """
+        wait = await self._off_loop(self._reserve, provider, max_wait)
+        if wait is None:
+            return False
+        if on_wait:
+            on_wait(wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    def record_success(self, provider):
+        with self.state.edit([provider]) as entries:
+            entries[provider][1].record_success()
+
+    def record_cancelled(self, provider, refund=False):
+        """
+        A call that was cancelled before it answered counts as neither success
+        nor failure. refund=True gives its token back: it never reached the
+        provider (e.g. a lost hedge still waiting for its token).
+        """
+        now = self.state.clock()
+        with self.state.edit([provider]) as entries:
+            bucket, breaker = entries[provider]
+            breaker.release()
+            if refund:
+                bucket.refund(now)
+
+    def record_failure(self, provider):
+        now = self.state.clock()
+        with self.state.edit([provider]) as entries:
+            breaker = entries[provider][1]
+            was_open = breaker.opened_at is not None
+            breaker.record_failure(now)
+            opened = not was_open and breaker.opened_at is not None
+        if opened:
+            logging.warning(f"Circuit opened for {provider} for {breaker.cooldown:.0f}s")
+
+    async def record_success_async(self, provider):
+        await self._off_loop(self.record_success, provider)
+
+    async def record_cancelled_async(self, provider, refund=False):
+        # The thread finishes the write even if this await is cancelled again
+        await self._off_loop(self.record_cancelled, provider, refund)
+
+    async def record_failure_async(self, provider):
+        await self._off_loop(self.record_failure, provider)
+
+    def snapshot(self):
+        now = self.state.clock()
+        with self.state.edit(self.order, write=False) as entries:
+            snapshot = {}
+            for p, (bucket, breaker) in entries.items():
+                bucket.wait_time(now)  # refill before reporting
+                snapshot[p] = {
+                    "circuit": breaker.state(now),
+                    "failures": breaker.failures,
+                    "tokens": round(max(bucket.tokens, 0.0), 2),
+                }
+            return snapshot
+
+
+# Shared by every request in this process (and, with SCHEDULER_BACKEND=sqlite,
+# every worker on the host)
+scheduler = ProviderScheduler()
@@ -0,0 +1,126 @@
+from urllib.parse import urlparse
+
+# How much a match in each field says about relevance
+FIELD_WEIGHTS = {
+    "title": 1.0,
+    "url": 0.8,
+    "description": 0.5,
+}
+
+# Rough authority of the sites a footprint lookup cares about most
+DOMAIN_AUTHORITY = {
+    "linkedin.com": 1.0,
+    "wikipedia.org": 0.95,
+    "github.com": 0.9,
+    "twitter.com": 0.85,
+    "x.com": 0.85,
+    "facebook.com": 0.8,
+    "instagram.com": 0.8,
+    "youtube.com": 0.8,
+    "tiktok.com": 0.7,
+}
+DEFAULT_AUTHORITY = 0.5
+
+# Share of the final score each signal contributes (sums to 1)
+SCORE_WEIGHTS = {
+    "match": 0.45,
+    "field": 0.20,
+    "authority": 0.10,
+    "fusion": 0.25,
+}
+
+# Reciprocal-rank-fusion score that counts as full agreement: two queries
+# both ranking the URL first (with k=60)
+RRF_SATURATION = 2.0 / 61
+
+
+class ResultRecord:
+    """
+    Compact record for one filtered search result. Replaces the loose dicts
+    perform_search used to return; to_dict() keeps the JSON shape the
+    frontend expects.
+    """
+
+    __slots__ = (
+        "title", "url", "description", "source", "category", "rank",
+        "term", "term_size", "matched_words", "exact", "fields",
+        "categories", "queries", "rrf", "score", "subject_confidence",
+    )
+
+    def __init__(self, title, url, description, source="", rank=1, term=None,
+                 term_size=0, matched_words=(), exact=False, fields=frozenset()):
+        self.title = title
+        self.url = url
+        self.description = description
+        self.source = source
+        self.category = None
+        self.rank = rank  # 1-based position in the provider's result list
+        self.term = term  # required term that matched, None if unfiltered
+        self.term_size = term_size  # significant words in that term
+        self.matched_words = list(matched_words)
+        self.exact = exact
+        self.fields = fields  # which of title/description/url matched
+        self.categories = []  # every category whose queries returned this URL
+        self.queries = []  # every query that returned this URL
+        self.rrf = 0.0  # reciprocal-rank-fusion score across those queries
+        self.score = 0.0
+        self.subject_confidence = None  # set by disambiguation when the subject can be told apart
+
+    @property
+    def match_context(self):
+        if self.term is None:
+            return "General Search Result"
+        if self.exact:
+            return f"Exact Match: '{self.term}'"
+        return f"Partial Match: {', '.join(self.matched_words)}"
+
+    def to_dict(self):
+        return {
+            "title": self.title,
+            "url": self.url,
+            "description": self.description,
+            "match_context": self.match_context,
+            "categories": self.categories,
+            "queries": self.queries,
+            "_score": self.score,
+            "subject_confidence": self.subject_confidence,
+        }
+
+
+def domain_authority(url):
+    host = urlparse(url).netloc.lower().split(":")[0]
+    for domain, authority in DOMAIN_AUTHORITY.items():
+        if host == domain or host.endswith("." + domain):
+            return authority
+    return DEFAULT_AUTHORITY
+
+
+def score_result(record):
+    """
+    Ranks a result on a 0-100 scale from match quality, where the match was
+    found, site authority and its reciprocal-rank-fusion score, which rewards
+    both a high provider rank and being found by several queries.
+    """
+    if record.term is None:
+        match = 0.5
+    elif record.exact:
+        match = 1.0
+    else:
+        # Partial matches top out well below an exact one
+        match = 0.6 * len(record.matched_words) / max(record.term_size, 1)
+
+    field = max((FIELD_WEIGHTS[f] for f in record.fields), default=0.0)
+
+    authority = domain_authority(record.url)
+
+    # One query at rank 1 -> 0.5, two queries at rank 1 -> 1.0
+    fusion = min(record.rrf / RRF_SATURATION, 1.0)
+
+    score = 100 * (
+        SCORE_WEIGHTS["match"] * match
+        + SCORE_WEIGHTS["field"] * field
+        + SCORE_WEIGHTS["authority"] * authority
+        + SCORE_WEIGHTS["fusion"] * fusion
+    )
+    record.score = round(score, 2)
+    return record.score
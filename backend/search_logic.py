@@ -1,316 +1,715 @@
-import requests
-from bs4 import BeautifulSoup
 import concurrent.futures
-import time
-import random
+import contextvars
 import logging
+import asyncio
+import os
+import time
+import weakref
+
+import providers
+from relevance import RelevanceMatcher
+from fusion import ResultFusion
+from query_planner import QueryPlanner
+from http_clients import get_async_client
+import hedging
+from hedging import QUERY_DEADLINE, latency_tracker, race, race_async
+from result_cache import normalize_query, result_cache
+from disambiguation import DISAMBIGUATION_ENABLED, disambiguate, load as load_disambiguation
+from footprint_index import footprint_index, subject_key
+from near_duplicates import NEAR_DUPLICATES_ENABLED, collapse as collapse_near_duplicates
+from single_flight import SingleFlight
+from metrics import (
+    record_attempt, record_cache, record_disambiguation, record_filter, record_lookup, record_near_duplicates,
+    record_query, record_routes,
+)
+from query_router import route_query
+from scheduler import PROVIDER_ORDER, scheduler
 
-from duckduckgo_search import DDGS
-from googlesearch import search as gsearch
 
+def filter_results(raw_results, required_terms=None, matcher=None):
+    """
+    Filters raw provider results, keeping those that contain at least one of the required_terms.
+    Pass a prebuilt RelevanceMatcher to skip recompiling the patterns for every query.
+    """
+    if matcher is None:
+        matcher = RelevanceMatcher(required_terms)
+    return matcher.filter(raw_results)
+
+def _candidate_routes(query):
+    routes, skipped = route_query(query, scheduler.order)
+    record_routes(routes, skipped)
+    return {route.provider: route for route in routes}
 
-import re
 
-def perform_search(query, required_terms=None, max_results=5):
+def plan_routes(query):
     """
-    Performs a search using DuckDuckGo, falling back to Google Search if needed.
-    Filters results to ensure they contain at least one of the required_terms.
+    {provider: Route} for the providers able to answer the query, in the order
+    to try them: best fit first, then as the scheduler prefers (healthy, able
+    to go now). Providers that cannot answer the query are never called.
     """
-    raw_results = []
-    
-    # 1. Try DuckDuckGo with Backend Rotation
-    # Vercel IPs are often blocked, so we try different backends ('api', 'html', 'lite')
-    ddg_backends = ['api', 'html', 'lite']
-    
-    for backend in ddg_backends:
-        if raw_results:
-            break # Stop if we found results
-            
-        try:
-            # Random sleep to minimize rate limiting
-            sleep_time = random.uniform(1.0, 3.0)
-            time.sleep(sleep_time)
-            
-            logging.info(f"DDG Search ({backend}): {query}")
-            
-            # Initialize DDGS with the specific backend
-            # Note: The 'backend' param is passed to the .text() method in newer versions, 
-            # or used to instantiate. We'll try passing it to .text() as it's the standard way now.
-            with DDGS() as ddgs:
-                # We request more results than needed in case some are filtered out
-                ddg_gen = ddgs.text(query, region='wt-wt', safesearch='off', timelimit='y', backend=backend, max_results=max_results+2)
-                
-                if ddg_gen:
-                    for r in ddg_gen:
-                        raw_results.append({
-                            "title": r.get('title', ''),
-                            "url": r.get('href', ''),
-                            "description": r.get('body', ''),
-                            "source": f"DDG-{backend}"
-                        })
-                        
-            if raw_results:
-                logging.info(f"Success with DDG-{backend}")
-                
-        except Exception as e:
-            logging.error(f"DDG-{backend} failed for '{query}': {e}")
+    by_provider = _candidate_routes(query)
+    return {provider: by_provider[provider] for provider in scheduler.plan(list(by_provider))}
 
-    # 2. Fallback to Google Search if DDG failed or returned 0
-    if not raw_results:
-        try:
-            logging.info(f"Google Fallback: {query}")
-            from googlesearch import search as gsearch
-            # advanced=True returns objects with title/description
-            g_gen = gsearch(query, num_results=max_results, advanced=True, sleep_interval=5)
-            for r in g_gen:
-                raw_results.append({
-                    "title": r.title,
-                    "url": r.url,
-                    "description": r.description,
-                    "source": "Google"
-                })
-        except Exception as e:
-             logging.error(f"Google failed for '{query}': {e}")
 
-    # 3. Fallback to Bing Search (Scraping) if Google failed
-    if not raw_results:
-        try:
-            logging.info(f"Bing Fallback: {query}")
-            # Rotational User-Agents to bypass scrapers
-            user_agents = [
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15",
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0",
-                "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
-            ]
-            headers = {
-                "User-Agent": random.choice(user_agents),
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                "Accept-Language": "en-US,en;q=0.9"
-            }
-            # Search English results
-            response = requests.get(f"https://www.bing.com/search?q={query}", headers=headers, timeout=10)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                # Bing results are usually in 'li.b_algo'
-                results = soup.find_all('li', class_='b_algo')
-                for r in results[:max_results]:
-                    title_tag = r.find('h2')
-                    link_tag = r.find('a')
-                    desc_tag = r.find('p')
-                    
-                    if title_tag and link_tag:
-                        raw_results.append({
-                            "title": title_tag.get_text(),
-                            "url": link_tag.get('href'),
-                            "description": desc_tag.get_text() if desc_tag else "",
-                            "source": "Bing"
-                        })
-        except Exception as e:
-            logging.error(f"Bing failed for '{query}': {e}")
+def route_tiers(routes):
+    """
+    Splits planned routes into the ones to try first and the last-resort ones
+    (Provider.fallback), keeping their order; empty tiers are left out.
+    """
+    first = {p: route for p, route in routes.items() if not providers.get(p).fallback}
+    last = {p: route for p, route in routes.items() if p not in first}
+    return [tier for tier in (first, last) if tier]
 
-    # 4. Final Fallback: Wikipedia (Official API - Reliable on Vercel)
-    if not raw_results:
-        try:
-            logging.info(f"Wikipedia Fallback: {query}")
-            import wikipedia
-            # Set language to english
-            wikipedia.set_lang("en")
-            # Search for pages
-            wiki_search = wikipedia.search(query, results=1)
-            if wiki_search:
-                page = wikipedia.page(wiki_search[0], auto_suggest=False)
-                raw_results.append({
-                    "title": page.title,
-                    "url": page.url,
-                    "description": page.summary[:300] + "...",
-                    "source": "Wikipedia"
-                })
-        except Exception as e:
-             logging.error(f"Wikipedia failed for '{query}': {e}")
-
-    # 3. Process and Filter Results
-    processed_results = []
-    
-    for r in raw_results:
-        title = r['title']
-        body = r['description']
-        url = r['url']
-        
-        combined_text = f"{title} {body} {url}"
-        
-        match_found = False
-        match_reason = ""
-        
-        # Strict Relevance Check
-        if required_terms:
-            clean_terms = [t.replace('"', '').strip() for t in required_terms if t]
-            
-            for term in clean_terms:
-                sub_words = term.split()
-                if not sub_words:
-                    continue
-                
-                matched_words = []
-                for word in sub_words:
-                    if len(word) < 3: 
-                        continue
-                    
-                    pattern = rf"\b{re.escape(word)}(?![a-z])"
-                    if re.search(pattern, combined_text, re.IGNORECASE):
-                        matched_words.append(word)
-                        if "#:~:text=" not in url:
-                            url += f"#:~:text={word}"
-
-                # Grading
-                if len(matched_words) == len([w for w in sub_words if len(w) >= 3]):
-                    match_found = True
-                    match_reason = f"Exact Match: '{term}'"
-                    break
-                elif len(matched_words) > 0:
-                    match_found = True
-                    match_reason = f"Partial Match: {', '.join(matched_words)}"
-                
-            if not match_found:
-                logging.debug(f"Filtered result: '{title}'")
-                continue
+
+async def plan_routes_async(query):
+    """Async version of plan_routes; shared scheduler state is read off the event loop."""
+    by_provider = _candidate_routes(query)
+    return {provider: by_provider[provider] for provider in await scheduler.plan_async(list(by_provider))}
+
+
+def _attempt(route, query, max_results):
+    """
+    One paced provider call with the query as routed to that provider. Records
+    health and answer time, caches the answer and returns the raw results, or
+    None if the provider was skipped or failed.
+    """
+    provider = route.provider
+    # Wait for a rate-limit token; False means the circuit just opened or the
+    # token would come after the query's deadline
+    start = time.monotonic()
+    if not scheduler.acquire(provider, max_wait=hedging.time_left(), on_wait=hedging.token_wait):
+        record_attempt(provider, query, "skipped")
+        return None
+
+    # Only the provider's own answer time feeds the hedge delays
+    fetch_start = time.monotonic()
+    try:
+        raw_results = route.apply(providers.get(provider).fetch(route.query, max_results))
+    except Exception as e:
+        scheduler.record_failure(provider)
+        record_attempt(provider, query, "error", fetch_start - start, time.monotonic() - fetch_start, error=e)
+        logging.error(f"{provider} failed for '{query}': {e}")
+        return None
+
+    latency = time.monotonic() - fetch_start
+    latency_tracker.record(provider, latency)
+    record_attempt(provider, query, "success" if raw_results else "empty",
+                   fetch_start - start, latency, len(raw_results))
+    scheduler.record_success(provider)
+    # An answer about the person, not the query, must not answer the query
+    # for another lookup (e.g. the same name with other extra_info)
+    if not providers.get(provider).answers_subject:
+        result_cache.store(query, provider, max_results, raw_results)
+    return raw_results
+
+
+# Runs hedged attempts for the sync path; separate from the deep-dive pool so
+# a query's attempts never wait behind other queries
+_hedge_executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+# Identical queries in flight at the same time (e.g. two analysts looking up
+# the same person) share one provider call
+search_flights = SingleFlight()
+
+
+def flight_key(query, max_results):
+    """
+    Identical queries share one flight. When a provider that answers from the
+    person (Provider.answers_subject) may take the query, only lookups of the
+    same person do: its answer is about the leader's subject, e.g. the same
+    name with other extra_info would get the wrong Wikipedia article.
+    """
+    key = f"{max_results}|{normalize_query(query)}"
+    subject = providers.current_subject()
+    if subject is not None and _reaches_subject_provider(query):
+        key += f"|{subject_key(*subject)}"
+    return key
+
+
+def _reaches_subject_provider(query):
+    routes, _ = route_query(query, scheduler.order)
+    return any(providers.get(route.provider).answers_subject for route in routes)
+
+
+def fetch_raw_results(query, max_results=5, hedge=None):
+    """
+    Unfiltered results for a query from the cache or the first healthy
+    provider that answers. Concurrent identical calls share one provider call.
+    """
+    start = time.perf_counter()
+    raw_results, shared = search_flights.do(
+        flight_key(query, max_results), lambda: _fetch_raw_results(query, max_results, hedge)
+    )
+    record_query(query, time.perf_counter() - start, coalesced=shared)
+    return raw_results
+
+
+def _fetch_raw_results(query, max_results, hedge):
+    # Serve repeat lookups from the cache before touching any provider
+    provider, raw_results = result_cache.lookup(query, PROVIDER_ORDER, max_results)
+    record_cache(query, raw_results is not None)
+    if raw_results is not None:
+        logging.info(f"Cache hit ({provider}): {query}")
+        return raw_results
+
+    if hedge is None:
+        hedge = hedging.HEDGING_ENABLED
+
+    routes = plan_routes(query)
+    provider, raw_results = None, []
+    deadline = time.monotonic() + QUERY_DEADLINE
+    # Last-resort providers only get the query if no other provider answers it
+    for tier in route_tiers(routes):
+        if time.monotonic() >= deadline:
+            logging.warning(f"Query deadline reached: {query}")
+            break
+        if hedge:
+            provider, raw_results = race(
+                list(tier), lambda p: _attempt(routes[p], query, max_results), _hedge_executor,
+                deadline=deadline - time.monotonic(), group_of=provider_group,
+            )
         else:
-            match_reason = "General Search Result"
+            for candidate in tier:
+                if time.monotonic() >= deadline:
+                    logging.warning(f"Query deadline reached: {query}")
+                    break
+                raw_results = _attempt(routes[candidate], query, max_results) or []
+                if raw_results:
+                    provider = candidate
+                    break # Stop if we found results
+        if raw_results:
+            break
+
+    if raw_results:
+        logging.info(f"Success with {provider}")
+    return raw_results
 
-        processed_results.append({
-            "title": title,
-            "url": url,
-            "description": body,
-            "match_context": match_reason 
-        })
-            
-    return processed_results
 
-def deep_dive_search(name, extra_info=""):
+def perform_search(query, required_terms=None, max_results=5, matcher=None, hedge=None):
     """
-    Constructs specific queries to find deeper information and categorizes results.
-    Uses parallel execution to speed up the process.
+    Performs a search using the first healthy provider that returns results.
+    Providers are ordered by the shared scheduler (DDG backends, Google, Bing),
+    skipping any whose circuit breaker is open; Wikipedia is only asked when
+    none of them has an answer.
+    With hedging (the default, see hedging.HEDGING_ENABLED) the next provider is
+    started once the current one runs past its usual p90 answer time instead of
+    after it fails; either way the query gives up after QUERY_DEADLINE seconds.
+    Filters results to ensure they contain at least one of the required_terms
+    and returns them as ResultRecords. Callers sharing an in-flight query each
+    apply their own filter.
     """
-    # Remove specific quotes to allow broader search, relying on strict filter for precision
-    base_query = f"{name}"
+    raw_results = fetch_raw_results(query, max_results, hedge)
+
+    # Process and Filter Results
+    start = time.perf_counter()
+    records = filter_results(raw_results, required_terms, matcher)
+    record_filter(query, raw_results, records, time.perf_counter() - start)
+    return records
+
+def build_required_terms(name, extra_info=""):
+    # Pass list of required terms (Name + Extra Info)
+    terms = [name]
     if extra_info:
-        base_query += f" {extra_info}"
-    
-    # Define query map: Query -> Category
-    query_tasks = []
-    
-    categories = {
-        "Social Profiles": [
-            f'{base_query} site:linkedin.com',
-            f'{base_query} site:instagram.com',
-            f'{base_query} site:facebook.com',
-            f'{base_query} site:twitter.com',
-            f'{base_query} site:github.com',
-            f'{base_query} "linkedin"', # Broad keyword search
-            f'{base_query} "instagram"',
-        ],
-        "Documents": [
-            f'{base_query} resume filetype:pdf',
-            f'{base_query} cv filetype:pdf',
-            f'{base_query} resume OR cv',
-            f'{base_query} filetype:pdf', # Broad document search
-        ],
-        "news": [
-             f'{base_query} news',
-             f'{base_query} latest article',
-        ],
-        "Videos & Media": [
-            f'{base_query} site:youtube.com',
-            f'{base_query} site:tiktok.com',
-            f'{base_query} video OR reel OR channel',
-        ],
-        "Mentions": [
-            f'{base_query} -site:linkedin.com -site:instagram.com -site:facebook.com -site:twitter.com -site:youtube.com',
-        ],
-        "General": [
-            f'{name}', # Fallback broad search
-        ]
+        terms.append(extra_info)
+    return terms
+
+
+def finalize_results(fusion, name, extra_info=""):
+    """
+    Fuses every query's ranked list and converts the records to the JSON
+    shape returned to the frontend (each category sorted by score).
+    """
+    fused = fusion.fuse()
+    # Results about other people sharing the name are dropped here
+    if DISAMBIGUATION_ENABLED:
+        start = time.perf_counter()
+        dropped = disambiguate(fused, name, extra_info)
+        record_disambiguation(dropped, time.perf_counter() - start)
+    structured_results = {
+        cat: [r.to_dict() for r in records] for cat, records in fused.items()
     }
+    # Syndicated copies of one story become a single result listing the others
+    if NEAR_DUPLICATES_ENABLED:
+        record_near_duplicates(collapse_near_duplicates(structured_results))
+
+    # Calculate stats
+    total_results = sum(len(v) for v in structured_results.values())
+    logging.info(f"Total results found: {total_results}")
+
+    return structured_results
+
+
+def merge_planned_results(planner, fusion, planned, results):
+    """
+    Routes one query's records to categories, records them for fusion and
+    updates the planner's saturation state. Returns {category: newly added records}.
+    """
+    added = {}
+    for cat, records in planner.route(planned, results).items():
+        new_records = fusion.add(planned.query, cat, records)
+        planner.record(cat, new_records)
+        if new_records:
+            added[cat] = new_records
+    return added
+
+
+def index_lookup(name, extra_info, planner, structured_results):
+    """Merges a finished lookup into the footprint index (no-op when disabled)."""
+    if footprint_index is None:
+        return
+    ran = [cat for cat, queries in planner.categories().items() if queries]
+    try:
+        footprint_index.record(name, extra_info, structured_results, ran)
+    except Exception as e:
+        logging.error(f"Failed to index results for {name}: {e}")
+
+
+def deep_dive_search(name, extra_info="", query_budget=None, categories=None):
+    """
+    Constructs specific queries to find deeper information and categorizes results.
+    Uses parallel execution to speed up the process.
+    Queries run in order of expected yield; query_budget caps how many are sent.
+    categories limits the lookup to those categories' queries.
+    """
+    start = time.perf_counter()
+    planner = QueryPlanner(name, extra_info, budget=query_budget, categories=categories)
+    # Compiled once and shared by every worker
+    matcher = RelevanceMatcher(build_required_terms(name, extra_info))
 
     # Helper function for threading
-    def execute_query(query, category):
+    def execute_query(planned):
+        # Checked when a worker picks the query up, so earlier results can cancel it
+        if not planner.should_run(planned):
+            logging.info(f"Planner skipped: {planned.query}")
+            return []
         try:
-            # Pass list of required terms (Name + Extra Info)
-            terms = [name]
-            if extra_info:
-                terms.append(extra_info)
-                
             # Increase max_results to 25 to catch "bits and pieces"
-            return category, perform_search(query, required_terms=terms, max_results=25)
+            with providers.lookup_subject(name, extra_info):
+                return perform_search(planned.query, max_results=25, matcher=matcher)
         except Exception as e:
-            logging.error(f"Error executing {query}: {e}")
-            return category, []
-
-    # Prepare tasks
-    for category, queries in categories.items():
-        for q in queries:
-            query_tasks.append((q, category))
-
-    structured_results = {
-        "Social Profiles": [],
-        "Documents": [],
-        "news": [],
-        "Videos & Media": [],
-        "Mentions": [],
-        "General": []
-    }
+            logging.error(f"Error executing {planned.query}: {e}")
+            return []
 
-    # Execute in parallel 
-    # Reduced workers to 3 to avoid rate limits
-    # Deduplication Set
-    unique_urls = set()
-
-    def normalize_url(u):
-        return u.rstrip('/').lower()
+    # Collects every query's ranked list for reciprocal-rank fusion
+    fusion = ResultFusion(planner.categories())
 
     # Execute tasks in parallel
     # DRASTICALLY REDUCED workers to 2 to bypass bot detection
+    # (the pool runs submissions FIFO, i.e. in planner order)
     with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-        future_to_query = {executor.submit(execute_query, q, cat): (q, cat) for q, cat in query_tasks}
+        # Each worker runs in a copy of the caller's context (e.g. its request trace)
+        future_to_query = {
+            executor.submit(contextvars.copy_context().run, execute_query, pq): pq for pq in planner.queries
+        }
         
         for future in concurrent.futures.as_completed(future_to_query):
-            query_str, original_category = future_to_query[future] # Store original query and category for logging
+            planned = future_to_query[future] # Store original query and category for logging
             try:
-                cat, results = future.result()
+                results = future.result()
                 if results:
-                    for res in results:
-                        # Deduplication Check
-                        norm_url = normalize_url(res['url'])
-                        if norm_url in unique_urls:
-                            continue
-                        
-                        unique_urls.add(norm_url)
-                        
-                        # Add Score for Sorting
-                        # Exact Match = 100 points
-                        # Partial Match = 10 points per word
-                        # Penalty for generic "General" category? No.
-                        score = 0
-                        if "Exact Match" in res['match_context']:
-                            score = 100
-                        elif "Partial Match" in res['match_context']:
-                            # Count commas to guess number of words
-                            match_count = res['match_context'].count(',') + 1
-                            score = 10 * match_count
-                        
-                        res['_score'] = score
-                        structured_results[cat].append(res)
-                        
-                    # logging.info(f"Added {len(results)} results to {cat}")
+                    merge_planned_results(planner, fusion, planned, results)
             except Exception as e:
-                logging.error(f"Task failed for query '{query_str}' in category '{original_category}': {e}")
+                logging.error(f"Task failed for query '{planned.query}' in category '{planned.category}': {e}")
 
-    # Sort each category by Score (Highest First)
-    for cat in structured_results:
-        structured_results[cat].sort(key=lambda x: x.get('_score', 0), reverse=True)
+    structured_results = finalize_results(fusion, name, extra_info)
+    index_lookup(name, extra_info, planner, structured_results)
+    record_lookup("sync", time.perf_counter() - start)
+    return structured_results
 
-    # Calculate stats
-    total_results = sum(len(v) for v in structured_results.values())
-    logging.info(f"Total results found: {total_results}")
-    
+
+# ---------------------------------------------------------------------------
+# Async pipeline
+# ---------------------------------------------------------------------------
+
+# Max in-flight requests per provider group (per event loop). These replace the
+# old global 2-worker cap: each engine is paced on its own, so a blocked DDG
+# backend no longer holds up Wikipedia or Bing. Rate pacing itself comes from
+# the shared scheduler's token buckets.
+PROVIDER_CONCURRENCY = {
+    "DDG": 2,
+    "Google": 1,
+    "Bing": 2,
+    "Wikipedia": 4,
+    "Profiles": 2,
+}
+# For providers registered at runtime
+DEFAULT_PROVIDER_CONCURRENCY = 2
+
+# loop -> {provider group: asyncio.Semaphore}
+_provider_semaphores = weakref.WeakKeyDictionary()
+
+
+def provider_group(provider):
+    """Providers sharing a backend host, e.g. the three DDG backends."""
+    return provider.split("-")[0]
+
+
+def _provider_semaphore(provider):
+    group = provider_group(provider)
+    loop = asyncio.get_running_loop()
+    semaphores = _provider_semaphores.setdefault(loop, {})
+    if group not in semaphores:
+        semaphores[group] = asyncio.Semaphore(PROVIDER_CONCURRENCY.get(group, DEFAULT_PROVIDER_CONCURRENCY))
+    return semaphores[group]
+
+
+# Load providers at startup instead of on the first lookup (see warm_up)
+WARM_UP_ON_START = os.environ.get("SEARCH_WARM_UP", "0") == "1"
+
+
+def warm_up_providers():
+    """
+    Loads every provider the scheduler would try right now (circuit not open),
+    with the modules its first call would import. Returns their names.
+    """
+    # e.g. the profile probe is scheduled but not registered with PROFILE_PROBE=0
+    names = [name for name in scheduler.plan() if providers.available(name)]
+    for name in names:
+        try:
+            providers.get(name).warm_up()
+        except Exception as e:
+            logging.error(f"Warm-up failed for {name}: {e}")
+    return names
+
+
+async def warm_up():
+    """warm_up_providers plus the shared async HTTP client and numpy/scipy."""
+    names = await asyncio.to_thread(warm_up_providers)
+    if DISAMBIGUATION_ENABLED:
+        await asyncio.to_thread(load_disambiguation)
+    get_async_client()
+    return names
+
+
+async def _attempt_async(client, route, query, max_results):
+    """Async version of _attempt."""
+    provider = route.provider
+    start = time.monotonic()
+    fetch_start = None
+    try:
+        # Take the rate-limit token first so waiting callers stay visible
+        # to scheduler.plan() and later queries spill over to idle providers.
+        # A token due after the deadline is not taken at all.
+        if not await scheduler.acquire_async(provider, max_wait=hedging.time_left(), on_wait=hedging.token_wait):
+            record_attempt(provider, query, "skipped")
+            return None
+        async with _provider_semaphore(provider):
+            logging.info(f"{provider} Search: {route.query}")
+            fetch_start = time.monotonic()
+            raw_results = route.apply(await providers.get(provider).fetch_async(client, route.query, max_results))
+    except asyncio.CancelledError:
+        # Lost a hedge race; says nothing about the provider's health. If the
+        # provider was never called, its token goes back to the bucket.
+        await scheduler.record_cancelled_async(provider, refund=fetch_start is None)
+        now = time.monotonic()
+        record_attempt(provider, query, "cancelled", (fetch_start or now) - start, now - (fetch_start or now))
+        raise
+    except Exception as e:
+        await scheduler.record_failure_async(provider)
+        now = time.monotonic()
+        record_attempt(provider, query, "error", (fetch_start or now) - start, now - (fetch_start or now), error=e)
+        logging.error(f"{provider} failed for '{query}': {e}")
+        return None
+
+    latency = time.monotonic() - fetch_start
+    latency_tracker.record(provider, latency)
+    record_attempt(provider, query, "success" if raw_results else "empty",
+                   fetch_start - start, latency, len(raw_results))
+    await scheduler.record_success_async(provider)
+    if not providers.get(provider).answers_subject:
+        result_cache.store(query, provider, max_results, raw_results)
+    return raw_results
+
+
+async def fetch_raw_results_async(query, max_results=5, hedge=None):
+    """Async version of fetch_raw_results."""
+    start = time.perf_counter()
+    raw_results, shared = await search_flights.do_async(
+        flight_key(query, max_results), lambda: _fetch_raw_results_async(query, max_results, hedge)
+    )
+    record_query(query, time.perf_counter() - start, coalesced=shared)
+    return raw_results
+
+
+async def _fetch_raw_results_async(query, max_results, hedge):
+    provider, raw_results = result_cache.lookup(query, PROVIDER_ORDER, max_results)
+    record_cache(query, raw_results is not None)
+    if raw_results is not None:
+        logging.info(f"Cache hit ({provider}): {query}")
+        return raw_results
+
+    client = get_async_client()
+
+    routes = await plan_routes_async(query)
+
+    async def attempt(candidate):
+        return await _attempt_async(client, routes[candidate], query, max_results)
+
+    if hedge is None:
+        hedge = hedging.HEDGING_ENABLED
+
+    provider, raw_results = None, []
+    end = time.monotonic() + QUERY_DEADLINE
+    for tier in route_tiers(routes):
+        deadline = end - time.monotonic()
+        if deadline <= 0:
+            logging.warning(f"Query deadline reached: {query}")
+            break
+        if hedge:
+            provider, raw_results = await race_async(list(tier), attempt, deadline=deadline, group_of=provider_group)
+        else:
+            # One attempt at a time in plan order: the deadline still applies,
+            # hedging never fires
+            provider, raw_results = await race_async(list(tier), attempt, delay_for=lambda p: float("inf"),
+                                                     deadline=deadline)
+        if raw_results:
+            break
+
+    if raw_results:
+        logging.info(f"Success with {provider}")
+    return raw_results
+
+
+async def perform_search_async(query, required_terms=None, max_results=5, matcher=None, hedge=None):
+    """
+    Async version of perform_search. Tries healthy providers in scheduler order
+    over the shared httpx.AsyncClient, waiting for tokens without blocking a thread.
+    Hedged attempts that lose the race are cancelled.
+    """
+    raw_results = await fetch_raw_results_async(query, max_results, hedge)
+    start = time.perf_counter()
+    records = filter_results(raw_results, required_terms, matcher)
+    record_filter(query, raw_results, records, time.perf_counter() - start)
+    return records
+
+
+# Queries of one lookup allowed past the planner at once. Later queries wait
+# here, so they are checked against the results of earlier ones before running.
+PLANNER_WINDOW = 4
+
+
+async def iter_deep_dive_async(name, extra_info, planner, fusion):
+    """
+    Runs the planner's queries concurrently (highest expected yield first) and
+    yields (planned_query, ran, added) as each one completes, where `added` maps
+    category -> results whose URL that query was first to find. Every result
+    is also recorded in fusion. Unfinished queries are cancelled if the
+    consumer stops early.
+    """
+    matcher = RelevanceMatcher(build_required_terms(name, extra_info))
+    window = asyncio.Semaphore(PLANNER_WINDOW)
+
+    async def execute_query(planned):
+        async with window:
+            if not planner.should_run(planned):
+                logging.info(f"Planner skipped: {planned.query}")
+                return planned, False, []
+            try:
+                with providers.lookup_subject(name, extra_info):
+                    return planned, True, await perform_search_async(planned.query, max_results=25, matcher=matcher)
+            except Exception as e:
+                logging.error(f"Error executing {planned.query}: {e}")
+                return planned, True, []
+
+    tasks = [asyncio.ensure_future(execute_query(pq)) for pq in planner.queries]
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            planned, ran, results = await next_done
+            added = merge_planned_results(planner, fusion, planned, results) if results else {}
+            yield planned, ran, added
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def deep_dive_search_async(name, extra_info="", query_budget=None, categories=None):
+    """
+    Async version of deep_dive_search. Queries are scheduled together in planner
+    order; per-provider semaphores bound how many actually hit each engine.
+    """
+    start = time.perf_counter()
+    planner = QueryPlanner(name, extra_info, budget=query_budget, categories=categories)
+    fusion = ResultFusion(planner.categories())
+    async for _ in iter_deep_dive_async(name, extra_info, planner, fusion):
+        pass
+    structured_results = finalize_results(fusion, name, extra_info)
+    await asyncio.to_thread(index_lookup, name, extra_info, planner, structured_results)
+    record_lookup("async", time.perf_counter() - start)
     return structured_results
+
+
+# subject key -> running background refresh, so a subject refreshes once at a time
+_refreshes = {}
+
+
+def refresh_in_progress(name, extra_info=""):
+    return subject_key(name, extra_info) in _refreshes
+
+
+def schedule_refresh(name, extra_info="", query_budget=None):
+    """
+    Re-runs, in the background, only the subject's categories whose index
+    entries went stale and merges the results into the footprint index.
+    Returns the categories being refreshed (empty if nothing is stale).
+    """
+    if footprint_index is None:
+        return []
+    stale = footprint_index.stale_categories(name, extra_info)
+    key = subject_key(name, extra_info)
+    if not stale or key in _refreshes:
+        return stale
+
+    async def refresh():
+        try:
+            logging.info(f"Refreshing {', '.join(stale)} for {name}")
+            await deep_dive_search_async(name, extra_info, query_budget, categories=stale)
+        except Exception as e:
+            logging.error(f"Refresh failed for {name}: {e}")
+        finally:
+            _refreshes.pop(key, None)
+
+    _refreshes[key] = asyncio.ensure_future(refresh())
+    return stale
+
+
+async def cancel_refreshes():
+    """Stops background refreshes, e.g. on shutdown."""
+    tasks = list(_refreshes.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def lookup_key(name, extra_info="", query_budget=None):
+    """Lookups with the same key run the same queries and give the same results."""
+    return f"{normalize_query(name)}|{normalize_query(extra_info)}|{query_budget}"
+
+
+# People of one batch looked up at the same time. Provider semaphores and
+# token buckets bound what actually reaches the engines; this only bounds
+# how many lookups are in progress (and in memory) at once.
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 16))
+
+# Seconds of engine tokens a batch may keep queued. The next person only
+# starts while the callers queued for tokens would be served within this, and
+# while the people already running (each with up to PLANNER_WINDOW queries
+# waiting) fit in it at the engines' combined rate. Past that, the queries of
+# people started later miss QUERY_DEADLINE and they get fewer results.
+BATCH_MAX_BACKLOG = float(os.environ.get("BATCH_MAX_BACKLOG", QUERY_DEADLINE / 2))
+
+# How long a started lookup gets to queue its first queries before the next
+# person is checked against the backlog
+BATCH_ADMIT_SETTLE = 0.25
+
+
+def engine_providers():
+    """Providers that take general queries, the ones whose queues a batch fills."""
+    return [
+        name for name in scheduler.order
+        if providers.available(name) and not (providers.get(name).site_only or providers.get(name).fallback)
+    ]
+
+
+async def engine_capacity(running, max_backlog=BATCH_MAX_BACKLOG):
+    """
+    0.0 if one more lookup besides `running` fits in max_backlog seconds of
+    engine tokens, else roughly how many seconds to wait before asking again.
+    """
+    rate, backlog = await scheduler.load_async(engine_providers())
+    # A single lookup always runs, however slow the engines are
+    if running == 0 or ((running + 1) * PLANNER_WINDOW <= max_backlog * rate and backlog <= max_backlog):
+        return 0.0
+    return min(max(backlog - max_backlog, 0.25), 1.0)
+
+
+async def batch_search_stream(lookups, concurrency=BATCH_CONCURRENCY, max_backlog=BATCH_MAX_BACKLOG):
+    """
+    Looks up many people through the shared scheduler. `lookups` is a list of
+    (name, extra_info, query_budget). Yields (indexes, results) as each person
+    completes, where indexes are the positions in `lookups` the results answer:
+    identical lookups run once. A failed lookup yields an Exception as results.
+    Queries shared between people are coalesced by the single-flight layer.
+    People start in order, each once the engines have tokens for it (see
+    BATCH_MAX_BACKLOG), so later people get the same results as earlier ones.
+    """
+    unique = {}
+    for index, (name, extra_info, query_budget) in enumerate(lookups):
+        unique.setdefault(lookup_key(name, extra_info, query_budget), []).append(index)
+
+    gate = asyncio.Semaphore(concurrency)
+    # One person is admitted at a time, in order
+    admission = asyncio.Lock()
+    running = 0
+    admitted_at = 0.0
+
+    async def run(indexes):
+        nonlocal running, admitted_at
+        name, extra_info, query_budget = lookups[indexes[0]]
+        async with gate:
+            async with admission:
+                # The backlog only shows the last person once its first queries are queued
+                await asyncio.sleep(admitted_at + BATCH_ADMIT_SETTLE - time.monotonic())
+                while wait := await engine_capacity(running, max_backlog):
+                    await asyncio.sleep(wait)
+                running += 1
+                admitted_at = time.monotonic()
+            try:
+                return indexes, await deep_dive_search_async(name, extra_info, query_budget)
+            except Exception as e:
+                logging.error(f"Batch lookup failed for {name}: {e}")
+                return indexes, e
+            finally:
+                running -= 1
+
+    tasks = [asyncio.ensure_future(run(indexes)) for indexes in unique.values()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def batch_records(lookups, indexes, results):
+    """One output record per position a batch result answers (NDJSON lines)."""
+    for index in indexes:
+        name, extra_info, _ = lookups[index]
+        record = {"index": index, "name": name, "extra_info": extra_info}
+        if isinstance(results, Exception):
+            record["error"] = str(results)
+        else:
+            record["total_results"] = sum(len(v) for v in results.values())
+            record["results"] = results
+        yield record
+
+
+async def deep_dive_search_stream(name, extra_info="", query_budget=None, categories=None):
+    """
+    Streaming version of deep_dive_search_async. Yields ("result", payload) for
+    every query that produced new results, then one ("summary", payload) with totals
+    and the final fused results.
+    """
+    start = time.perf_counter()
+    planner = QueryPlanner(name, extra_info, budget=query_budget, categories=categories)
+    fusion = ResultFusion(planner.categories())
+    queries_done = 0
+
+    async for planned, ran, added in iter_deep_dive_async(name, extra_info, planner, fusion):
+        queries_done += ran
+        for cat, records in added.items():
+            records.sort(key=lambda x: x.score, reverse=True)
+            yield "result", {"category": cat, "query": planned.query, "results": [r.to_dict() for r in records]}
+
+    # Batches above carry provisional scores; the summary reflects the fused ranking
+    structured_results = finalize_results(fusion, name, extra_info)
+    await asyncio.to_thread(index_lookup, name, extra_info, planner, structured_results)
+    record_lookup("stream", time.perf_counter() - start)
+    yield "summary", {
+        "total_results": sum(len(v) for v in structured_results.values()),
+        "categories": {cat: len(v) for cat, v in structured_results.items()},
+        "queries": queries_done,
+        "skipped": len(planner.skipped),
+        "results": structured_results,
+    }
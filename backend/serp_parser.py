@@ -0,0 +1,320 @@
+import codecs
+import logging
+import os
+import re
+from html.parser import HTMLParser
+
+# Result-block extraction for HTML-scraped search pages. A SerpSpec names the
+# element wrapping each result and the fields to pull out of it; a backend
+# returns one {field: value} dict per block, read straight from the response
+# bytes. Backends:
+#   selectolax - lexbor CSS engine (fastest, optional dependency)
+#   lxml       - libxml2 HTML parser with XPath (optional dependency)
+#   stream     - pure-Python streaming extractor: decodes the bytes
+#                incrementally and stops once enough blocks are found
+#   bs4        - the original BeautifulSoup tree, kept as a reference
+# SERP_PARSER picks one; "auto" uses the fastest installed.
+SERP_PARSER = os.environ.get("SERP_PARSER", "auto")
+
+# Only simple selectors are supported: "tag", ".class", "tag.class", "tag[attr]"
+_SELECTOR = re.compile(r"^(?P<tag>[a-z0-9]*)(?:\.(?P<cls>[\w-]+))?(?:\[(?P<attr>[\w-]+)\])?$")
+
+# Read this many bytes at a time in the streaming backend
+STREAM_CHUNK = 16 * 1024
+
+
+class Selector:
+    __slots__ = ("text", "tag", "cls", "attr")
+
+    def __init__(self, text):
+        match = _SELECTOR.match(text)
+        if not match or not (match["tag"] or match["cls"]):
+            raise ValueError(f"Unsupported selector: {text!r}")
+        self.text = text
+        self.tag = match["tag"] or None
+        self.cls = match["cls"]
+        self.attr = match["attr"]
+
+    def matches(self, tag, attrs):
+        if self.tag and tag != self.tag:
+            return False
+        if self.cls and self.cls not in (dict(attrs).get("class") or "").split():
+            return False
+        if self.attr and dict(attrs).get(self.attr) is None:
+            return False
+        return True
+
+    def xpath(self):
+        path = f".//{self.tag or '*'}"
+        if self.cls:
+            path += f"[contains(concat(' ', normalize-space(@class), ' '), ' {self.cls} ')]"
+        if self.attr:
+            path += f"[@{self.attr}]"
+        return path
+
+
+class SerpSpec:
+    """
+    block: selector of the element wrapping one result.
+    fields: {name: (selector, attribute or None for the element's text)};
+    each field takes the first matching element inside the block.
+    required: fields a block must have to count as a result; blocks missing
+    one are skipped and do not count towards max_results. required_any: a
+    block needs at least one of these (for pages where one result spans
+    several blocks, e.g. a table row each for link and snippet).
+    """
+
+    def __init__(self, block, fields, required=(), required_any=()):
+        self.block = Selector(block)
+        self.fields = {name: (Selector(sel), attr) for name, (sel, attr) in fields.items()}
+        self.required = required
+        self.required_any = required_any
+
+    def complete(self, block):
+        if self.required_any and all(block[name] is None for name in self.required_any):
+            return False
+        return all(block[name] is not None for name in self.required)
+
+
+def response_charset(content_type, default="utf-8"):
+    """Charset from a Content-Type header value, e.g. 'text/html; charset=utf-8'."""
+    match = re.search(r"charset=[\"']?([\w-]+)", content_type or "", re.IGNORECASE)
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    return default
+
+
+def _as_bytes(content, encoding):
+    return content.encode(encoding) if isinstance(content, str) else content
+
+
+# --- selectolax -------------------------------------------------------------
+
+def parse_selectolax(content, spec, max_results, encoding="utf-8"):
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(_as_bytes(content, encoding))
+    blocks = []
+    for node in tree.css(spec.block.text):
+        block = {}
+        for name, (selector, attr) in spec.fields.items():
+            found = node.css_first(selector.text)
+            if found is None:
+                block[name] = None
+            elif attr:
+                block[name] = found.attributes.get(attr)
+            else:
+                block[name] = found.text()
+        if not spec.complete(block):
+            continue
+        blocks.append(block)
+        if len(blocks) >= max_results:
+            break
+    return blocks
+
+
+# --- lxml -------------------------------------------------------------------
+
+def parse_lxml(content, spec, max_results, encoding="utf-8"):
+    import lxml.html
+
+    parser = lxml.html.HTMLParser(encoding=encoding)
+    root = lxml.html.document_fromstring(_as_bytes(content, encoding), parser=parser)
+    fields = [(name, selector.xpath(), attr) for name, (selector, attr) in spec.fields.items()]
+    blocks = []
+    for node in root.xpath(spec.block.xpath()):
+        block = {}
+        for name, path, attr in fields:
+            found = node.xpath(path)
+            if not found:
+                block[name] = None
+            elif attr:
+                block[name] = found[0].get(attr)
+            else:
+                block[name] = found[0].text_content()
+        if not spec.complete(block):
+            continue
+        blocks.append(block)
+        if len(blocks) >= max_results:
+            break
+    return blocks
+
+
+# --- pure-Python streaming extractor ----------------------------------------
+
+class _Enough(Exception):
+    pass
+
+
+class _BlockExtractor(HTMLParser):
+    """
+    Tracks only what is needed: whether we are inside a result block and
+    which fields inside it are still being read. Everything outside blocks
+    is skipped without building a tree.
+    """
+
+    def __init__(self, spec, max_results):
+        super().__init__(convert_charrefs=True)
+        self.spec = spec
+        self.max_results = max_results
+        self.blocks = []
+        self._block = None
+        self._block_tag = None
+        self._block_depth = 0
+        # [field name, tag, nesting depth, text parts] for text fields being read
+        self._reading = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._block is None:
+            if self.spec.block.matches(tag, attrs):
+                self._block = {name: None for name in self.spec.fields}
+                self._block_tag = tag
+                self._block_depth = 1
+            return
+
+        if tag == self._block_tag:
+            self._block_depth += 1
+        for reading in self._reading:
+            if reading[1] == tag:
+                reading[2] += 1
+        for name, (selector, attr) in self.spec.fields.items():
+            if self._block[name] is not None or any(r[0] == name for r in self._reading):
+                continue
+            if selector.matches(tag, attrs):
+                if attr:
+                    self._block[name] = dict(attrs).get(attr)
+                else:
+                    self._reading.append([name, tag, 1, []])
+
+    def handle_startendtag(self, tag, attrs):
+        # <br/>, <img/>: nothing to read, and no end tag to balance
+        if self._block is not None:
+            for name, (selector, attr) in self.spec.fields.items():
+                if attr and self._block[name] is None and selector.matches(tag, attrs):
+                    self._block[name] = dict(attrs).get(attr)
+
+    def handle_endtag(self, tag):
+        if self._block is None:
+            return
+        for reading in list(self._reading):
+            if reading[1] == tag:
+                reading[2] -= 1
+                if reading[2] == 0:
+                    self._finish(reading)
+        if tag == self._block_tag:
+            self._block_depth -= 1
+            if self._block_depth == 0:
+                self._close_block()
+
+    def handle_data(self, data):
+        for reading in self._reading:
+            reading[3].append(data)
+
+    def _finish(self, reading):
+        self._reading.remove(reading)
+        self._block[reading[0]] = "".join(reading[3])
+
+    def _close_block(self):
+        # Unclosed fields (e.g. a <p> without </p>) end with their block
+        for reading in list(self._reading):
+            self._finish(reading)
+        if self.spec.complete(self._block):
+            self.blocks.append(self._block)
+        self._block = None
+        if len(self.blocks) >= self.max_results:
+            raise _Enough()
+
+
+def parse_stream(content, spec, max_results, encoding="utf-8"):
+    extractor = _BlockExtractor(spec, max_results)
+    try:
+        if isinstance(content, str):
+            extractor.feed(content)
+        else:
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            view = memoryview(content)
+            for offset in range(0, len(view), STREAM_CHUNK):
+                extractor.feed(decoder.decode(view[offset:offset + STREAM_CHUNK]))
+            extractor.feed(decoder.decode(b"", final=True))
+        extractor.close()
+    except _Enough:
+        pass
+    return extractor.blocks
+
+
+# --- BeautifulSoup reference ------------------------------------------------
+
+def parse_bs4(content, spec, max_results, encoding="utf-8"):
+    from bs4 import BeautifulSoup
+
+    text = content.decode(encoding, errors="replace") if isinstance(content, bytes) else content
+    soup = BeautifulSoup(text, "html.parser")
+    blocks = []
+    for node in soup.select(spec.block.text):
+        block = {}
+        for name, (selector, attr) in spec.fields.items():
+            found = node.select_one(selector.text)
+            if found is None:
+                block[name] = None
+            elif attr:
+                block[name] = found.get(attr)
+            else:
+                block[name] = found.get_text()
+        if not spec.complete(block):
+            continue
+        blocks.append(block)
+        if len(blocks) >= max_results:
+            break
+    return blocks
+
+
+BACKENDS = {
+    "selectolax": parse_selectolax,
+    "lxml": parse_lxml,
+    "stream": parse_stream,
+    "bs4": parse_bs4,
+}
+
+
+def available_backends():
+    """Backends whose dependencies are installed, fastest first."""
+    names = []
+    for name, module in (("selectolax", "selectolax.lexbor"), ("lxml", "lxml.html")):
+        try:
+            __import__(module)
+            names.append(name)
+        except ImportError:
+            pass
+    return names + ["stream", "bs4"]
+
+
+def _pick_backend(name=SERP_PARSER):
+    if name == "auto":
+        return available_backends()[0]
+    if name not in available_backends():
+        logging.warning(f"SERP parser {name!r} unavailable, using auto")
+        return available_backends()[0]
+    return name
+
+
+# Picked on the first parse: probing for selectolax/lxml imports them
+_backend = None
+
+
+def default_backend():
+    """The backend extract() uses when none is given."""
+    global _backend
+    if _backend is None:
+        _backend = _pick_backend()
+    return _backend
+
+
+def extract(content, spec, max_results, encoding="utf-8", backend=None):
+    """
+    Returns up to max_results {field: value} dicts, one per result block.
+    content should be the raw response bytes; str is accepted too.
+    """
+    return BACKENDS[backend or default_backend()](content, spec, max_results, encoding or "utf-8")
@@ -0,0 +1,85 @@
+import asyncio
+import concurrent.futures
+import threading
+import weakref
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapses identical concurrent calls into one. The first caller for a key
+    runs the call; callers arriving while it is in flight wait for it and get
+    the same result (or exception). Nothing is remembered once the call
+    returns; that is the result cache's job. Both methods return
+    (result, shared), shared being True for callers that joined another's call.
+
+    do() serves the thread-pool path, do_async() the asyncio path. The two
+    keep separate in-flight tables, since a thread cannot await a task and a
+    coroutine must not block on a thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        # loop -> {key: _Flight}
+        self._async_calls = weakref.WeakKeyDictionary()
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = concurrent.futures.Future()
+                self.leaders += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            return call.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(self, key, coro_fn):
+        """
+        The call runs as its own task, so one caller being cancelled does not
+        cancel it for the others; it is cancelled only when every caller is gone.
+        """
+        calls = self._async_calls.setdefault(asyncio.get_running_loop(), {})
+        flight = calls.get(key)
+        shared = flight is not None
+        if not shared:
+            flight = calls[key] = _Flight(asyncio.ensure_future(coro_fn()))
+            flight.task.add_done_callback(lambda _: calls.pop(key, None) if calls.get(key) is flight else None)
+            self.leaders += 1
+        else:
+            self.shared += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def stats(self):
+        return {"calls": self.leaders, "shared": self.shared}
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import zlib
+
+import providers
+from providers import Provider
+from result_cache import normalize_query
+from scheduler import PROVIDER_ORDER
+
+# Offline stand-ins for the live engines, for benchmarks and for checking
+# performance changes on a machine without network access. Install them with
+# providers.use_providers(...).
+
+# Domains synthetic results are spread over when the query has no site: operator
+SYNTHETIC_DOMAINS = [
+    "linkedin.com/in", "instagram.com", "facebook.com", "twitter.com", "github.com",
+    "youtube.com/@", "tiktok.com/@", "news.example.com/story", "blog.example.org/post",
+    "example.net/people",
+]
+
+
+class RateLimited(Exception):
+    """Raised by a stand-in the way a live engine answers HTTP 429."""
+
+
+class StandInProvider(Provider):
+    """
+    Base for stand-ins: simulated latency, random errors and 429 behavior
+    around a _results(query, max_results) method.
+
+    latency: mean seconds per call; jitter: +/- fraction of the mean.
+    error_rate: probability a call raises a generic error.
+    rate_limit_per_sec: calls beyond this in any one-second window get a 429
+    (None disables it). rate_limit_rate: extra probability of a random 429.
+    tail_rate: probability a call stalls for tail_latency seconds instead.
+    A stand-in named after a live engine declares that engine's capabilities,
+    so queries are routed to it as they would be to the engine.
+    """
+
+    def __init__(self, name, latency=0.0, jitter=0.5, error_rate=0.0,
+                 rate_limit_per_sec=None, rate_limit_rate=0.0, seed=None,
+                 tail_rate=0.0, tail_latency=0.0):
+        self.name = name
+        for attr, value in providers.ENGINE_PROFILES.get(name, {}).items():
+            setattr(self, attr, value)
+        self.latency = latency
+        self.jitter = jitter
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.error_rate = error_rate
+        self.rate_limit_per_sec = rate_limit_per_sec
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = []
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    def _delay(self):
+        with self._lock:
+            if self.tail_rate and self._random.random() < self.tail_rate:
+                return self.tail_latency
+            spread = self.latency * self.jitter
+            return max(0.0, self.latency + self._random.uniform(-spread, spread))
+
+    def _check_outcome(self):
+        now = time.monotonic()
+        with self._lock:
+            self.calls += 1
+            self._window = [t for t in self._window if now - t < 1.0]
+            self._window.append(now)
+            if self.rate_limit_per_sec is not None and len(self._window) > self.rate_limit_per_sec:
+                self.rate_limited += 1
+                raise RateLimited(f"{self.name} returned HTTP 429")
+            roll = self._random.random()
+            if roll < self.rate_limit_rate:
+                self.rate_limited += 1
+                raise RateLimited(f"{self.name} returned HTTP 429")
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.errors += 1
+                raise RuntimeError(f"{self.name} stand-in error")
+
+    def fetch(self, query, max_results):
+        time.sleep(self._delay())
+        self._check_outcome()
+        return self._results(query, max_results)
+
+    async def fetch_async(self, client, query, max_results):
+        await asyncio.sleep(self._delay())
+        self._check_outcome()
+        return self._results(query, max_results)
+
+    def _results(self, query, max_results):
+        raise NotImplementedError
+
+    def stats(self):
+        return {"calls": self.calls, "errors": self.errors, "rate_limited": self.rate_limited}
+
+
+class SyntheticProvider(StandInProvider):
+    """
+    Generates plausible results from the query itself: titles carry the
+    query's words (so they pass the relevance filter), site: and filetype:
+    operators shape the URLs, and the same query always gives the same answer.
+    """
+
+    def __init__(self, name, results_per_query=10, **kwargs):
+        super().__init__(name, **kwargs)
+        self.results_per_query = results_per_query
+
+    def _results(self, query, max_results):
+        rng = random.Random(zlib.crc32(f"{self.name}|{normalize_query(query)}".encode()))
+        sites = re.findall(r"(?<!-)site:(\S+)", query)
+        pdf = "filetype:pdf" in query
+        words = [w.strip('"') for w in query.split() if ":" not in w and w.upper() != "OR"]
+        text = " ".join(words)
+        slug = "-".join(w.lower() for w in words[:2]) or "result"
+
+        results = []
+        for i in range(min(self.results_per_query, max_results)):
+            domain = sites[i % len(sites)] if sites else rng.choice(SYNTHETIC_DOMAINS)
+            path = f"{slug}-{rng.randint(1, 999)}"
+            url = f"https://www.{domain}/{path}" + (".pdf" if pdf else "")
+            results.append({
+                "title": f"{text} | {domain.split('/')[0]}",
+                "url": url,
+                # Distinct snippets, so near-duplicate collapsing keeps them apart
+                "description": f"Synthetic result {i + 1} for {text}: "
+                               + " ".join(f"{rng.getrandbits(24):x}" for _ in range(12)),
+                "source": self.name,
+            })
+        return results
+
+
+class FixtureProvider(StandInProvider):
+    """
+    Replays recorded raw results from a JSON file {normalized query: [results]}.
+    Unknown queries return no results, like an engine with nothing to say.
+    """
+
+    def __init__(self, name, path, **kwargs):
+        super().__init__(name, **kwargs)
+        self.path = path
+        self.fixtures = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.fixtures = json.load(f)
+        else:
+            logging.warning(f"No fixture for {name} at {path}")
+
+    def _results(self, query, max_results):
+        return self.fixtures.get(normalize_query(query), [])[:max_results]
+
+
+class RecordingProvider(Provider):
+    """
+    Wraps a live provider and saves every answer to a fixture file that
+    FixtureProvider can replay later.
+    """
+
+    def __init__(self, inner, path):
+        self.name = inner.name
+        self.capabilities = inner.capabilities
+        self.domains = inner.domains
+        self.cost = inner.cost
+        self.inner = inner
+        self.path = path
+        self.fixtures = {}
+        self._lock = threading.Lock()
+
+    def _save(self, query, results):
+        with self._lock:
+            self.fixtures[normalize_query(query)] = results
+            with open(self.path, "w") as f:
+                json.dump(self.fixtures, f, indent=1)
+
+    def fetch(self, query, max_results):
+        results = self.inner.fetch(query, max_results)
+        self._save(query, results)
+        return results
+
+    async def fetch_async(self, client, query, max_results):
+        results = await self.inner.fetch_async(client, query, max_results)
+        self._save(query, results)
+        return results
+
+
+def synthetic_providers(names=PROVIDER_ORDER, **kwargs):
+    """One SyntheticProvider per provider name, all sharing the same settings."""
+    return {name: SyntheticProvider(name, **kwargs) for name in names}
+
+
+def fixture_providers(fixture_dir, names=PROVIDER_ORDER, **kwargs):
+    """
+    FixtureProviders reading <fixture_dir>/<provider>.json. Providers without
+    a fixture file answer nothing rather than falling through to the network.
+    """
+    return {name: FixtureProvider(name, os.path.join(fixture_dir, f"{name}.json"), **kwargs) for name in names}
+
+
+def recording_providers(fixture_dir, names=PROVIDER_ORDER):
+    """Wraps the live providers so their answers are saved to <fixture_dir>/<provider>.json."""
+    os.makedirs(fixture_dir, exist_ok=True)
+    return {
+        name: RecordingProvider(providers.get(name), os.path.join(fixture_dir, f"{name}.json"))
+        for name in names
+    }
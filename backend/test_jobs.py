@@ -0,0 +1,98 @@
+import asyncio
+
+import jobs
+from jobs import JobManager, MemoryJobStore
+
+
+class FakeLookup:
+    """Stands in for deep_dive_search_stream: one result batch, then waits for finish() before its summary."""
+
+    def __init__(self):
+        self.started = []
+        self.cancelled = []
+        self.done = asyncio.Event()
+
+    def finish(self):
+        self.done.set()
+
+    async def __call__(self, name, extra_info="", query_budget=None):
+        self.started.append(name)
+        try:
+            yield "result", {"category": "General", "results": [{"url": f"https://example.com/{name}", "_score": 1}]}
+            await self.done.wait()
+            yield "summary", {"results": {"General": []}, "total": 0}
+        except asyncio.CancelledError:
+            self.cancelled.append(name)
+            raise
+
+
+def run_with_lookup(monkeypatch, scenario, workers=2):
+    async def main():
+        lookup = FakeLookup()
+        monkeypatch.setattr(jobs, "deep_dive_search_stream", lookup)
+        await scenario(JobManager(MemoryJobStore(), workers=workers), lookup)
+
+    asyncio.run(main())
+
+
+def test_identical_lookups_share_one_job(monkeypatch):
+    async def scenario(manager, lookup):
+        first = manager.submit("Jane Doe", "Acme")
+        second = manager.submit(" jane  doe", "acme")
+        other = manager.submit("Jane Doe", "Globex")
+        assert second["id"] == first["id"]
+        assert other["id"] != first["id"]
+        assert manager.get(first["id"])["waiters"] == 2
+
+        await asyncio.sleep(0.01)
+        assert lookup.started == ["Jane Doe", "Jane Doe"]
+        lookup.finish()
+        await asyncio.sleep(0.01)
+        job = manager.get(first["id"])
+        assert job["status"] == "done"
+        assert job["summary"] == {"total": 0}
+        # A finished job no longer absorbs new submissions
+        assert manager.submit("Jane Doe", "Acme")["id"] != first["id"]
+        await manager.close()
+
+    run_with_lookup(monkeypatch, scenario)
+
+
+def test_lookup_stops_when_its_last_caller_cancels(monkeypatch):
+    async def scenario(manager, lookup):
+        job = manager.submit("Jane Doe")
+        manager.submit("Jane Doe")
+        await asyncio.sleep(0.01)
+        assert manager.get(job["id"])["results"]["General"]
+
+        assert manager.cancel(job["id"])["status"] == "running"
+        await asyncio.sleep(0.01)
+        assert lookup.cancelled == []
+        assert manager.get(job["id"])["waiters"] == 1
+
+        assert manager.cancel(job["id"])["status"] == "cancelled"
+        await asyncio.sleep(0.01)
+        assert lookup.cancelled == ["Jane Doe"]
+        assert manager.get(job["id"])["status"] == "cancelled"
+        assert manager.stats()["running_here"] == 0
+        # Cancelling a job that already stopped changes nothing
+        assert manager.cancel(job["id"])["status"] == "cancelled"
+
+    run_with_lookup(monkeypatch, scenario)
+
+
+def test_queued_job_cancelled_before_it_starts_never_runs(monkeypatch):
+    async def scenario(manager, lookup):
+        running = manager.submit("Jane Doe")
+        queued = manager.submit("John Roe")
+        await asyncio.sleep(0.01)
+        assert manager.get(queued["id"])["status"] == "queued"
+
+        manager.cancel(queued["id"])
+        lookup.finish()
+        await asyncio.sleep(0.01)
+        assert manager.get(running["id"])["status"] == "done"
+        assert manager.get(queued["id"])["status"] == "cancelled"
+        assert lookup.started == ["Jane Doe"]
+
+    run_with_lookup(monkeypatch, scenario, workers=1)
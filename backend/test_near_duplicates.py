@@ -0,0 +1,40 @@
+from near_duplicates import collapse, features, fingerprint, similarity
+
+# The same wire story under a reworded headline (~0.8 similar), and an unrelated one
+STORY = ("Acme Corp names Jane Doe chief technology officer",
+         "Acme Corp said on Monday that Jane Doe, its head of research, will become chief technology officer in March.")
+REWORDED = ("Acme names Jane Doe as its new chief technology officer",
+            "Acme Corp said on Monday that Jane Doe, its head of research, will become chief technology officer in March.")
+OTHER = ("Jane Doe wins regional chess open",
+         "Local player Jane Doe took first place at the regional chess open on Sunday after seven rounds.")
+
+
+def result(text, url, score):
+    title, description = text
+    return {"title": title, "description": description, "url": url, "_score": score}
+
+
+def test_known_pair_is_similar_enough_to_fold():
+    assert similarity(features(" ".join(STORY)), features(" ".join(REWORDED))) >= 0.75
+    assert similarity(features(" ".join(STORY)), features(" ".join(OTHER))) < 0.2
+    assert fingerprint("Jane Doe - LinkedIn") is None
+
+
+def test_copy_folds_into_the_best_scored_result():
+    results = {
+        "news": [result(REWORDED, "https://mirror.example/acme-cto", 2), result(OTHER, "https://chess.example/open", 5)],
+        "Mentions": [result(STORY, "https://wire.example/acme-cto", 9)],
+    }
+    assert collapse(results) == 1
+    assert [r["url"] for r in results["news"]] == ["https://chess.example/open"]
+    kept = results["Mentions"][0]
+    assert kept["duplicates"] == [{"title": REWORDED[0], "url": "https://mirror.example/acme-cto"}]
+    assert "duplicates" not in results["news"][0]
+
+
+def test_only_collapse_categories_are_folded():
+    results = {
+        "Social Profiles": [result(STORY, "https://a.example/jane", 1), result(REWORDED, "https://b.example/jane", 1)],
+    }
+    assert collapse(results) == 0
+    assert len(results["Social Profiles"]) == 2
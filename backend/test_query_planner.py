@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from query_planner import QueryPlanner, PlannedQuery, target_sites
+
+
+def exact(url):
+    return SimpleNamespace(url=url, exact=True)
+
+
+def planned(planner, query):
+    return next(pq for pq in planner.queries if pq.query == query)
+
+
+def test_target_sites_ignores_excluded_sites():
+    assert target_sites("Jane Doe site:www.GitHub.com -site:linkedin.com") == ("github.com",)
+    assert target_sites("Jane Doe -site:linkedin.com") == ()
+
+
+def test_exact_hits_on_one_network_do_not_skip_the_others():
+    planner = QueryPlanner("Jane Doe", saturation=3)
+    planner.record("Social Profiles", [exact(f"https://www.linkedin.com/in/jane-{i}") for i in range(10)])
+    planner.record("Videos & Media", [exact(f"https://www.youtube.com/@jane{i}") for i in range(10)])
+
+    for query in ("Jane Doe site:facebook.com", "Jane Doe site:twitter.com", "Jane Doe site:github.com",
+                  "Jane Doe site:tiktok.com", "Jane Doe site:linkedin.com"):
+        assert planner.should_run(planned(planner, query)), query
+    # Broad queries still give way to a saturated category
+    assert not planner.should_run(planned(planner, "Jane Doe linkedin OR instagram"))
+    assert not planner.should_run(planned(planner, "Jane Doe video OR reel OR channel"))
+    assert [reason for _, reason in planner.skipped] == ["category saturated", "category saturated"]
+
+
+def test_site_query_skipped_only_when_another_query_covers_the_site():
+    planner = QueryPlanner("Jane Doe", saturation=3)
+    extra = PlannedQuery("Jane Doe cv site:linkedin.com", "Documents", 10)
+    planner.queries.append(extra)
+    planner._site_queries["linkedin.com"] += 1
+
+    planner.record("Social Profiles", [exact(f"https://uk.linkedin.com/in/jane-{i}") for i in range(2)])
+    assert planner.should_run(extra)
+    planner.record("Social Profiles", [exact("https://www.linkedin.com/in/jane-9")])
+    assert not planner.should_run(extra)
+    assert planner.skipped == [("Jane Doe cv site:linkedin.com", "site saturated")]
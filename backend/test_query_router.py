@@ -0,0 +1,37 @@
+from providers import Provider
+from query_router import NATIVE, TRANSLATED, ParsedQuery, route_for
+
+
+class FakeProvider(Provider):
+    def __init__(self, capabilities, domains=None):
+        self.name = "Fake"
+        self.capabilities = capabilities
+        self.domains = domains
+
+
+def route(query, capabilities, domains=None):
+    return route_for(ParsedQuery(query), query, FakeProvider(frozenset(capabilities), domains))
+
+
+def test_translated_filetype_stays_lossy_after_supported_site():
+    r = route("Jane Doe resume filetype:pdf site:example.com", {"site"})
+    assert r.filetypes == ("pdf",)
+    assert r.fit == TRANSLATED
+    assert r.query == "Jane Doe resume pdf site:example.com"
+
+
+def test_supported_site_before_translated_filetype_is_lossy():
+    r = route("Jane Doe site:example.com filetype:pdf", {"site"})
+    assert r.fit == TRANSLATED
+
+
+def test_translated_site_then_supported_site_is_lossy():
+    r = route("Jane site:a.com -site:b.com", {"-site"})
+    assert r.keep_domains == ("a.com",)
+    assert r.fit == TRANSLATED
+
+
+def test_all_operators_supported_is_native():
+    r = route("Jane Doe filetype:pdf site:example.com", {"site", "filetype"})
+    assert r.fit == NATIVE
+    assert r.query == "Jane Doe filetype:pdf site:example.com"
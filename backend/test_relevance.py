@@ -0,0 +1,88 @@
+import random
+import re
+
+from relevance import RelevanceMatcher
+
+
+def baseline_filter(raw_results, required_terms):
+    """The per-word filter RelevanceMatcher replaced, as (match_context, url) pairs."""
+    kept = []
+    for r in raw_results:
+        url = r["url"]
+        combined_text = f"{r['title']} {r['description']} {url}"
+        match_found = False
+        match_reason = ""
+        for term in [t.replace('"', '').strip() for t in required_terms if t]:
+            sub_words = term.split()
+            if not sub_words:
+                continue
+            matched_words = []
+            for word in sub_words:
+                if len(word) < 3:
+                    continue
+                if re.search(rf"\b{re.escape(word)}(?![a-z])", combined_text, re.IGNORECASE):
+                    matched_words.append(word)
+                    if "#:~:text=" not in url:
+                        url += f"#:~:text={word}"
+            if len(matched_words) == len([w for w in sub_words if len(w) >= 3]):
+                match_found = True
+                match_reason = f"Exact Match: '{term}'"
+                break
+            elif matched_words:
+                match_found = True
+                match_reason = f"Partial Match: {', '.join(matched_words)}"
+        if match_found:
+            kept.append((match_reason, url))
+    return kept
+
+
+def matcher_filter(raw_results, required_terms):
+    return [(r.match_context, r.url) for r in RelevanceMatcher(required_terms).filter(raw_results)]
+
+
+def result(text, url="https://example.com/p"):
+    return {"title": text, "description": "", "url": url}
+
+
+def test_word_inside_another_word():
+    for terms, text in [
+        (["O'Neil Neil"], "Profile of O'Neil"),
+        (["Jean-Luc Luc"], "Jean-Luc Picard"),
+        (["Jean-Luc Jean"], "Jean-Luc Picard"),
+        (["McDonald Donald"], "Ronald McDonald"),
+    ]:
+        raw = [result(text)]
+        assert matcher_filter(raw, terms) == baseline_filter(raw, terms), terms
+
+
+def test_overlapping_words():
+    raw = [result("Anna-Lee-Anne")]
+    terms = ["Anna-Lee Lee-Anne"]
+    assert matcher_filter(raw, terms) == baseline_filter(raw, terms)
+    assert matcher_filter(raw, terms)[0][0] == "Exact Match: 'Anna-Lee Lee-Anne'"
+
+
+def test_prefix_words():
+    raw = [result("John Johnson"), result("Johnson only"), result("Johnny")]
+    terms = ["John Johnson", "Johnny"]
+    assert matcher_filter(raw, terms) == baseline_filter(raw, terms)
+
+
+VOCABULARY = [
+    "Neil", "O'Neil", "Jean", "Luc", "Jean-Luc", "John", "Johnson", "Johnny", "Ann", "Anna", "Joanna",
+    "McDonald", "Donald", "Don", "Ivan", "van", "Lee", "Leeds", "Anna-Lee", "Lee-Anne", "Jo", "al",
+]
+SEPARATORS = [" ", " ", "-", "'", ".", "/", ", "]
+
+
+def test_randomized_equivalence():
+    rng = random.Random(5)
+    for _ in range(20000):
+        terms = [" ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(1, 3))) for _ in range(rng.randint(1, 2))]
+        text = "".join(rng.choice(VOCABULARY) + rng.choice(SEPARATORS) for _ in range(rng.randint(1, 5)))
+        words = text.lower().replace("'", "").split()
+        raw = [
+            {"title": text, "description": rng.choice(["", text[::-1], "nothing"]),
+             "url": f"https://example.com/{rng.choice(words or ['x'])}"},
+        ]
+        assert matcher_filter(raw, terms) == baseline_filter(raw, terms), (terms, raw)
@@ -0,0 +1,85 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from responses import check_page_params, decode_cursor, encode_cursor, paginate
+
+
+def results(count):
+    return {
+        "Social Profiles": [{"title": f"r{i}", "url": f"https://example.com/{i}", "_score": count - i} for i in range(count)],
+        "General": [],
+    }
+
+
+def walk(fetch, category):
+    """Titles of every page of one category, following next_cursor until it runs out."""
+    titles, cursors = [], {}
+    while True:
+        page, pages = fetch(cursors)
+        titles += [item["title"] for item in page[category]]
+        cursor = pages[category]["next_cursor"]
+        if cursor is None:
+            return titles
+        cursors = {category: cursor}
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("3f2a9c", 20)) == ("3f2a9c", 20)
+    for cursor in ("", "not-a-cursor", encode_cursor("3f2a9c", -1), encode_cursor("../etc", 5)):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+def test_pages_cover_every_result_once():
+    snapshot = results(7)
+    titles = walk(lambda cursors: paginate(snapshot, "abc", 3, cursors, ["Social Profiles"], ["title"]),
+                  "Social Profiles")
+    assert titles == [f"r{i}" for i in range(7)]
+
+    page, pages = paginate(snapshot, "abc", limit=3, fields=["title"])
+    assert page["Social Profiles"][0] == {"title": "r0"}
+    assert page["General"] == []
+    assert pages["General"] == {"total": 0, "next_cursor": None}
+    assert decode_cursor(pages["Social Profiles"]["next_cursor"]) == ("abc", 3)
+
+
+def test_page_params_are_checked():
+    check_page_params(limit=5, cursors={"General": encode_cursor("abc", 5)}, fields=["url"])
+    with pytest.raises(ValueError):
+        check_page_params(limit=0)
+    with pytest.raises(ValueError):
+        check_page_params(cursors={"General": encode_cursor("abc", 5), "News": encode_cursor("abd", 5)})
+    with pytest.raises(ValueError):
+        check_page_params(fields=["password"])
+
+
+def test_later_pages_come_from_the_first_pages_snapshot(monkeypatch):
+    lookups = []
+
+    async def lookup(name, extra_info="", query_budget=None, categories=None):
+        # Every run ranks differently, as live engines do
+        lookups.append(name)
+        answer = results(7)
+        if len(lookups) > 1:
+            answer["Social Profiles"].reverse()
+        return answer
+
+    monkeypatch.setattr(main, "deep_dive_search_async", lookup)
+    client = TestClient(main.app)
+    body = {"name": "Jane Doe", "use_index": False, "limit": 3, "categories": ["Social Profiles"]}
+
+    def fetch(cursors):
+        response = client.post("/api/search", json={**body, "cursors": cursors}).json()
+        return response["results"], response["pages"]
+
+    assert walk(fetch, "Social Profiles") == [f"r{i}" for i in range(7)]
+    assert lookups == ["Jane Doe"]
+
+    expired = {"Social Profiles": encode_cursor("0" * 32, 3)}
+    assert client.post("/api/search", json={**body, "cursors": expired}).status_code == 410
+    # A cursor only opens the snapshot of the person it was issued for
+    first = client.post("/api/search", json=body).json()
+    cursor = first["pages"]["Social Profiles"]["next_cursor"]
+    other = {**body, "name": "John Roe", "cursors": {"Social Profiles": cursor}}
+    assert client.post("/api/search", json=other).status_code == 410
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import result_cache
+from result_cache import MemoryCacheBackend, ResultCache, SQLiteCacheBackend
+
+
+def fake_clock(monkeypatch, start=1000.0):
+    """Replaces the cache's time.time(); returns a function that moves it forward."""
+    now = [start]
+    monkeypatch.setattr(result_cache, "time", SimpleNamespace(time=lambda: now[0]))
+
+    def advance(seconds):
+        now[0] += seconds
+
+    return advance
+
+
+def check_entries_expire_after_their_ttl(backend, advance):
+    backend.set("short", [1], ttl=10)
+    backend.set("long", [2], ttl=100)
+    advance(9)
+    assert backend.get("short") == [1]
+    advance(2)
+    assert backend.get("short") is None
+    assert backend.get("long") == [2]
+    assert len(backend) == 1
+
+
+def check_least_recently_used_entry_is_evicted(backend, advance):
+    for key in ("a", "b", "c"):
+        backend.set(key, [key], ttl=100)
+        advance(1)
+    # Reading "a" makes "b" the least recently used
+    assert backend.get("a") == ["a"]
+    advance(1)
+    backend.set("d", ["d"], ttl=100)
+    assert [backend.get(key) for key in ("a", "b", "c", "d")] == [["a"], None, ["c"], ["d"]]
+    assert len(backend) == 3
+
+
+def test_memory_entries_expire_after_their_ttl(monkeypatch):
+    check_entries_expire_after_their_ttl(MemoryCacheBackend(), fake_clock(monkeypatch))
+
+
+def test_sqlite_entries_expire_after_their_ttl(monkeypatch, tmp_path):
+    advance = fake_clock(monkeypatch)
+    check_entries_expire_after_their_ttl(SQLiteCacheBackend(str(tmp_path / "cache.sqlite3")), advance)
+
+
+def test_memory_least_recently_used_entry_is_evicted(monkeypatch):
+    check_least_recently_used_entry_is_evicted(MemoryCacheBackend(max_entries=3), fake_clock(monkeypatch))
+
+
+def test_sqlite_least_recently_used_entry_is_evicted(monkeypatch, tmp_path):
+    advance = fake_clock(monkeypatch)
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    check_least_recently_used_entry_is_evicted(backend, advance)
+
+
+def test_lookup_matches_normalized_queries_and_skips_empty_answers(monkeypatch):
+    advance = fake_clock(monkeypatch)
+    cache = ResultCache(MemoryCacheBackend(), ttl=60)
+    cache.store("Jane  Doe", "Bing", 10, [{"url": "https://example.com"}])
+    cache.store("Jane Doe", "Google", 10, [])
+
+    assert cache.lookup(" jane doe ", ["Google", "Bing"], 10) == ("Bing", [{"url": "https://example.com"}])
+    assert cache.lookup("Jane Doe", ["Bing"], 20) == (None, None)
+    advance(61)
+    assert cache.lookup("Jane Doe", ["Bing"], 10) == (None, None)
+    assert (cache.hits, cache.misses) == (1, 2)
@@ -0,0 +1,135 @@
+import asyncio
+
+from scheduler import (
+    TRIAL_TIMEOUT, CircuitBreaker, MemorySchedulerState, ProviderScheduler, SQLiteSchedulerState, TokenBucket,
+)
+
+
+def bucket(rate, capacity, now=0.0):
+    b = TokenBucket(rate, capacity)
+    b.updated = now
+    return b
+
+
+def opened_breaker(threshold=2, cooldown=10.0):
+    breaker = CircuitBreaker(threshold, cooldown)
+    for _ in range(threshold):
+        breaker.record_failure(100.0)
+    return breaker
+
+
+def test_bucket_refills_at_its_rate_up_to_capacity():
+    b = bucket(rate=2.0, capacity=3)
+    assert [b.reserve(0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Empty: the next token is half a second away, the one after a second
+    assert b.reserve(0.0) == 0.5
+    assert b.reserve(0.0) == 1.0
+    # A second later both queued callers have had their tokens
+    assert b.wait_time(1.0) == 0.5
+    assert b.tokens == 0.0
+    assert b.wait_time(1.5) == 0.0
+    b.wait_time(60.0)
+    assert b.tokens == 3
+
+
+def test_bucket_over_max_wait_reserves_nothing():
+    b = bucket(rate=1.0, capacity=1)
+    assert b.reserve(0.0) == 0.0
+    assert b.reserve(0.0, max_wait=0.5) is None
+    assert b.tokens == 0.0
+    assert b.reserve(0.0, max_wait=1.0) == 1.0
+
+
+def test_refund_moves_the_queue_up_but_not_past_capacity():
+    b = bucket(rate=1.0, capacity=2)
+    for _ in range(4):
+        b.reserve(0.0)
+    assert b.wait_time(0.0) == 3.0
+    b.refund(0.0)
+    assert b.wait_time(0.0) == 2.0
+
+    full = bucket(rate=1.0, capacity=2)
+    full.refund(0.0)
+    assert full.tokens == 2
+
+
+def test_breaker_opens_after_threshold_and_lets_one_trial_through():
+    breaker = CircuitBreaker(threshold=2, cooldown=10.0)
+    breaker.record_failure(100.0)
+    assert breaker.state(100.0) == "closed"
+    breaker.record_failure(100.0)
+    assert breaker.state(105.0) == "open"
+    assert not breaker.allow(105.0)
+
+    assert breaker.state(110.0) == "half-open"
+    assert breaker.allow(110.0)
+    assert not breaker.allow(111.0)
+    breaker.record_success()
+    assert breaker.state(111.0) == "closed"
+    assert breaker.failures == 0
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = opened_breaker()
+    assert breaker.allow(110.0)
+    breaker.record_failure(112.0)
+    assert breaker.state(115.0) == "open"
+    assert breaker.state(122.0) == "half-open"
+
+
+def test_trial_that_never_reports_times_out():
+    breaker = opened_breaker()
+    assert breaker.allow(110.0)
+    assert not breaker.allow(110.0 + TRIAL_TIMEOUT - 1)
+    assert breaker.allow(110.0 + TRIAL_TIMEOUT)
+
+
+def test_released_trial_goes_to_the_next_caller():
+    breaker = opened_breaker()
+    assert breaker.allow(110.0)
+    breaker.release()
+    assert breaker.state(110.0) == "half-open"
+    assert breaker.allow(110.0)
+
+
+def check_cancelled_call_refunds_its_token(state):
+    scheduler = ProviderScheduler(rates={"A": (1.0, 1)}, state=state)
+    assert scheduler.acquire("A")
+    assert not scheduler.acquire("A", max_wait=0.2)
+    _, backlog = scheduler.load()
+    assert backlog == 0.0
+
+    scheduler.state.clock = lambda: 0.0
+    with scheduler.state.edit(["A"]) as entries:
+        entries["A"][0].tokens, entries["A"][0].updated = -1.0, 0.0
+    assert scheduler.load() == (1.0, 1.0)
+    scheduler.record_cancelled("A", refund=True)
+    assert scheduler.load() == (1.0, 0.0)
+    assert scheduler.snapshot()["A"]["tokens"] == 0.0
+
+
+def test_cancelled_call_refunds_its_token():
+    check_cancelled_call_refunds_its_token(MemorySchedulerState())
+
+
+def test_cancelled_call_refunds_its_token_in_shared_state(tmp_path):
+    check_cancelled_call_refunds_its_token(SQLiteSchedulerState(str(tmp_path / "scheduler.sqlite3")))
+
+
+def test_skipped_acquire_hands_the_trial_on():
+    scheduler = ProviderScheduler(rates={"A": (1.0, 1)}, threshold=1, cooldown=10.0, state=MemorySchedulerState())
+    scheduler.state.clock = lambda: 100.0
+    scheduler.record_failure("A")
+    assert scheduler.plan() == []
+
+    scheduler.state.clock = lambda: 110.0
+    with scheduler.state.edit(["A"]) as entries:
+        entries["A"][0].tokens = -1.0
+    # Its token is too far away, so the trial is not spent on this caller
+    assert not scheduler.acquire("A", max_wait=0.5)
+    with scheduler.state.edit(["A"]) as entries:
+        entries["A"][0].tokens = 1.0
+    assert asyncio.run(scheduler.acquire_async("A", max_wait=0.5))
+    assert not scheduler.acquire("A", max_wait=0.5)
+    scheduler.record_success("A")
+    assert scheduler.snapshot()["A"]["circuit"] == "closed"
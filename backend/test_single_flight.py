@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from single_flight import SingleFlight
+
+
+class SlowCall:
+    """A call that answers once release() is called, counting how often it ran and was cancelled."""
+
+    def __init__(self, result="answer"):
+        self.result = result
+        self.runs = 0
+        self.cancelled = 0
+        self.released = asyncio.Event()
+
+    def release(self):
+        self.released.set()
+
+    async def __call__(self):
+        self.runs += 1
+        try:
+            await self.released.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self.result
+
+
+def test_cancelled_leader_leaves_the_call_to_its_followers():
+    async def main():
+        flight, call = SingleFlight(), SlowCall()
+        leader = asyncio.ensure_future(flight.do_async("q", call))
+        followers = [asyncio.ensure_future(flight.do_async("q", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        followers[0].cancel()
+        await asyncio.sleep(0)
+        assert leader.cancelled() and call.cancelled == 0
+        call.release()
+        assert await followers[1] == ("answer", True)
+        assert (call.runs, flight.stats()) == (1, {"calls": 1, "shared": 2})
+
+    asyncio.run(main())
+
+
+def test_call_is_cancelled_once_every_caller_is_gone():
+    async def main():
+        flight, call = SingleFlight(), SlowCall()
+        callers = [asyncio.ensure_future(flight.do_async("q", call)) for _ in range(3)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert call.cancelled == 1
+
+        # The next caller starts a new call instead of joining the dead one
+        retry = asyncio.ensure_future(flight.do_async("q", call))
+        await asyncio.sleep(0)
+        call.release()
+        assert await retry == ("answer", False)
+        assert call.runs == 2
+
+    asyncio.run(main())
+
+
+def test_followers_get_the_leaders_exception():
+    async def main():
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def failing():
+            started.set()
+            await asyncio.sleep(0.01)
+            raise RuntimeError("blocked")
+
+        callers = [asyncio.ensure_future(flight.do_async("q", failing)) for _ in range(2)]
+        await started.wait()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert [str(r) for r in results] == ["blocked", "blocked"]
+        assert flight.stats() == {"calls": 1, "shared": 1}
+
+    asyncio.run(main())
+
+
+def test_threads_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def call():
+        runs.append(1)
+        release.wait(5)
+        return "answer"
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(flight.do, "q", call)
+        while not runs:
+            time.sleep(0.001)
+        followers = [pool.submit(flight.do, "q", call) for _ in range(3)]
+        while flight.shared < 3:
+            time.sleep(0.001)
+        release.set()
+        assert leader.result() == ("answer", False)
+        assert [f.result() for f in followers] == [("answer", True)] * 3
+    assert len(runs) == 1
@@ -0,0 +1,195 @@
+"""
+Checks the profile probe (profile_probe.py) against a local HTTP stand-in for
+GitHub and Instagram, so no network is needed:
+
+  - candidate usernames built from the name and an @handle in extra_info
+  - existing / missing / unknown (429, app shell) profiles on both sites,
+    sync and async; only pages whose name tag names the person are hits,
+    titled and described with the page's own text
+  - pages are cached: a repeat lookup sends no requests
+  - a probe that cannot reach any site raises, so the scheduler counts a failure
+  - in a full lookup, the probe answers the site:github.com and
+    site:instagram.com queries as exact matches and the engines never get them
+
+    python verify_profile_probe.py
+"""
+import asyncio
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("FOOTPRINT_INDEX", "0")
+os.environ.setdefault("SEARCH_CACHE_BACKEND", "memory")
+
+import httpx
+
+import providers
+from profile_probe import SITES, ProfileProbeProvider, ProfileSite, candidate_handles
+from scheduler import PROVIDER_RATES, scheduler
+from search_logic import deep_dive_search
+from stand_ins import synthetic_providers
+
+# Profiles the stand-in knows (handle -> display name); every other handle is missing
+GITHUB = {"janeprobe": "Jane Probe", "jane-probe": "Jane Probe", "jane_probe": "Janet Other"}
+INSTAGRAM = {"jane.probe": "Jane Probe"}
+# Handles the stand-in refuses to answer for, like a rate-limited site
+BLOCKED = {"jprobe"}
+
+failures = []
+
+
+def check(label, ok, detail=""):
+    print(f"{'PASS' if ok else 'FAIL'}  {label}" + (f": {detail}" if detail and not ok else ""))
+    if not ok:
+        failures.append(label)
+
+
+class StandInSites(BaseHTTPRequestHandler):
+    requests = []
+
+    def _answer(self, body):
+        site, handle = (self.path.strip("/").split("/") + [""])[:2]
+        StandInSites.requests.append((self.command, site, handle))
+        if handle in BLOCKED:
+            status, page = 429, "Too Many Requests"
+        elif site == "github":
+            if handle in GITHUB:
+                status, page = 200, (f"<head><title>{handle} ({GITHUB[handle]}) &middot; GitHub</title>"
+                                     f'<meta property="og:description" content="{handle} has 3 repositories."></head>')
+            else:
+                status, page = 404, "Not Found"
+        elif site == "instagram":
+            # Anonymous clients get an app shell with no og:title, missing profile or not
+            status, page = 200, "<head><title>Instagram</title></head>"
+            if handle in INSTAGRAM:
+                page = (f'<head><meta content="{INSTAGRAM[handle]} (&#064;{handle}) &#x2022; Instagram photos and videos"'
+                        f' property="og:title"><meta property="og:description" content="12 Followers"></head>')
+            elif handle == "janeprobe":
+                page = "<h2>Sorry, this page isn't available.</h2> Page Not Found"
+        else:
+            status, page = 404, "Not Found"
+        data = page.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if body:
+            self.wfile.write(data)
+
+    def do_GET(self):
+        self._answer(True)
+
+    def do_HEAD(self):
+        self._answer(False)
+
+    def log_message(self, *args):
+        pass
+
+
+def local_sites(port):
+    """SITES with the profile URLs pointed at the stand-in."""
+    return {
+        domain: ProfileSite(site.label, f"http://127.0.0.1:{port}/{site.label.lower()}/{{handle}}",
+                            site.pattern.pattern, site.name_tag, site.missing_text)
+        for domain, site in SITES.items()
+    }
+
+
+def handles_of(results):
+    return sorted(r["url"].split("#")[0].rstrip("/").rsplit("/", 1)[-1] for r in results)
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInSites)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    handles = candidate_handles("Jane Probe", "@jp_dev at Acme")
+    check("handles from name and extra_info",
+          handles == ["jp_dev", "janeprobe", "jane.probe", "jane_probe", "jane-probe", "jprobe", "janep"], handles)
+    check("accents folded", candidate_handles("José Núñez")[:2] == ["josenunez", "jose.nunez"],
+          candidate_handles("José Núñez"))
+
+    probe = ProfileProbeProvider(**providers.ENGINE_PROFILES["Profiles"], sites=local_sites(port))
+    with providers.lookup_subject("Jane Probe"):
+        found = probe.fetch("Jane Probe site:github.com", 10)
+    # jane_probe exists but names someone else; jprobe answers 429
+    check("github hits (404 = missing, other person and 429 ignored)",
+          handles_of(found) == ["jane-probe", "janeprobe"], handles_of(found))
+    check("hit text taken from the page",
+          sorted((r["title"], r["description"]) for r in found) == [
+              ("jane-probe (Jane Probe) · GitHub", "jane-probe has 3 repositories."),
+              ("janeprobe (Jane Probe) · GitHub", "janeprobe has 3 repositories."),
+          ], found)
+
+    sent = len(StandInSites.requests)
+    with providers.lookup_subject("Jane Probe"):
+        again = probe.fetch("Jane Probe site:github.com", 10)
+    # The 429 answer is not cached, so only that handle is asked again
+    repeats = StandInSites.requests[sent:]
+    check("pages cached", handles_of(again) == handles_of(found) and [h for _, _, h in repeats] == ["jprobe"],
+          repeats)
+
+    with providers.lookup_subject("Jane Probe"):
+        insta = asyncio.run(fetch_async(probe, "Jane Probe site:instagram.com"))
+    # janeprobe is missing, jane_probe gets the app shell, jprobe answers 429
+    check("instagram hits (og:title names the person, app shell ignored)",
+          handles_of(insta) == ["jane.probe"] and insta[0]["title"] == "Jane Probe (@jane.probe) • Instagram photos and videos",
+          insta)
+    check("app shell not cached", probe.cache.get("instagram.com|jane_probe") is None
+          and probe.cache.get("instagram.com|janeprobe") is False)
+    check("no probe for other sites", probe.fetch("Jane Probe site:linkedin.com", 10) == [])
+    check("outside a lookup the query names the person",
+          handles_of(probe.fetch('"Jane Probe" site:github.com', 10)) == ["jane-probe", "janeprobe"])
+
+    unreachable = ProfileProbeProvider(sites=local_sites(1), cache=None)
+    try:
+        with providers.lookup_subject("Jane Probe"):
+            unreachable.fetch("Jane Probe site:github.com", 10)
+        check("unreachable sites raise", False, "no exception")
+    except Exception as e:
+        check("unreachable sites raise", True, str(e))
+
+    # A full lookup with stand-in engines: the probe takes the profile queries.
+    # Few results per engine query, so Social Profiles never saturates first.
+    engines = synthetic_providers(names=[n for n in providers.ENGINE_PROFILES if n != "Profiles"], results_per_query=2)
+    asked = []
+    for engine in engines.values():
+        engine._results = recording(engine, asked)
+    lookup_probe = ProfileProbeProvider(**providers.ENGINE_PROFILES["Profiles"], sites=local_sites(port))
+    # Stand-ins answer at once; live pacing would only make the lookup slow
+    scheduler.reset({p: (100.0, 100) for p in PROVIDER_RATES})
+    with providers.use_providers([*engines.values(), lookup_probe]):
+        results = deep_dive_search("Jane Probe")
+    profiles = [r for r in results["Social Profiles"] if f"127.0.0.1:{port}" in r["url"]]
+    check("probe hits in Social Profiles", handles_of(profiles) == ["jane-probe", "jane.probe", "janeprobe"],
+          handles_of(profiles))
+    check("probe hits rank as exact matches", all(r["match_context"].startswith("Exact Match") for r in profiles),
+          [r["match_context"] for r in profiles])
+    skipped = [q for q in asked if re.search(r"(?<!-)site:(github|instagram)\.com", q)]
+    check("engines not asked for github/instagram", not skipped, skipped)
+    check("engines still asked for the rest", any("site:linkedin.com" in q for q in asked))
+
+    server.shutdown()
+    print(f"\n{len(failures)} failed" if failures else "\nall checks passed")
+    return 1 if failures else 0
+
+
+async def fetch_async(probe, query):
+    async with httpx.AsyncClient() as client:
+        return await probe.fetch_async(client, query, 10)
+
+
+def recording(engine, asked):
+    results = engine._results
+
+    def record(query, max_results):
+        asked.append(query)
+        return results(query, max_results)
+    return record
+
+
+if __name__ == "__main__":
+    sys.exit(main())
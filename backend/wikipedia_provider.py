@@ -0,0 +1,212 @@
+import logging
+import os
+
+from http_clients import sync_clients
+from metrics import record_wikipedia_call, record_wikipedia_lookup
+from providers import OPERATORS, Provider, current_subject
+from result_cache import MemoryCacheBackend, normalize_query
+from single_flight import SingleFlight
+
+# Wikipedia answers with the article about the person, whatever operators the
+# query carried, so it is resolved once per lookup instead of once per query:
+#
+#   1. search:    subject -> candidate titles     (list=search, titles only)
+#   2. summaries: titles  -> intro + URL of each  (one batched titles=a|b|c call)
+#
+# Both steps are cached: a subject's titles for WIKIPEDIA_CACHE_TTL, and each
+# title's summary on its own, so another subject resolving to an article already
+# seen (e.g. the same person with different extra_info) skips step 2. Queries
+# run outside a lookup fall back to resolving the query text the same way.
+# Since the answer does not depend on the query, Wikipedia is only asked when
+# the search engines have nothing (Provider.fallback), and its answers are
+# never stored in the result cache under the query (Provider.answers_subject).
+
+API_URL = "https://en.wikipedia.org/w/api.php"
+# Candidate articles kept per subject
+SUBJECT_TITLES = int(os.environ.get("WIKIPEDIA_SUBJECT_TITLES", 3))
+CACHE_TTL = float(os.environ.get("WIKIPEDIA_CACHE_TTL", 24 * 60 * 60))
+CACHE_MAX_ENTRIES = int(os.environ.get("WIKIPEDIA_CACHE_SIZE", 4096))
+# The API returns at most 20 intro extracts per request
+MAX_TITLES_PER_CALL = 20
+SUMMARY_CHARS = 300
+
+
+def search_params(text, limit=SUBJECT_TITLES):
+    return {
+        "action": "query",
+        "format": "json",
+        "list": "search",
+        "srsearch": text,
+        "srlimit": limit,
+        "srprop": "",
+    }
+
+
+def summary_params(titles):
+    return {
+        "action": "query",
+        "format": "json",
+        "titles": "|".join(titles),
+        "redirects": 1,
+        "prop": "extracts|info",
+        "exintro": 1,
+        "explaintext": 1,
+        "exlimit": len(titles),
+        "inprop": "url",
+    }
+
+
+def parse_titles(data):
+    return [hit["title"] for hit in data.get("query", {}).get("search", []) if hit.get("title")]
+
+
+def parse_summaries(data, titles):
+    """{requested title: result dict} for the titles that exist, following redirects."""
+    query = data.get("query", {})
+    pages = {}
+    for page in query.get("pages", {}).values():
+        if "missing" in page or "invalid" in page:
+            continue
+        pages[page.get("title", "")] = {
+            "title": page.get("title", ""),
+            "url": page.get("fullurl", ""),
+            "description": page.get("extract", "")[:SUMMARY_CHARS] + "...",
+            "source": "Wikipedia",
+        }
+
+    # The API reports normalized and redirected titles as from -> to
+    renamed = {}
+    for step in query.get("normalized", []) + query.get("redirects", []):
+        renamed[step["from"]] = step["to"]
+    summaries = {}
+    for title in titles:
+        final = title
+        while final in renamed and final not in pages:
+            final = renamed.pop(final)
+        if final in pages:
+            summaries[title] = pages[final]
+    return summaries
+
+
+def search_text(query):
+    """What to resolve: the current lookup's subject, else the query itself."""
+    subject = current_subject()
+    if subject is None:
+        return query
+    name, extra_info = subject
+    return f"{name} {extra_info}".strip()
+
+
+class SummaryCache:
+    """Subject -> article titles, and title -> summary, both with expiry."""
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.backend = MemoryCacheBackend(max_entries)
+
+    def titles(self, text):
+        return self.backend.get(f"s|{normalize_query(text)}")
+
+    def store_titles(self, text, titles):
+        self.backend.set(f"s|{normalize_query(text)}", titles, self.ttl)
+
+    def summary(self, title):
+        return self.backend.get(f"t|{title}")
+
+    def store_summaries(self, summaries):
+        for title, summary in summaries.items():
+            self.backend.set(f"t|{title}", summary, self.ttl)
+
+    def missing(self, titles):
+        return [t for t in titles if self.summary(t) is None]
+
+    def results(self, titles):
+        return [s for s in map(self.summary, titles) if s is not None]
+
+    def clear(self):
+        self.backend.clear()
+
+
+class WikipediaProvider(Provider):
+    """
+    Official API, reliable on Vercel. At most two calls per subject (search,
+    then a batched summary lookup), after that every query of the lookup is
+    answered from the cache.
+    """
+
+    name = "Wikipedia"
+    answers_subject = True
+
+    def __init__(self, capabilities=OPERATORS, domains=None, cost=1.0, fallback=True, cache=None):
+        self.capabilities = capabilities
+        self.domains = domains
+        self.cost = cost
+        self.fallback = fallback
+        self.cache = cache or SummaryCache()
+        # Queries of one lookup run in parallel; the first resolves the subject
+        self._flights = SingleFlight()
+
+    def fetch(self, query, max_results):
+        text = search_text(query)
+        results, _ = self._flights.do(normalize_query(text), lambda: self._resolve(text))
+        return results[:max_results]
+
+    async def fetch_async(self, client, query, max_results):
+        text = search_text(query)
+        results, _ = await self._flights.do_async(normalize_query(text), lambda: self._resolve_async(client, text))
+        return results[:max_results]
+
+    def _cached(self, text):
+        """The cached results for `text`, or None if a call is needed."""
+        titles = self.cache.titles(text)
+        if titles is None or self.cache.missing(titles):
+            return None
+        record_wikipedia_lookup("cached")
+        return self.cache.results(titles)
+
+    def _resolve(self, text):
+        results = self._cached(text)
+        if results is not None:
+            return results
+        with sync_clients.lease("Wikipedia") as session:
+            titles = self.cache.titles(text)
+            if titles is None:
+                logging.info(f"Wikipedia Fallback: {text}")
+                titles = parse_titles(self._get(session, search_params(text), "search"))
+                self.cache.store_titles(text, titles)
+            missing = self.cache.missing(titles)
+            for i in range(0, len(missing), MAX_TITLES_PER_CALL):
+                batch = missing[i:i + MAX_TITLES_PER_CALL]
+                self.cache.store_summaries(parse_summaries(self._get(session, summary_params(batch), "summaries"), batch))
+        record_wikipedia_lookup("resolved")
+        return self.cache.results(titles)
+
+    async def _resolve_async(self, client, text):
+        results = self._cached(text)
+        if results is not None:
+            return results
+        titles = self.cache.titles(text)
+        if titles is None:
+            logging.info(f"Wikipedia Fallback: {text}")
+            titles = parse_titles(await self._get_async(client, search_params(text), "search"))
+            self.cache.store_titles(text, titles)
+        missing = self.cache.missing(titles)
+        for i in range(0, len(missing), MAX_TITLES_PER_CALL):
+            batch = missing[i:i + MAX_TITLES_PER_CALL]
+            self.cache.store_summaries(parse_summaries(await self._get_async(client, summary_params(batch), "summaries"), batch))
+        record_wikipedia_lookup("resolved")
+        return self.cache.results(titles)
+
+    @staticmethod
+    def _get(session, params, kind):
+        record_wikipedia_call(kind)
+        response = session.get(API_URL, params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    async def _get_async(client, params, kind):
+        record_wikipedia_call(kind)
+        response = await client.get(API_URL, params=params)
+        response.raise_for_status()
+        return response.json()
@@ -2,16 +2,37 @@ import React, { useState } from 'react';
 import SearchHero from './components/SearchHero';
 import ResultsDashboard from './components/ResultsDashboard';
 
+const CATEGORIES = ["Social Profiles", "Documents", "news", "Videos & Media", "Mentions", "General"];
+
+// Parses "event: x\ndata: {...}" blocks out of a Server-Sent Events buffer.
+// Returns the parsed events and whatever incomplete tail is left over.
+const parseSSE = (buffer) => {
+  const events = [];
+  const blocks = buffer.split("\n\n");
+  const rest = blocks.pop();
+  for (const block of blocks) {
+    let event = "message";
+    let data = "";
+    for (const line of block.split("\n")) {
+      if (line.startsWith("event:")) event = line.slice(6).trim();
+      else if (line.startsWith("data:")) data += line.slice(5).trim();
+    }
+    if (data) events.push({ event, data: JSON.parse(data) });
+  }
+  return { events, rest };
+};
+
 function App() {
   const [results, setResults] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [scanning, setScanning] = useState(false);
 
   const handleSearch = async (name, extraInfo) => {
     setLoading(true);
+    // Hardcoded for stability
+    const API_BASE = "https://stkl.vercel.app";
     try {
-      // Hardcoded for stability
-      const API_BASE = "https://stkl.vercel.app";
-      const url = `${API_BASE}/api/search`;
+      const url = `${API_BASE}/api/search/stream`;
       const response = await fetch(url, {
         method: 'POST',
         headers: {
@@ -19,14 +40,46 @@ function App() {
         },
         body: JSON.stringify({ name, extra_info: extraInfo }),
       });
-      const data = await response.json();
-      setResults(data.results || []);
+      if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+
+      // Show the dashboard right away and fill it in as batches arrive
+      setResults(Object.fromEntries(CATEGORIES.map(c => [c, []])));
+      setScanning(true);
+      setLoading(false);
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const { events, rest } = parseSSE(buffer);
+        buffer = rest;
+        for (const { event, data } of events) {
+          if (event === "result") {
+            setResults(prev => ({
+              ...prev,
+              [data.category]: [...(prev[data.category] || []), ...data.results]
+                .sort((a, b) => (b._score || 0) - (a._score || 0)),
+            }));
+          } else if (event === "summary") {
+            // Final fused ranking replaces the provisional batches
+            setResults(data.results);
+          } else if (event === "error") {
+            console.error("Search failed:", data.details);
+          }
+        }
+      }
     } catch (error) {
       console.error("Search failed:", error);
       alert(`Backend Connection Failed to ${API_BASE}: ${error.message}`);
-      setResults([]);
+      setResults(prev => prev || []);
     } finally {
       setLoading(false);
+      setScanning(false);
     }
   };
 
@@ -50,7 +103,7 @@ function App() {
       {!results ? (
         <SearchHero onSearch={handleSearch} />
       ) : (
-        <ResultsDashboard results={results} onReset={handleReset} />
+        <ResultsDashboard results={results} scanning={scanning} onReset={handleReset} />
       )}
     </div>
   );
@@ -2,7 +2,7 @@ import React from 'react';
 import { motion } from 'framer-motion';
 import { ExternalLink, Share2, Globe, FileText, Image as ImageIcon } from 'lucide-react';
 
-const ResultsDashboard = ({ results, onReset }) => {
+const ResultsDashboard = ({ results, scanning = false, onReset }) => {
     // Check if results is an array (legacy) or object (new categorized)
     const isCategorized = !Array.isArray(results);
 
@@ -38,6 +38,12 @@ const ResultsDashboard = ({ results, onReset }) => {
                         </div>
                     )}
 
+                    {result.duplicates?.length > 0 && (
+                        <div className="mb-4 ml-2 inline-block px-3 py-1 bg-blue-500/20 text-blue-200 text-sm font-bold rounded border border-blue-400/30 uppercase tracking-wider font-['Rajdhani']" title={result.duplicates.map(d => d.url).join('\n')}>
+                            +{result.duplicates.length} similar
+                        </div>
+                    )}
+
                     <p className="text-lg text-gray-200 mb-4 line-clamp-3 font-['Caveat'] tracking-wide">
                         {result.description}
                     </p>
@@ -74,6 +80,12 @@ const ResultsDashboard = ({ results, onReset }) => {
                 SCAN RESULTS
             </motion.h2>
 
+            {scanning && (
+                <p className="mb-8 animate-pulse text-sm font-bold tracking-[0.2em] text-cyan-400 font-['Orbitron']">
+                    SCANNING GLOBAL NETWORKS...
+                </p>
+            )}
+
             {isCategorized ? (
                 <>
                     {Object.entries(results).map(([category, items], idx) => (
@@ -94,7 +106,7 @@ const ResultsDashboard = ({ results, onReset }) => {
                 <ResultGrid items={results} />
             )}
 
-            {(!results || (isCategorized && Object.values(results).every(r => r.length === 0)) || (!isCategorized && results.length === 0)) && (
+            {!scanning && (!results || (isCategorized && Object.values(results).every(r => r.length === 0)) || (!isCategorized && results.length === 0)) && (
                 <div className="flex-grow flex items-center justify-center w-full">
                     <div className="text-center text-gray-400 backdrop-blur-md p-12 rounded-2xl bg-black/40 border border-blue-500/30 shadow-[0_0_50px_rgba(59,130,246,0.2)] max-w-lg">
                         <p className="text-3xl font-bold mb-4 text-transparent bg-clip-text bg-gradient-to-r from-blue-200 to-cyan-200 font-['Orbitron']">NO DATA FOUND</p>